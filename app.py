@@ -1,32 +1,903 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file, Response, stream_with_context, g, has_request_context
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 import mysql.connector
 from mysql.connector import Error
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 import json
-from functools import wraps
+from functools import lru_cache, wraps
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from collections import deque, OrderedDict
+import threading
+import multiprocessing
+import zipfile
+import csv
+import random
+import tempfile
+import time
+import uuid
 import io
+import base64
+import binascii
+import heapq
+import bisect
+import re
+import glob
+import hashlib
+import hmac
+import sqlite3
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
+from reportlab.lib.units import inch, mm
 from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 import os
 
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = PdfWriter = None
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+except ImportError:
+    pass
+
 app = Flask(__name__)
-app.secret_key = 'your-secret-key-change-in-production'
+app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
 
 # Database Configuration
 DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '1234',  
-    'database': 'oil_shop_db'
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', '1234'),
+    'database': os.getenv('DB_NAME', 'oil_shop_db')
 }
 
+# Storage backend: 'mysql', or 'sqlite' for a single-counter shop that keeps
+# everything in one WAL-mode file next to the app
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH') or os.path.join(app.root_path, 'oil_shop.db')
+SQLITE_SCHEMA = os.path.join(app.root_path, 'database_init_sqlite.sql')
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))
+# Password of the admin user created together with a new SQLite database
+SQLITE_ADMIN_PASSWORD = os.getenv('SQLITE_ADMIN_PASSWORD', 'admin123')
+
+# The app's SQL is written for MySQL; these rewrites cover the constructs it
+# uses so the same statements run on SQLite
+SQLITE_INTERVAL = re.compile(r"(\?|NOW\(\)|CURDATE\(\)|[\w.]+) ([+-]) INTERVAL (\?|\d+) (DAY|MONTH)\b")
+SQLITE_REWRITES = [
+    (re.compile(r'\s+FOR UPDATE\b'), ''),
+    (re.compile(r'\bON DUPLICATE KEY UPDATE\b'), 'ON CONFLICT DO UPDATE SET'),
+    (re.compile(r'\bVALUES\((\w+)\)'), r'excluded.\1'),
+    (re.compile(r'\bCURDATE\(\) - INTERVAL \(DAYOFMONTH\(CURDATE\(\)\) - 1\) DAY'),
+     "date('now', 'localtime', 'start of month')"),
+    (re.compile(r'\b(?:DATE\()?([\w.]+)\)? - INTERVAL \(DAYOFMONTH\(\1\) - 1\) DAY'), r"date(\1, 'start of month')"),
+    (SQLITE_INTERVAL, lambda m: (f"datetime({m[1]}, '{m[2]}' || ? || ' {m[4].lower()}s')" if m[3] == '?'
+                                 else f"datetime({m[1]}, '{m[2]}{m[3]} {m[4].lower()}s')")),
+    (re.compile(r'\bNOW\(\)'), "datetime('now', 'localtime')"),
+    (re.compile(r'\bCURDATE\(\)'), "date('now', 'localtime')"),
+    (re.compile(r'\bTRUNCATE TABLE\b'), 'DELETE FROM'),
+]
+SQLITE_WRITE = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE|TRUNCATE)\b|\bFOR UPDATE\b', re.IGNORECASE)
+# Expressions such as NOW() or MIN(created_at) come back as text
+SQLITE_TIMESTAMP = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+CENT = Decimal('0.01')
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' ', 'seconds'))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('DATE', lambda value: date.fromisoformat(value.decode()))
+# Every DECIMAL column in the schema has two decimal places
+sqlite3.register_converter('DECIMAL', lambda value: Decimal(value.decode()).quantize(CENT))
+
+@lru_cache(maxsize=1024)
+def translate_sqlite(sql):
+    """MySQL statement -> ``(sqlite_statement, needs_write_lock)``."""
+    translated = sql.replace('%s', '?').replace('%%', '%')
+    for pattern, replacement in SQLITE_REWRITES:
+        translated = pattern.sub(replacement, translated)
+    return translated, SQLITE_WRITE.search(sql) is not None
+
+def sqlite_error(e, sql):
+    """Re-raise a sqlite3 error as the mysql.connector error the routes expect."""
+    message = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        if 'UNIQUE' in message or 'PRIMARY KEY' in message:
+            errno = 1062
+        elif 'FOREIGN KEY' in message:
+            errno = 1451 if sql.lstrip().upper().startswith('DELETE') else 1452
+        else:
+            errno = 1048
+        return mysql.connector.errors.IntegrityError(msg=message, errno=errno)
+    if 'locked' in message or 'busy' in message:
+        # Retried like InnoDB's lock wait timeout
+        return mysql.connector.errors.DatabaseError(msg=message, errno=1205)
+    return mysql.connector.errors.DatabaseError(msg=message)
+
+def sqlite_value(value):
+    if isinstance(value, str) and len(value) == 19 and SQLITE_TIMESTAMP.fullmatch(value):
+        return datetime.fromisoformat(value)
+    return value
+
+class SqliteCursor:
+    """The subset of the mysql.connector cursor API the app uses, on sqlite3."""
+
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = conn.raw.cursor()
+        self._dictionary = dictionary
+        self.column_names = ()
+
+    def _run(self, method, sql, params):
+        translated, writes = translate_sqlite(sql)
+        try:
+            if writes:
+                self._conn.begin()
+            method(translated, params)
+        except sqlite3.Error as e:
+            raise sqlite_error(e, sql) from e
+        description = self._cursor.description
+        self.column_names = tuple(column[0] for column in description) if description else ()
+
+    def execute(self, sql, params=None):
+        self._run(self._cursor.execute, sql, tuple(params) if params else ())
+
+    def executemany(self, sql, seq_params):
+        self._run(self._cursor.executemany, sql, [tuple(params) for params in seq_params])
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def _row(self, row):
+        values = [sqlite_value(value) for value in row]
+        return dict(zip(self.column_names, values)) if self._dictionary else tuple(values)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return None if row is None else self._row(row)
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (self._row(row) for row in self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+class SqliteConnection:
+    """mysql.connector-style connection to the SQLite database file.
+
+    Writes take the database write lock up front (BEGIN IMMEDIATE) so a
+    SELECT ... FOR UPDATE followed by UPDATEs is serialized against other
+    writers the way InnoDB row locks serialize checkouts; plain reads outside
+    a transaction run in autocommit and never block on writers (WAL).
+    """
+
+    def __init__(self, path):
+        self.raw = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None,
+                                   check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self.raw.execute("PRAGMA foreign_keys = ON")
+        self.raw.execute("PRAGMA synchronous = NORMAL")
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def begin(self):
+        if not self.raw.in_transaction:
+            self.raw.execute("BEGIN IMMEDIATE")
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SqliteCursor(self, dictionary)
+
+    def commit(self):
+        if self.raw.in_transaction:
+            try:
+                self.raw.execute("COMMIT")
+            except sqlite3.Error as e:
+                raise sqlite_error(e, 'COMMIT') from e
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.execute("ROLLBACK")
+
+    def ping(self, **kwargs):
+        pass
+
+    def reconnect(self, **kwargs):
+        pass
+
+    def close(self):
+        self.raw.close()
+
+_sqlite_ready = False
+_sqlite_init_lock = threading.Lock()
+
+def init_sqlite_database(path):
+    """Create the schema and the admin user in a new SQLite database.
+
+    Returns True when the database was created. Safe to call from several
+    processes at once: the first one to take the write lock builds it.
+    """
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products'").fetchone():
+            conn.execute("ROLLBACK")
+            return False
+        statement = ''
+        with open(SQLITE_SCHEMA) as f:
+            for line in f:
+                statement += line
+                if sqlite3.complete_statement(statement):
+                    conn.execute(statement)
+                    statement = ''
+        conn.execute("INSERT INTO employees (id, username, password, role) VALUES (1, 'admin', ?, 'admin')",
+                     (generate_password_hash(SQLITE_ADMIN_PASSWORD, method=PASSWORD_HASH_METHOD),))
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    print(f"Created SQLite database {path} (user 'admin'; change its password after first login)")
+    return True
+
+def connect_database():
+    """Open a new connection to the configured backend."""
+    global _sqlite_ready
+    if DB_BACKEND != 'sqlite':
+        return mysql.connector.connect(**DB_CONFIG)
+    if not _sqlite_ready:
+        with _sqlite_init_lock:
+            if not _sqlite_ready:
+                try:
+                    init_sqlite_database(SQLITE_PATH)
+                except (sqlite3.Error, OSError) as e:
+                    raise mysql.connector.errors.DatabaseError(msg=f"SQLite setup failed: {e}") from e
+                _sqlite_ready = True
+    try:
+        return SqliteConnection(SQLITE_PATH)
+    except sqlite3.Error as e:
+        raise sqlite_error(e, '') from e
+
+# Connection Pool Configuration
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+DB_POOL_PING_INTERVAL = float(os.getenv('DB_POOL_PING_INTERVAL', 30))
+
+class PoolTimeout(Exception):
+    pass
+
+class ConnectionPool:
+    """Bounded pool of database connections shared by all request threads.
+
+    Connections are opened with ``connect`` lazily up to ``size``. A borrowed connection that
+    has been idle for longer than ``ping_interval`` seconds is pinged (and
+    reconnected if the server dropped it) before being handed out.
+    """
+
+    def __init__(self, connect, size=10, timeout=5, ping_interval=30):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = deque()
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._idle and self._created >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                else:
+                    conn, idle_since = None, None
+                    self._created += 1
+                self._in_use += 1
+            finally:
+                self._waiting -= 1
+            waited = time.monotonic() - started
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            if conn is None:
+                conn = self.connect()
+            elif time.monotonic() - idle_since >= self.ping_interval:
+                try:
+                    conn.ping()
+                except Error:
+                    with self._cond:
+                        self._reconnects += 1
+                    conn.reconnect(attempts=2, delay=0)
+        except Error:
+            if conn is None:
+                # connect() failed: there is only the slot to give back
+                self._discard()
+            else:
+                self.discard(conn)
+            raise
+        return conn
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Error:
+            self.discard(conn)
+            return
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, conn):
+        """Close a borrowed connection that must not be reused, freeing its slot."""
+        try:
+            conn.close()
+        except Error:
+            pass
+        self._discard()
+
+    def _discard(self):
+        with self._cond:
+            self._in_use -= 1
+            self._created -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            self.discard(conn)
+            raise
+        self.release(conn)
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._created -= 1
+                try:
+                    conn.close()
+                except Error:
+                    pass
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'reconnects': self._reconnects,
+                'wait_time_total': round(self._wait_total, 6),
+                'wait_time_avg': round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+                'wait_time_max': round(self._wait_max, 6),
+            }
+
+db_pool = ConnectionPool(connect_database, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                         ping_interval=DB_POOL_PING_INTERVAL)
+
+# Read replicas: comma-separated host[:port] list (MySQL only). Listing,
+# dashboard, report and export reads go to them; writes, checkout and every
+# other read stay on the primary.
+DB_REPLICAS = [address.strip() for address in os.getenv('DB_REPLICAS', '').split(',') if address.strip()]
+DB_REPLICA_USER = os.getenv('DB_REPLICA_USER') or DB_CONFIG['user']
+DB_REPLICA_PASSWORD = os.getenv('DB_REPLICA_PASSWORD') or DB_CONFIG['password']
+DB_REPLICA_POOL_SIZE = int(os.getenv('DB_REPLICA_POOL_SIZE', DB_POOL_SIZE))
+# A replica that refused a connection is skipped for this long
+DB_REPLICA_RETRY_SECONDS = float(os.getenv('DB_REPLICA_RETRY_SECONDS', 30))
+# After a user's own write their reads stay on the primary this long, so a
+# till sees its sale in recent sales even while the replicas catch up
+READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', 5))
+
+def replica_connector(address):
+    host, _, port = address.partition(':')
+    config = dict(DB_CONFIG, host=host, user=DB_REPLICA_USER, password=DB_REPLICA_PASSWORD)
+    if port:
+        config['port'] = int(port)
+    return lambda: mysql.connector.connect(**config)
+
+class ReplicaSet:
+    """Round-robin over one connection pool per read replica.
+
+    A replica that fails to connect is left out for ``retry_after`` seconds;
+    when none can give a connection the caller falls back to the primary.
+    """
+
+    def __init__(self, addresses, size=10, timeout=5, ping_interval=30, retry_after=30):
+        self.addresses = addresses
+        self.pools = [ConnectionPool(replica_connector(address), size=size, timeout=timeout,
+                                     ping_interval=ping_interval) for address in addresses]
+        self.retry_after = retry_after
+        self._down_until = [0.0] * len(addresses)
+        self._next = 0
+        self._reads = 0
+        self._fallbacks = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Return ``(pool, conn)`` from the next healthy replica, or ``(None, None)``."""
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.pools)
+        for offset in range(len(self.pools)):
+            index = (start + offset) % len(self.pools)
+            if self._down_until[index] > time.monotonic():
+                continue
+            pool = self.pools[index]
+            try:
+                conn = pool.acquire()
+            except PoolTimeout as e:
+                print(f"Replica {self.addresses[index]} busy: {e}")
+                continue
+            except Error as e:
+                print(f"Replica {self.addresses[index]} connection error: {e}")
+                self._down_until[index] = time.monotonic() + self.retry_after
+                continue
+            with self._lock:
+                self._reads += 1
+            return pool, conn
+        with self._lock:
+            self._fallbacks += 1
+        return None, None
+
+    def close_all(self):
+        for pool in self.pools:
+            pool.close_all()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            reads, fallbacks = self._reads, self._fallbacks
+        return {
+            'reads': reads,
+            'fallbacks': fallbacks,
+            'read_your_writes_seconds': READ_YOUR_WRITES_SECONDS,
+            'replicas': [dict(pool.stats(), address=address, available=down_until <= now)
+                         for address, pool, down_until in zip(self.addresses, self.pools, self._down_until)],
+        }
+
+replica_set = (ReplicaSet(DB_REPLICAS, size=DB_REPLICA_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                          ping_interval=DB_POOL_PING_INTERVAL, retry_after=DB_REPLICA_RETRY_SECONDS)
+               if DB_REPLICAS and DB_BACKEND == 'mysql' else None)
+
+# Request metrics
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+# Scrapers send "Authorization: Bearer <token>"; without a token only a
+# logged-in admin can read /metrics
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Shared directory for per-worker snapshots so /metrics covers every worker
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500))
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TRACE_MAX_STATEMENTS = 200
+
+# Query debugging (on under app.run(debug=True) or with QUERY_DEBUG): flags
+# repeated statement shapes and EXPLAINs slow SELECTs for every request
+QUERY_DEBUG = os.getenv('QUERY_DEBUG', 'False').lower() == 'true'
+QUERY_DEBUG_REPEAT = int(os.getenv('QUERY_DEBUG_REPEAT', 5))
+QUERY_DEBUG_EXPLAIN_MS = float(os.getenv('QUERY_DEBUG_EXPLAIN_MS', 20))
+QUERY_DEBUG_SCAN_ROWS = int(os.getenv('QUERY_DEBUG_SCAN_ROWS', 1000))
+QUERY_DEBUG_MAX_EXPLAINS = 5
+
+def query_debug_enabled():
+    return QUERY_DEBUG or app.debug
+
+def statement_shape(sql):
+    """SQL with literals and placeholder lists folded, so loop iterations compare equal."""
+    sql = ' '.join(str(sql).split())
+    sql = re.sub(r"'(?:[^'\\]|\\.|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'%s', '?', sql)
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(...)', sql)
+    return re.sub(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+', '(...)', sql)
+
+class RequestTrace:
+    """Statements, rows and phase timings collected while serving one request."""
+
+    def __init__(self, detect=False):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.phases = {}
+        self.statements = []
+        self.shapes = {} if detect else None
+
+    def statement(self, sql, params, seconds):
+        self.queries += 1
+        self.db_time += seconds
+        if len(self.statements) < TRACE_MAX_STATEMENTS:
+            self.statements.append([sql, params, seconds])
+        if self.shapes is not None:
+            shape = statement_shape(sql)
+            self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def fetched(self, rows, seconds):
+        self.rows += rows
+        self.db_time += seconds
+        if self.statements:
+            self.statements[-1][2] += seconds
+
+    def phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+def current_trace():
+    if (METRICS_ENABLED or QUERY_DEBUG or app.debug) and has_request_context():
+        return g.get('trace')
+    return None
+
+class InstrumentedCursor:
+    """Cursor proxy that reports statement time and fetched rows to a RequestTrace."""
+
+    def __init__(self, cursor, trace):
+        self._cursor = cursor
+        self._trace = trace
+
+    def execute(self, operation, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, *args, **kwargs)
+        finally:
+            params = args[0] if args else kwargs.get('params')
+            self._trace.statement(operation, params, time.perf_counter() - started)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._trace.statement(operation, None, time.perf_counter() - started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._trace.fetched(row is not None, time.perf_counter() - started)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._trace.fetched(len(rows), time.perf_counter() - started)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._trace.fetched(len(rows), time.perf_counter() - started)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class InstrumentedConnection:
+    """Connection proxy handing out InstrumentedCursors; everything else passes through."""
+
+    def __init__(self, conn, trace):
+        self._conn = conn
+        self._trace = trace
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._trace)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return self._conn.commit()
+        finally:
+            self._trace.statement('COMMIT', None, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class MetricsRegistry:
+    """Per-endpoint request latency histograms and database counters.
+
+    Each worker process keeps its own series; with METRICS_DIR set they also
+    write periodic JSON snapshots there, and /metrics sums every snapshot.
+    """
+
+    def __init__(self, buckets, directory=''):
+        self.buckets = buckets
+        self.directory = directory
+        self._series = {}
+        self._lock = threading.Lock()
+        self._flushed = 0.0
+
+    def observe(self, endpoint, method, status, seconds, trace):
+        key = (endpoint, method, str(status))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'sum': 0.0, 'count': 0, 'queries': 0, 'db_time': 0.0, 'rows': 0, 'phases': {}
+                }
+            index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+            series['buckets'][index] += 1
+            series['sum'] += seconds
+            series['count'] += 1
+            series['queries'] += trace.queries
+            series['db_time'] += trace.db_time
+            series['rows'] += trace.rows
+            for name, value in trace.phases.items():
+                series['phases'][name] = series['phases'].get(name, 0.0) + value
+        if self.directory and time.monotonic() - self._flushed >= METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), json.loads(json.dumps(series))] for key, series in self._series.items()]
+
+    def flush(self):
+        self._flushed = time.monotonic()
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(f"{path}.tmp", 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            print(f"Metrics flush error: {e}")
+
+    def collect(self):
+        """Series from this process plus every other worker's latest snapshot."""
+        snapshots = [self.snapshot()]
+        if self.directory:
+            own = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                if path == own:
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        merged = {}
+        for snapshot in snapshots:
+            for key, series in snapshot:
+                total = merged.setdefault(tuple(key), {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'sum': 0.0, 'count': 0, 'queries': 0, 'db_time': 0.0, 'rows': 0, 'phases': {}
+                })
+                total['buckets'] = [a + b for a, b in zip(total['buckets'], series['buckets'])]
+                for field in ('sum', 'count', 'queries', 'db_time', 'rows'):
+                    total[field] += series[field]
+                for name, value in series['phases'].items():
+                    total['phases'][name] = total['phases'].get(name, 0.0) + value
+        return merged
+
+    def render(self):
+        """Prometheus text exposition format."""
+        merged = self.collect()
+        lines = []
+
+        def labels(key, **extra):
+            pairs = list(zip(('endpoint', 'method', 'status'), key)) + list(extra.items())
+            return ','.join(f'{name}="{value}"' for name, value in pairs)
+
+        lines.append('# HELP oilshop_http_request_duration_seconds Request latency by Flask endpoint.')
+        lines.append('# TYPE oilshop_http_request_duration_seconds histogram')
+        for key, series in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series['buckets']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'oilshop_http_request_duration_seconds_bucket{{{labels(key, le=le)}}} {cumulative}')
+            lines.append(f'oilshop_http_request_duration_seconds_sum{{{labels(key)}}} {series["sum"]:.6f}')
+            lines.append(f'oilshop_http_request_duration_seconds_count{{{labels(key)}}} {series["count"]}')
+        for name, field, kind, help_text in (
+            ('oilshop_db_queries_total', 'queries', 'counter', 'SQL statements executed.'),
+            ('oilshop_db_query_seconds_total', 'db_time', 'counter', 'Time spent executing and fetching SQL.'),
+            ('oilshop_db_rows_total', 'rows', 'counter', 'Rows fetched from the database.'),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key, series in sorted(merged.items()):
+                lines.append(f'{name}{{{labels(key)}}} {series[field]}')
+        lines.append('# HELP oilshop_request_phase_seconds_total Time spent getting a connection and loading the user.')
+        lines.append('# TYPE oilshop_request_phase_seconds_total counter')
+        for key, series in sorted(merged.items()):
+            for phase, value in sorted(series['phases'].items()):
+                lines.append(f'oilshop_request_phase_seconds_total{{{labels(key, phase=phase)}}} {value:.6f}')
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry(METRICS_BUCKETS, METRICS_DIR)
+
+def describe_statement(sql, limit=300):
+    sql = ' '.join(str(sql).split())
+    return sql if len(sql) <= limit else sql[:limit] + '...'
+
+def log_slow_request(trace, seconds):
+    phases = ', '.join(f"{name} {value * 1000:.1f} ms" for name, value in trace.phases.items())
+    print(f"Slow request: {request.method} {request.full_path.rstrip('?')} {seconds * 1000:.1f} ms "
+          f"(db {trace.db_time * 1000:.1f} ms in {trace.queries} statements, {trace.rows} rows"
+          f"{', ' + phases if phases else ''})")
+    for sql, _, elapsed in trace.statements:
+        print(f"  {elapsed * 1000:8.1f} ms  {describe_statement(sql)}")
+
+def explain_warnings(sql, params):
+    """EXPLAIN a SELECT on a spare connection; returns full-scan / unused-index warnings."""
+    warnings = []
+    try:
+        with db_pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(('EXPLAIN QUERY PLAN ' if DB_BACKEND == 'sqlite' else 'EXPLAIN ') + sql, params or ())
+                plan = cursor.fetchall()
+            finally:
+                cursor.close()
+    except (Error, PoolTimeout) as e:
+        return [f"EXPLAIN failed: {e}"]
+    if DB_BACKEND == 'sqlite':
+        # SQLite gives no row estimates; any scan that is not through an index is reported
+        return [f"full scan ({step['detail']})" for step in plan
+                if step['detail'].startswith('SCAN ') and 'INDEX' not in step['detail']]
+    for step in plan:
+        table = step.get('table') or '?'
+        if step.get('type') == 'ALL' and (step.get('rows') or 0) >= QUERY_DEBUG_SCAN_ROWS:
+            warnings.append(f"full scan of {table} (~{step['rows']} rows)")
+        if step.get('possible_keys') and not step.get('key'):
+            warnings.append(f"{table} does not use available index {step['possible_keys']}")
+    return warnings
+
+def query_report(trace):
+    """Warnings for repeated statement shapes and slow SELECTs with poor plans."""
+    warnings = []
+    for shape, count in trace.shapes.items():
+        if count >= QUERY_DEBUG_REPEAT:
+            warnings.append(f"N+1: {count}x {describe_statement(shape, 120)}")
+    
+    slow = [s for s in trace.statements
+            if s[2] * 1000 >= QUERY_DEBUG_EXPLAIN_MS and str(s[0]).lstrip().upper().startswith('SELECT')]
+    seen = set()
+    for sql, params, seconds in sorted(slow, key=lambda s: -s[2]):
+        shape = statement_shape(sql)
+        if shape in seen or len(seen) >= QUERY_DEBUG_MAX_EXPLAINS:
+            continue
+        seen.add(shape)
+        for warning in explain_warnings(sql, params):
+            warnings.append(f"{warning} in {seconds * 1000:.1f} ms {describe_statement(sql, 120)}")
+    return warnings
+
+@app.before_request
+def start_request_trace():
+    if METRICS_ENABLED or query_debug_enabled():
+        g.trace = RequestTrace(detect=query_debug_enabled())
+
+@app.after_request
+def record_request_trace(response):
+    trace = g.get('trace')
+    if trace is None:
+        return response
+    seconds = time.perf_counter() - trace.started
+    if METRICS_ENABLED:
+        metrics.observe(request.endpoint or 'unmatched', request.method, response.status_code, seconds, trace)
+    if seconds * 1000 >= SLOW_REQUEST_MS:
+        log_slow_request(trace, seconds)
+    if trace.shapes is not None:
+        warnings = query_report(trace)
+        for warning in warnings:
+            print(f"Query warning: {request.method} {request.path}: {warning}")
+        summary = f"{trace.queries} statements, {trace.db_time * 1000:.1f} ms"
+        if warnings:
+            summary += '; ' + '; '.join(warnings)
+        response.headers['X-Query-Report'] = summary.encode('ascii', 'replace').decode()[:1000]
+    return response
+
+@app.after_request
+def mark_recent_write(response):
+    # Pins this session's reads to the primary for READ_YOUR_WRITES_SECONDS after a
+    # successful write; logging in writes nothing the replicas could lag behind on
+    if (replica_set is not None and request.method in ('POST', 'PUT', 'PATCH', 'DELETE')
+            and response.status_code < 400 and request.endpoint != 'login'):
+        session['wrote_at'] = time.time()
+    return response
+
+def reads_pinned_to_primary():
+    return has_request_context() and time.time() - session.get('wrote_at', 0) < READ_YOUR_WRITES_SECONDS
+
+@contextmanager
+def get_db_connection(read_only=False):
+    """Borrow a pooled connection for the duration of a ``with`` block.
+
+    With ``read_only`` the connection comes from a read replica when one is
+    configured and the user has not written anything in the last
+    READ_YOUR_WRITES_SECONDS; ``g.replica_read`` then tells the route so.
+    Yields ``None`` when no connection could be obtained so routes can keep
+    answering with their usual "Database connection failed" response.
+    If the block raises, including a streaming generator being closed early,
+    the connection may still have unread results and is discarded.
+    """
+    trace = current_trace()
+    started = time.perf_counter()
+    pool, conn = db_pool, None
+    if read_only and replica_set is not None and not reads_pinned_to_primary():
+        replica_pool, conn = replica_set.acquire()
+        if conn is not None:
+            pool = replica_pool
+    if conn is None:
+        try:
+            conn = db_pool.acquire()
+        except (Error, PoolTimeout) as e:
+            print(f"Database connection error: {e}")
+            conn = None
+    if has_request_context():
+        g.replica_read = pool is not db_pool
+    if trace is not None:
+        trace.phase('db_connect', time.perf_counter() - started)
+    try:
+        yield InstrumentedConnection(conn, trace) if trace is not None and conn is not None else conn
+    except BaseException:
+        if conn is not None:
+            pool.discard(conn)
+            conn = None
+        raise
+    finally:
+        if conn is not None:
+            pool.release(conn)
+
 # Flask-Login setup
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -38,26 +909,292 @@ class User(UserMixin):
         self.username = username
         self.role = role
 
+# Cross-process cache coordination
+CACHE_STAMP_DIR = os.getenv('CACHE_STAMP_DIR') or tempfile.gettempdir()
+
+class SharedGeneration:
+    """Generation token shared by worker processes through a small stamp file.
+
+    Writers call ``bump()`` after changing data that other workers may hold in
+    memory; readers call ``changed()`` to learn whether a sibling bumped it.
+    """
+
+    def __init__(self, name):
+        self.path = os.path.join(CACHE_STAMP_DIR, f"{DB_CONFIG['database']}_{name}.stamp")
+        self._seen = self.read()
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def changed(self):
+        current = self.read()
+        if current != self._seen:
+            self._seen = current
+            return True
+        return False
+
+    def bump(self):
+        generation = uuid.uuid4().hex
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(generation)
+            os.replace(tmp_path, self.path)
+            self._seen = generation
+        except OSError as e:
+            print(f"Cache stamp error: {e}")
+
+# Authenticated-user cache
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 256))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 30))
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize=256, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+user_cache_generation = SharedGeneration('users')
+
+def invalidate_user_cache(user_id=None):
+    if user_id is None:
+        user_cache.clear()
+    else:
+        user_cache.invalidate(str(user_id))
+    user_cache_generation.bump()
+
 @login_manager.user_loader
 def load_user(user_id):
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM employees WHERE id = %s", (user_id,))
-        user_data = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        if user_data:
-            return User(user_data['id'], user_data['username'], user_data['role'])
+    trace = current_trace()
+    if trace is None:
+        return fetch_user(user_id)
+    started = time.perf_counter()
+    try:
+        return fetch_user(user_id)
+    finally:
+        trace.phase('load_user', time.perf_counter() - started)
+
+def fetch_user(user_id):
+    # Another worker added or removed an employee; drop what we hold.
+    if user_cache_generation.changed():
+        user_cache.clear()
+    user = user_cache.get(str(user_id))
+    if user is not None:
+        return user
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT id, username, role FROM employees WHERE id = %s", (user_id,))
+            user_data = cursor.fetchone()
+            cursor.close()
+            if user_data:
+                user = User(user_data['id'], user_data['username'], user_data['role'])
+                user_cache.set(str(user_id), user)
+                return user
     return None
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
-    except Error as e:
-        print(f"Database connection error: {e}")
-        return None
+# Password hashing
+# Any werkzeug method string, e.g. scrypt:32768:8:1 or pbkdf2:sha256:600000.
+# Stored hashes made with other parameters are upgraded on the next login.
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 32))
+
+class HashPoolBusy(Exception):
+    pass
+
+class PasswordHasher:
+    """Runs password hashing on a small thread pool so logins can't starve requests.
+
+    hashlib releases the GIL while hashing, so at most ``workers`` cores are
+    spent on it at once. Callers beyond ``workers + queue_size`` are refused
+    with HashPoolBusy instead of piling up behind a login storm.
+    """
+
+    def __init__(self, workers, queue_size, method):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.method = method
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._prefix = None
+        self._queue_times = deque(maxlen=1000)
+        self._hash_times = deque(maxlen=1000)
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _run(self, submitted, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._queue_times.append(started - submitted)
+                self._hash_times.append(time.perf_counter() - started)
+                self.in_flight -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def _call(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashPoolBusy()
+        with self._lock:
+            self.in_flight += 1
+        return self._executor.submit(self._run, time.perf_counter(), fn, *args).result()
+
+    def verify(self, pwhash, password):
+        return self._call(check_password_hash, pwhash, password)
+
+    def hash(self, password):
+        return self._call(generate_password_hash, password, self.method)
+
+    def needs_rehash(self, pwhash):
+        if self._prefix is None:
+            # werkzeug fills in default parameters, so learn the stored form once
+            self._prefix = self.hash('').split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._prefix
+
+    def stats(self):
+        with self._lock:
+            queue_ms = sorted(t * 1000 for t in self._queue_times)
+            hash_ms = [t * 1000 for t in self._hash_times]
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'queue_ms_avg': round(sum(queue_ms) / len(queue_ms), 2) if queue_ms else 0.0,
+                'queue_ms_p95': round(queue_ms[int(len(queue_ms) * 0.95)], 2) if queue_ms else 0.0,
+                'queue_ms_max': round(queue_ms[-1], 2) if queue_ms else 0.0,
+                'hash_ms_avg': round(sum(hash_ms) / len(hash_ms), 2) if hash_ms else 0.0,
+            }
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE, PASSWORD_HASH_METHOD)
+
+# Failed-login throttling
+MAX_LOGIN_ATTEMPTS = int(os.getenv('MAX_LOGIN_ATTEMPTS', 5))
+MAX_LOGIN_ATTEMPTS_PER_IP = int(os.getenv('MAX_LOGIN_ATTEMPTS_PER_IP', 20))
+LOGIN_THROTTLE_WINDOW = float(os.getenv('LOGIN_THROTTLE_WINDOW', 300))
+
+class LoginThrottle:
+    """Sliding-window counts of failed logins per username and per client address.
+
+    Checked before any password hashing, so a flood of guesses costs a dict
+    lookup rather than a hash. Counts are kept per worker process.
+    """
+
+    def __init__(self, max_attempts, max_attempts_per_ip, window, maxsize=10000):
+        self.limits = {'user': max_attempts, 'ip': max_attempts_per_ip}
+        self.window = window
+        self.maxsize = maxsize
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+        self.blocked = 0
+
+    def _keys(self, username, address):
+        return [('user', str(username).lower()), ('ip', address)]
+
+    def check(self, username, address):
+        """Seconds until another attempt is allowed, or 0."""
+        now = time.monotonic()
+        wait = 0
+        with self._lock:
+            for key in self._keys(username, address):
+                failures = self._failures.get(key)
+                if not failures:
+                    continue
+                while failures and failures[0] <= now - self.window:
+                    failures.popleft()
+                if len(failures) >= self.limits[key[0]]:
+                    wait = max(wait, failures[0] + self.window - now)
+            if wait:
+                self.blocked += 1
+        return int(wait) + 1 if wait else 0
+
+    def fail(self, username, address):
+        now = time.monotonic()
+        with self._lock:
+            for key in self._keys(username, address):
+                failures = self._failures.pop(key, None) or deque(maxlen=max(self.limits.values()))
+                failures.append(now)
+                self._failures[key] = failures
+            while len(self._failures) > self.maxsize:
+                self._failures.popitem(last=False)
+
+    def reset(self, username):
+        with self._lock:
+            self._failures.pop(('user', str(username).lower()), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_attempts': self.limits['user'],
+                'max_attempts_per_ip': self.limits['ip'],
+                'window': self.window,
+                'tracked': len(self._failures),
+                'blocked': self.blocked,
+            }
+
+login_throttle = LoginThrottle(MAX_LOGIN_ATTEMPTS, MAX_LOGIN_ATTEMPTS_PER_IP, LOGIN_THROTTLE_WINDOW)
 
 def role_required(*roles):
     def decorator(f):
@@ -69,6 +1206,387 @@ def role_required(*roles):
         return decorated_function
     return decorator
 
+# Product barcode index
+PRODUCT_SELECT = """
+    SELECT p.*, s.name as supplier_name 
+    FROM products p 
+    LEFT JOIN suppliers s ON p.supplier_id = s.id
+"""
+# Rows committed by other workers can carry an updated_at slightly older than
+# the newest row we have already seen, so delta reads look back this far.
+PRODUCT_INDEX_OVERLAP = timedelta(seconds=int(os.getenv('PRODUCT_INDEX_OVERLAP', 5)))
+
+PRODUCT_SEARCH_LIMIT = int(os.getenv('PRODUCT_SEARCH_LIMIT', 10))
+PRODUCT_SEARCH_MAX_LIMIT = 50
+# 'memory' answers from the trigram index below; 'fulltext' queries the
+# ft_product_search index instead, for catalogues too big to keep in RAM.
+# SQLite has no FULLTEXT index, so it always uses 'memory'.
+PRODUCT_SEARCH_BACKEND = os.getenv('PRODUCT_SEARCH_BACKEND', 'memory').lower() if DB_BACKEND == 'mysql' else 'memory'
+
+class ProductSearchIndex:
+    """Word postings over product name, barcode and category.
+
+    A query term of three or more characters matches every word containing
+    it, found through the trigrams of the vocabulary; a shorter term matches
+    the start of a word. Ranking walks the ranks best first over name and
+    barcode orderings that are re-sorted lazily after a product changes, so
+    a broad query only looks at as many products as it returns.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    @staticmethod
+    def normalize(value):
+        return ' '.join(str(value or '').lower().split())
+
+    @staticmethod
+    def _keys(word):
+        return ({word[i:i + 3] for i in range(len(word) - 2)},
+                {word[:n] for n in (1, 2) if len(word) >= n})
+
+    def add(self, product_id, row):
+        text = self.normalize(' '.join(str(row.get(f) or '') for f in ('name', 'barcode', 'category')))
+        if self._text.get(product_id) == text:
+            return
+        self.discard(product_id)
+        self._text[product_id] = text
+        name = self.normalize(row.get('name'))
+        self._keys_by_id[product_id] = (name, str(row.get('barcode') or '').lower())
+        for word in set(text.split()):
+            postings = self._words.get(word)
+            if postings is None:
+                postings = self._words[word] = set()
+                grams, prefixes = self._keys(word)
+                for vocabulary, keys in ((self._grams, grams), (self._prefixes, prefixes)):
+                    for key in keys:
+                        vocabulary.setdefault(key, set()).add(word)
+            postings.add(product_id)
+        for word in set(name.split()):
+            self._name_words.setdefault(word, set()).add(product_id)
+        self._sorted = False
+
+    def discard(self, product_id):
+        text = self._text.pop(product_id, None)
+        if text is None:
+            return
+        name, _ = self._keys_by_id.pop(product_id)
+        for word in set(text.split()):
+            postings = self._words[word]
+            postings.discard(product_id)
+            if postings:
+                continue
+            del self._words[word]
+            grams, prefixes = self._keys(word)
+            for vocabulary, keys in ((self._grams, grams), (self._prefixes, prefixes)):
+                for key in keys:
+                    words = vocabulary[key]
+                    words.discard(word)
+                    if not words:
+                        del vocabulary[key]
+        for word in set(name.split()):
+            postings = self._name_words[word]
+            postings.discard(product_id)
+            if not postings:
+                del self._name_words[word]
+        self._sorted = False
+
+    def clear(self):
+        self._text = {}
+        self._keys_by_id = {}
+        self._words = {}
+        self._name_words = {}
+        self._grams = {}
+        self._prefixes = {}
+        self._sorted = False
+        self._by_name = []
+        self._name_keys = []
+        self._position = {}
+        self._barcode_keys = []
+        self._barcode_ids = []
+        self._name_vocabulary = []
+
+    def _sort(self):
+        if self._sorted:
+            return
+        by_name = sorted(self._keys_by_id.items(), key=lambda item: (item[1][0], item[0]))
+        self._by_name = [pid for pid, _ in by_name]
+        self._name_keys = [name for _, (name, _) in by_name]
+        self._position = {pid: index for index, pid in enumerate(self._by_name)}
+        by_barcode = sorted((barcode, pid) for pid, (_, barcode) in self._keys_by_id.items())
+        self._barcode_keys = [barcode for barcode, _ in by_barcode]
+        self._barcode_ids = [pid for _, pid in by_barcode]
+        self._name_vocabulary = sorted(self._name_words)
+        self._sorted = True
+
+    def _matching_words(self, term):
+        if len(term) < 3:
+            return self._prefixes.get(term, ())
+        vocabularies = sorted((self._grams.get(term[i:i + 3], set()) for i in range(len(term) - 2)), key=len)
+        return [word for word in vocabularies[0].intersection(*vocabularies[1:]) if term in word]
+
+    def candidates(self, query):
+        """Ids matching every term of a normalized query, or None for an empty query."""
+        terms = [[self._words[word] for word in self._matching_words(term)] for term in query.split()]
+        if not terms:
+            return None
+        # Start from the most selective term so later ones only filter a small set
+        terms.sort(key=lambda postings: sum(map(len, postings)))
+        result = set().union(*terms[0])
+        for postings in terms[1:]:
+            if not result:
+                break
+            result = set().union(*(result & ids for ids in postings))
+        return result
+
+    def _first_by_name(self, ids, count):
+        """The ``count`` of ``ids`` that come first by name."""
+        if count <= 0 or not ids:
+            return []
+        # Walking the name order meets a large set early; a small one is cheaper to sort
+        if len(ids) * len(ids) >= count * len(self._by_name):
+            found = []
+            for pid in self._by_name:
+                if pid in ids:
+                    found.append(pid)
+                    if len(found) == count:
+                        break
+            return found
+        return [self._by_name[index] for index in heapq.nsmallest(count, map(self._position.__getitem__, ids))]
+
+    @staticmethod
+    def _prefix_range(keys, prefix):
+        """Slice bounds of the sorted ``keys`` that start with ``prefix``."""
+        return bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, prefix + chr(0x10ffff))
+
+    def top(self, ids, query, limit):
+        """The best ``limit`` of ``ids`` for ``query``, ties broken by name.
+
+        Ranks, best first: exact barcode, name prefix, every term starting a
+        word of the name, barcode prefix, anything else. A rank is only
+        looked at while fewer than ``limit`` products have been found.
+        """
+        self._sort()
+        chosen = []
+        seen = set()
+
+        def take(tier):
+            for pid in self._first_by_name(tier - seen, limit - len(chosen)):
+                chosen.append(pid)
+                seen.add(pid)
+            return len(chosen) >= limit
+
+        start, end = self._prefix_range(self._barcode_keys, query)
+        if start < end and self._barcode_keys[start] == query and take({self._barcode_ids[start]} & ids):
+            return chosen
+
+        name_start, name_end = self._prefix_range(self._name_keys, query)
+        for index in range(name_start, name_end):
+            pid = self._by_name[index]
+            if pid in ids and pid not in seen:
+                chosen.append(pid)
+                seen.add(pid)
+                if len(chosen) >= limit:
+                    return chosen
+
+        terms = query.split()
+        if terms:
+            word_starts = ids - seen
+            for term in terms:
+                first, last = self._prefix_range(self._name_vocabulary, term)
+                word_starts = set().union(*(word_starts & self._name_words[word]
+                                            for word in self._name_vocabulary[first:last]))
+                if not word_starts:
+                    break
+            if take(word_starts):
+                return chosen
+
+        if take(set(self._barcode_ids[start:end]) & ids):
+            return chosen
+        take(ids - seen)
+        return chosen
+
+    def stats(self):
+        return {
+            'terms': len(self._words),
+            'documents': len(self._text),
+        }
+
+class ProductIndex:
+    """In-memory barcode -> product map serving the checkout scan path.
+
+    Rows have the same shape ``/api/products`` returns. Writes made by this
+    process update the map directly; writes made by other workers are picked
+    up through shared generations, with a delta read on ``updated_at`` for
+    changed rows and a full rebuild after deletes or supplier edits.
+    """
+
+    def __init__(self):
+        self._by_barcode = {}
+        self._barcode_by_id = {}
+        self._lock = threading.RLock()
+        self._watermark = None
+        self.loaded = False
+        self.writes = SharedGeneration('products')
+        self.removals = SharedGeneration('products_full')
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.refreshes = 0
+        self.searches = 0
+        self.search_index = ProductSearchIndex()
+
+    def _fetch(self, where=None, params=()):
+        with get_db_connection() as conn:
+            if not conn:
+                return None
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(PRODUCT_SELECT + (f" WHERE {where}" if where else ""), params)
+            rows = cursor.fetchall()
+            cursor.close()
+            return rows
+
+    def _put(self, row):
+        old_barcode = self._barcode_by_id.get(row['id'])
+        if old_barcode is not None and old_barcode != row['barcode']:
+            self._by_barcode.pop(old_barcode, None)
+        self._by_barcode[row['barcode']] = row
+        self._barcode_by_id[row['id']] = row['barcode']
+        self.search_index.add(row['id'], row)
+        updated_at = row.get('updated_at')
+        if updated_at and (self._watermark is None or updated_at > self._watermark):
+            self._watermark = updated_at
+
+    def _pop(self, product_id):
+        barcode = self._barcode_by_id.pop(product_id, None)
+        if barcode is not None:
+            self._by_barcode.pop(barcode, None)
+        self.search_index.discard(product_id)
+
+    def rebuild(self):
+        with self._lock:
+            rows = self._fetch()
+            if rows is None:
+                return False
+            self._by_barcode = {}
+            self._barcode_by_id = {}
+            self._watermark = None
+            self.search_index.clear()
+            for row in rows:
+                self._put(row)
+            self.loaded = True
+            self.rebuilds += 1
+            return True
+
+    def refresh(self):
+        with self._lock:
+            if self._watermark is None:
+                return self.rebuild()
+            rows = self._fetch("p.updated_at >= %s", (self._watermark - PRODUCT_INDEX_OVERLAP,))
+            if rows is None:
+                return False
+            for row in rows:
+                self._put(row)
+            self.refreshes += 1
+            return True
+
+    def sync(self):
+        removed = self.removals.changed()
+        written = self.writes.changed()
+        if removed or not self.loaded:
+            self.rebuild()
+        elif written:
+            self.refresh()
+
+    def get(self, barcode):
+        self.sync()
+        row = self._by_barcode.get(barcode)
+        if row is not None:
+            self.hits += 1
+            return row
+        self.misses += 1
+        rows = self._fetch("p.barcode = %s", (barcode,))
+        if not rows:
+            return None
+        with self._lock:
+            self._put(rows[0])
+        return rows[0]
+
+    def search(self, query, limit=PRODUCT_SEARCH_LIMIT):
+        """Top ``limit`` products matching every term of ``query``, best first."""
+        self.sync()
+        query = ProductSearchIndex.normalize(query)
+        with self._lock:
+            ids = self.search_index.candidates(query)
+            if ids is None:
+                ids = self._barcode_by_id.keys()
+            self.searches += 1
+            return [self._by_barcode[self._barcode_by_id[pid]]
+                    for pid in self.search_index.top(ids, query, limit)]
+
+    def reload(self, product_ids):
+        """Write-through for rows this process just inserted or updated."""
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with self._lock:
+            rows = self._fetch(f"p.id IN ({placeholders})", product_ids)
+            if rows is None:
+                self.loaded = False
+                return
+            found = set()
+            for row in rows:
+                self._put(row)
+                found.add(row['id'])
+            for product_id in product_ids:
+                if product_id not in found:
+                    self._pop(product_id)
+        self.writes.bump()
+
+    def set_quantities(self, quantities):
+        """Apply post-commit stock levels as ``{product_id: (quantity, updated_at)}``."""
+        with self._lock:
+            for product_id, (quantity, updated_at) in quantities.items():
+                barcode = self._barcode_by_id.get(product_id)
+                if barcode is None:
+                    continue
+                row = dict(self._by_barcode[barcode])
+                row['quantity'] = quantity
+                row['updated_at'] = updated_at
+                self._put(row)
+        self.writes.bump()
+
+    def remove(self, product_id):
+        with self._lock:
+            self._pop(product_id)
+        self.removals.bump()
+
+    def invalidate(self):
+        self.loaded = False
+        self.removals.bump()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'loaded': self.loaded,
+            'products': len(self._by_barcode),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'rebuilds': self.rebuilds,
+            'refreshes': self.refreshes,
+            'searches': self.searches,
+            'search_index': self.search_index.stats(),
+            'watermark': self._watermark.isoformat() if self._watermark else None,
+        }
+
+product_index = ProductIndex()
+
+def warm_caches():
+    """Fill the in-process caches; serve.py runs this once before forking workers."""
+    return product_index.rebuild()
+
 # Routes
 @app.route('/')
 def index():
@@ -80,26 +1598,60 @@ def index():
 def login():
     if request.method == 'POST':
         data = request.get_json()
-        username = data.get('username')
-        password = data.get('password')
+        username = data.get('username') or ''
+        password = data.get('password') or ''
         
-        conn = get_db_connection()
-        if conn:
+        retry_after = login_throttle.check(username, request.remote_addr)
+        if retry_after:
+            return jsonify({'success': False, 'message': 'Too many failed attempts, try again later'}), \
+                429, {'Retry-After': str(retry_after)}
+        
+        with get_db_connection() as conn:
+            if not conn:
+                return jsonify({'success': False, 'message': 'Database connection failed'}), 500
             cursor = conn.cursor(dictionary=True)
             cursor.execute("SELECT * FROM employees WHERE username = %s", (username,))
             user_data = cursor.fetchone()
             cursor.close()
-            conn.close()
-            
-            if user_data and check_password_hash(user_data['password'], password):
-                user = User(user_data['id'], user_data['username'], user_data['role'])
-                login_user(user)
-                return jsonify({'success': True, 'role': user_data['role']})
-            
+        
+        # The connection goes back to the pool before the slow hash
+        try:
+            valid = user_data is not None and password_hasher.verify(user_data['password'], password)
+            if valid and password_hasher.needs_rehash(user_data['password']):
+                rehash_password(user_data, password)
+        except HashPoolBusy:
+            return jsonify({'success': False, 'message': 'Server busy, please try again'}), \
+                503, {'Retry-After': '1'}
+        
+        if valid:
+            login_throttle.reset(username)
+            user = User(user_data['id'], user_data['username'], user_data['role'])
+            login_user(user)
+            user_cache.set(str(user.id), user)
+            return jsonify({'success': True, 'role': user_data['role']})
+        
+        login_throttle.fail(username, request.remote_addr)
         return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
     
     return render_template('login.html')
 
+def rehash_password(user_data, password):
+    """Store the password again with the current PASSWORD_HASH_METHOD."""
+    new_hash = password_hasher.hash(password)
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor()
+            try:
+                # Skip if the password was changed while we were hashing
+                cursor.execute("UPDATE employees SET password = %s WHERE id = %s AND password = %s",
+                               (new_hash, user_data['id'], user_data['password']))
+                conn.commit()
+            except Error as e:
+                conn.rollback()
+                print(f"Password rehash failed: {e}")
+            finally:
+                cursor.close()
+
 @app.route('/logout')
 @login_required
 def logout():
@@ -141,70 +1693,149 @@ def users_page():
 # API Endpoints
 
 # Product APIs
-@app.route('/api/products', methods=['GET'])
-@login_required
-def get_products():
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT p.*, s.name as supplier_name 
-            FROM products p 
-            LEFT JOIN suppliers s ON p.supplier_id = s.id
-            ORDER BY p.name
-        """)
+# Deleted ids are kept this long; clients syncing from an older watermark get
+# a full snapshot instead of a delta.
+PRODUCT_TOMBSTONE_DAYS = int(os.getenv('PRODUCT_TOMBSTONE_DAYS', 30))
+
+def parse_product_watermark(value):
+    """``?since=`` value -> datetime, or None for ``0``/empty (full snapshot)."""
+    if value in ('', '0'):
+        return None
+    try:
+        since = datetime.fromisoformat(value)
+    except ValueError:
+        since = None
+    if since is None or since.tzinfo is not None:
+        raise ValueError('Invalid since watermark')
+    return since
+
+def product_changes(cursor, since):
+    """Products and deleted ids changed since a watermark, plus the next watermark.
+
+    The watermark is the database clock at read time; reads look back
+    PRODUCT_INDEX_OVERLAP from it, so rows committed just after this read with
+    an earlier ``updated_at`` still reach the client on its next sync.
+    """
+    cursor.execute("SELECT NOW() AS now")
+    now = cursor.fetchone()['now']
+    full = since is None or since < now - timedelta(days=PRODUCT_TOMBSTONE_DAYS)
+    if full:
+        cursor.execute(PRODUCT_SELECT + " ORDER BY p.name")
         products = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(products)
-    return jsonify({'error': 'Database connection failed'}), 500
+        deleted = []
+    else:
+        cursor.execute(PRODUCT_SELECT + " WHERE p.updated_at >= %s ORDER BY p.updated_at, p.id",
+                       (since - PRODUCT_INDEX_OVERLAP,))
+        products = cursor.fetchall()
+        cursor.execute("""
+            SELECT DISTINCT product_id FROM product_deletions
+            WHERE deleted_at >= %s
+        """, (since - PRODUCT_INDEX_OVERLAP,))
+        deleted = [row['product_id'] for row in cursor.fetchall()]
+    return {
+        'products': products,
+        'deleted': deleted,
+        'watermark': now.isoformat(),
+        'full': full
+    }
 
-@app.route('/api/products/<barcode>', methods=['GET'])
+@app.route('/api/products', methods=['GET'])
 @login_required
-def get_product_by_barcode(barcode):
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT p.*, s.name as supplier_name 
-            FROM products p 
-            LEFT JOIN suppliers s ON p.supplier_id = s.id
-            WHERE p.barcode = %s
-        """, (barcode,))
-        product = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        if product:
-            return jsonify(product)
-        return jsonify({'error': 'Product not found'}), 404
+def get_products():
+    delta = 'since' in request.args
+    if delta:
+        try:
+            since = parse_product_watermark(request.args['since'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            if delta:
+                changes = product_changes(cursor, since)
+                cursor.close()
+                return jsonify(changes)
+            cursor.execute(PRODUCT_SELECT + " ORDER BY p.name")
+            products = cursor.fetchall()
+            cursor.close()
+            return jsonify(products)
+    return jsonify({'error': 'Database connection failed'}), 500
+
+def search_products_fulltext(cursor, query, limit):
+    """Boolean-mode prefix search over the ft_product_search FULLTEXT index."""
+    terms = [re.sub(r'\W', '', term) for term in query.split()]
+    against = ' '.join(f'+{term}*' for term in terms if term)
+    if not against:
+        cursor.execute(PRODUCT_SELECT + " ORDER BY p.name LIMIT %s", (limit,))
+        return cursor.fetchall()
+    cursor.execute(PRODUCT_SELECT + """
+        WHERE MATCH(p.name, p.barcode, p.category) AGAINST (%s IN BOOLEAN MODE)
+        ORDER BY p.barcode = %s DESC,
+                 MATCH(p.name, p.barcode, p.category) AGAINST (%s IN BOOLEAN MODE) DESC,
+                 p.name
+        LIMIT %s
+    """, (against, query, against, limit))
+    return cursor.fetchall()
+
+@app.route('/api/products/search', methods=['GET'])
+@login_required
+def search_products():
+    query = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', PRODUCT_SEARCH_LIMIT)), 1), PRODUCT_SEARCH_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    if PRODUCT_SEARCH_BACKEND != 'fulltext':
+        return jsonify(product_index.search(query, limit))
+    
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                return jsonify(search_products_fulltext(cursor, query.strip(), limit))
+            except Error as e:
+                return jsonify({'error': str(e)}), 400
+            finally:
+                cursor.close()
     return jsonify({'error': 'Database connection failed'}), 500
 
+@app.route('/api/products/<barcode>', methods=['GET'])
+@login_required
+def get_product_by_barcode(barcode):
+    product = product_index.get(barcode)
+    if product:
+        return jsonify(product)
+    if not product_index.loaded:
+        return jsonify({'error': 'Database connection failed'}), 500
+    return jsonify({'error': 'Product not found'}), 404
+
 @app.route('/api/products', methods=['POST'])
 @login_required
 @role_required('admin', 'manager')
 def add_product():
     data = request.get_json()
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                INSERT INTO products (name, barcode, category, price, cost_price, quantity, 
-                                    min_stock_level, supplier_id, description)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (data['name'], data['barcode'], data['category'], data['price'], 
-                  data.get('cost_price', 0), data['quantity'], data.get('min_stock_level', 10),
-                  data.get('supplier_id'), data.get('description', '')))
-            conn.commit()
-            product_id = cursor.lastrowid
-            cursor.close()
-            conn.close()
-            return jsonify({'success': True, 'id': product_id})
-        except Error as e:
-            conn.rollback()
-            cursor.close()
-            conn.close()
-            return jsonify({'error': str(e)}), 400
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    INSERT INTO products (name, barcode, category, price, cost_price, quantity, 
+                                        min_stock_level, supplier_id, description)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (data['name'], data['barcode'], data['category'], data['price'], 
+                      data.get('cost_price', 0), data['quantity'], data.get('min_stock_level', 10),
+                      data.get('supplier_id'), data.get('description', '')))
+                conn.commit()
+                product_id = cursor.lastrowid
+                cursor.close()
+                product_index.reload([product_id])
+                return jsonify({'success': True, 'id': product_id})
+            except Error as e:
+                conn.rollback()
+                cursor.close()
+                return jsonify({'error': str(e)}), 400
     return jsonify({'error': 'Database connection failed'}), 500
 
 @app.route('/api/products/<int:product_id>', methods=['PUT'])
@@ -212,154 +1843,739 @@ def add_product():
 @role_required('admin', 'manager')
 def update_product(product_id):
     data = request.get_json()
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                UPDATE products 
-                SET name=%s, barcode=%s, category=%s, price=%s, cost_price=%s, 
-                    quantity=%s, min_stock_level=%s, supplier_id=%s, description=%s
-                WHERE id=%s
-            """, (data['name'], data['barcode'], data['category'], data['price'],
-                  data.get('cost_price', 0), data['quantity'], data.get('min_stock_level', 10),
-                  data.get('supplier_id'), data.get('description', ''), product_id))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return jsonify({'success': True})
-        except Error as e:
-            conn.rollback()
-            cursor.close()
-            conn.close()
-            return jsonify({'error': str(e)}), 400
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    UPDATE products 
+                    SET name=%s, barcode=%s, category=%s, price=%s, cost_price=%s, 
+                        quantity=%s, min_stock_level=%s, supplier_id=%s, description=%s
+                    WHERE id=%s
+                """, (data['name'], data['barcode'], data['category'], data['price'],
+                      data.get('cost_price', 0), data['quantity'], data.get('min_stock_level', 10),
+                      data.get('supplier_id'), data.get('description', ''), product_id))
+                conn.commit()
+                cursor.close()
+                product_index.reload([product_id])
+                return jsonify({'success': True})
+            except Error as e:
+                conn.rollback()
+                cursor.close()
+                return jsonify({'error': str(e)}), 400
     return jsonify({'error': 'Database connection failed'}), 500
 
 @app.route('/api/products/<int:product_id>', methods=['DELETE'])
 @login_required
 @role_required('admin')
 def delete_product(product_id):
-    conn = get_db_connection()
-    if conn:
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("DELETE FROM products WHERE id=%s", (product_id,))
+                if cursor.rowcount:
+                    # Tombstone for delta sync clients; old ones are pruned as we go
+                    cursor.execute("INSERT INTO product_deletions (product_id) VALUES (%s)", (product_id,))
+                    cursor.execute("""
+                        DELETE FROM product_deletions
+                        WHERE deleted_at < NOW() - INTERVAL %s DAY
+                    """, (PRODUCT_TOMBSTONE_DAYS,))
+                conn.commit()
+                cursor.close()
+                product_index.remove(product_id)
+                return jsonify({'success': True})
+            except Error as e:
+                conn.rollback()
+                cursor.close()
+                return jsonify({'error': str(e)}), 400
+    return jsonify({'error': 'Database connection failed'}), 500
+
+# Checkout Configuration
+ALLOW_NEGATIVE_STOCK = os.getenv('ALLOW_NEGATIVE_STOCK', 'False').lower() == 'true'
+CHECKOUT_MAX_RETRIES = int(os.getenv('CHECKOUT_MAX_RETRIES', 3))
+CHECKOUT_RETRY_BACKOFF = float(os.getenv('CHECKOUT_RETRY_BACKOFF', 0.05))
+# ER_LOCK_DEADLOCK, ER_LOCK_WAIT_TIMEOUT
+RETRYABLE_ERRORS = (1213, 1205)
+# ER_DUP_ENTRY: a concurrent retry of the same till sale stored its key first
+DUPLICATE_KEY_ERROR = 1062
+
+class InsufficientStock(Exception):
+    def __init__(self, lines):
+        super().__init__('Insufficient stock')
+        self.lines = lines
+
+def sold_quantities(items):
+    sold = {}
+    for item in items:
+        sold[item['product_id']] = sold.get(item['product_id'], 0) + int(item['quantity'])
+    return sold
+
+def validate_sale_items(items):
+    """Return why a sale's lines cannot be stored, or None when they are well formed."""
+    if not isinstance(items, list):
+        return 'items must be a list'
+    try:
+        for item in items:
+            int(item['product_id'])
+            float(item['price'])
+            float(item['subtotal'])
+            quantity = int(item['quantity'])
+            if quantity != float(item['quantity']) or quantity <= 0:
+                return 'item quantities must be positive whole numbers'
+    except (KeyError, TypeError, ValueError):
+        return 'items need a numeric product_id, quantity, price and subtotal'
+    return None
+
+def lock_stock(cursor, items):
+    """Lock the cart's product rows in id order and check each line can be filled.
+
+    Every till takes its locks in the same order, so two carts sharing products
+    queue behind each other instead of deadlocking. Returns one status entry
+    per cart line.
+    """
+    sold = sold_quantities(items)
+    product_ids = sorted(sold)
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    cursor.execute(f"""
+        SELECT id, quantity FROM products
+        WHERE id IN ({placeholders})
+        ORDER BY id
+        FOR UPDATE
+    """, product_ids)
+    available = dict(cursor.fetchall())
+    
+    lines = []
+    for line, item in enumerate(items):
+        product_id = item['product_id']
+        in_stock = available.get(product_id)
+        if in_stock is None:
+            status = 'not_found'
+        elif in_stock < sold[product_id] and not ALLOW_NEGATIVE_STOCK:
+            status = 'insufficient_stock'
+        else:
+            status = 'ok'
+        lines.append({
+            'line': line,
+            'product_id': product_id,
+            'requested': int(item['quantity']),
+            'available': in_stock,
+            'status': status
+        })
+    return lines
+
+def record_sale_rollup(cursor, items_sold):
+    """Add just-inserted sales, given as ``{sale_id: items_sold}``, to the rollups.
+
+    Runs inside the checkout transaction, after the stock updates, so the
+    shared rollup rows are locked for as short a time as possible.
+    """
+    sale_ids = sorted(items_sold)
+    placeholders = ', '.join(['%s'] * len(sale_ids))
+    cases = ' '.join(['WHEN %s THEN %s'] * len(sale_ids))
+    params = [value for sale_id in sale_ids for value in (sale_id, items_sold[sale_id])]
+    for table, key, bucket in (
+        ('sales_daily_rollup', 'sale_date', 'DATE(created_at)'),
+        ('sales_monthly_rollup', 'month_start', 'DATE(created_at) - INTERVAL (DAYOFMONTH(created_at) - 1) DAY'),
+    ):
+        cursor.execute(f"""
+            INSERT INTO {table} ({key}, payment_method, total_transactions,
+                                 total_sales, total_discounts, total_items_sold)
+            SELECT {bucket} AS bucket, payment_method, COUNT(*), SUM(total_amount),
+                   SUM(discount), SUM(CASE id {cases} END)
+            FROM sales WHERE id IN ({placeholders})
+            GROUP BY bucket, payment_method
+            ON DUPLICATE KEY UPDATE
+                total_transactions = total_transactions + VALUES(total_transactions),
+                total_sales = total_sales + VALUES(total_sales),
+                total_discounts = total_discounts + VALUES(total_discounts),
+                total_items_sold = total_items_sold + VALUES(total_items_sold)
+        """, params + sale_ids)
+
+def run_checkout(conn, data, employee_id):
+    """Write a sale in one transaction, retrying on deadlock or lock-wait timeout.
+
+    Returns ``(sale_id, stock)`` where ``stock`` is the post-sale stock level of
+    each product sold. Raises InsufficientStock without writing anything when a
+    line cannot be filled. The till's ``idempotency_key`` is stored as the
+    sale's client_ref; a sale already stored under it is returned unchanged,
+    so a checkout the till queued after losing the answer is not written twice.
+    """
+    items = data['items']
+    client_ref = data.get('idempotency_key')
+    attempt = 0
+    while True:
         cursor = conn.cursor()
         try:
-            cursor.execute("DELETE FROM products WHERE id=%s", (product_id,))
+            if client_ref:
+                cursor.execute("SELECT id FROM sales WHERE client_ref = %s", (client_ref,))
+                existing = cursor.fetchone()
+                if existing:
+                    conn.rollback()
+                    return existing[0], {}
+            lines = lock_stock(cursor, items) if items else []
+            if any(line['status'] != 'ok' for line in lines):
+                raise InsufficientStock(lines)
+            
+            cursor.execute("""
+                INSERT INTO sales (client_ref, customer_name, customer_phone, total_amount, 
+                                 discount, payment_method, employee_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (client_ref, data.get('customer_name', 'Walk-in'), data.get('customer_phone', ''),
+                  data['total_amount'], data.get('discount', 0), 
+                  data.get('payment_method', 'cash'), employee_id))
+            sale_id = cursor.lastrowid
+            
+            stock = write_sale_items(cursor, sale_id, items)
+            record_sale_rollup(cursor, {sale_id: sum(int(item['quantity']) for item in items)})
             conn.commit()
-            cursor.close()
-            conn.close()
-            return jsonify({'success': True})
+            return sale_id, stock
+        except InsufficientStock:
+            conn.rollback()
+            raise
         except Error as e:
             conn.rollback()
+            retryable = e.errno in RETRYABLE_ERRORS or (client_ref and e.errno == DUPLICATE_KEY_ERROR)
+            if not retryable or attempt >= CHECKOUT_MAX_RETRIES:
+                raise
+            attempt += 1
+            time.sleep(CHECKOUT_RETRY_BACKOFF * (2 ** (attempt - 1)) * (1 + random.random()))
+        finally:
             cursor.close()
-            conn.close()
-            return jsonify({'error': str(e)}), 400
-    return jsonify({'error': 'Database connection failed'}), 500
+
+def write_sale_items(cursor, sale_id, items):
+    """Insert a sale's lines and decrement stock in a constant number of statements.
+
+    Returns ``{product_id: (quantity, updated_at)}`` with the stock levels the
+    UPDATE left behind, read while the rows are still locked by the caller's
+    transaction.
+    """
+    return write_batch_items(cursor, [(sale_id, items)])
+
+def write_batch_items(cursor, sales):
+    """``write_sale_items`` for several ``(sale_id, items)`` pairs at once."""
+    rows = [(sale_id, item) for sale_id, items in sales for item in items]
+    if not rows:
+        return {}
+    
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+    params = []
+    for sale_id, item in rows:
+        params.extend((sale_id, item['product_id'], item['quantity'], item['price'], item['subtotal']))
+    cursor.execute(f"""
+        INSERT INTO sale_items (sale_id, product_id, quantity, price, subtotal)
+        VALUES {placeholders}
+    """, params)
+    
+    # One set-based decrement; a product scanned on several lines is summed first
+    sold = sold_quantities([item for _, item in rows])
+    product_ids = sorted(sold)
+    id_placeholders = ', '.join(['%s'] * len(product_ids))
+    cases = ' '.join(['WHEN %s THEN %s'] * len(product_ids))
+    params = [value for product_id in product_ids for value in (product_id, sold[product_id])]
+    cursor.execute(f"""
+        UPDATE products SET quantity = quantity - CASE id {cases} END
+        WHERE id IN ({id_placeholders})
+    """, params + product_ids)
+    
+    cursor.execute(f"SELECT id, quantity, updated_at FROM products WHERE id IN ({id_placeholders})",
+                   product_ids)
+    return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+# Product Catalogue Import
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 500))
+IMPORT_REQUIRED_COLUMNS = ['name', 'barcode', 'price']
+IMPORT_OPTIONAL_COLUMNS = ['category', 'cost_price', 'quantity', 'min_stock_level',
+                           'supplier_id', 'description']
+
+def read_product_file(stream, filename):
+    """Load a CSV or XLSX price list into a DataFrame of strings."""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        frame = pd.read_excel(stream, dtype=str, engine='openpyxl')
+    else:
+        frame = pd.read_csv(stream, dtype=str, keep_default_na=False)
+    frame.columns = [str(c).strip().lower().replace(' ', '_') for c in frame.columns]
+    return frame.fillna('')
+
+def validate_products(frame, supplier_ids):
+    """Validate every row at once; returns ``(valid_frame, errors)``.
+
+    Row numbers in the error report are spreadsheet rows (header is row 1).
+    """
+    columns = [c for c in IMPORT_REQUIRED_COLUMNS + IMPORT_OPTIONAL_COLUMNS if c in frame.columns]
+    frame = frame[columns].copy()
+    for column in columns:
+        frame[column] = frame[column].astype(str).str.strip()
+    problems = pd.Series([[] for _ in range(len(frame))], index=frame.index)
+    
+    def flag(mask, message):
+        for idx in frame.index[mask]:
+            problems[idx].append(message)
+    
+    flag(frame['name'] == '', 'name is required')
+    flag(frame['name'].str.len() > 255, 'name is longer than 255 characters')
+    flag(frame['barcode'] == '', 'barcode is required')
+    flag(frame['barcode'].str.len() > 100, 'barcode is longer than 100 characters')
+    flag(frame['barcode'].duplicated() & (frame['barcode'] != ''), 'barcode appears earlier in the file')
+    
+    numeric = {'price': float, 'cost_price': float, 'quantity': int, 'min_stock_level': int, 'supplier_id': int}
+    for column, kind in numeric.items():
+        if column not in frame.columns:
+            continue
+        blank = frame[column] == ''
+        values = pd.to_numeric(frame[column], errors='coerce')
+        if column == 'price':
+            flag(blank, 'price is required')
+        flag(~blank & values.isna(), f'{column} is not a number')
+        flag(~blank & (values < 0), f'{column} must not be negative')
+        if kind is int:
+            flag(~blank & values.notna() & (values % 1 != 0), f'{column} must be a whole number')
+        if column == 'supplier_id':
+            flag(~blank & values.notna() & ~values.isin(supplier_ids), 'supplier_id does not exist')
+        frame[column] = values.where(~blank, None)
+    
+    failed = problems.str.len() > 0
+    errors = [{
+        'row': int(idx) + 2,
+        'barcode': frame.at[idx, 'barcode'],
+        'errors': problems[idx]
+    } for idx in frame.index[failed]]
+    return frame[~failed], errors
+
+IMPORT_INSERT_DEFAULTS = {'cost_price': 0, 'quantity': 0, 'min_stock_level': 10}
+
+def import_value(column, value):
+    """Turn a validated cell into a driver-friendly value; blanks become None."""
+    if value is None or value == '' or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if column in ('quantity', 'min_stock_level', 'supplier_id'):
+        return int(value)
+    if column in ('price', 'cost_price'):
+        return float(value)
+    return value
+
+def upsert_products(cursor, frame):
+    """Upsert validated rows by barcode in chunked multi-row statements.
+
+    Only the columns present in the file are touched on existing products, and
+    blank cells keep the stored value, so a price list without stock levels
+    leaves quantities alone. Returns ``(inserted, updated)``.
+    """
+    columns = list(frame.columns)
+    barcode_at = columns.index('barcode')
+    updates = ', '.join(f"{c} = COALESCE(VALUES({c}), {c})" for c in columns if c != 'barcode')
+    records = [
+        [import_value(column, value) for column, value in zip(columns, row)]
+        for row in frame.itertuples(index=False, name=None)
+    ]
+    
+    inserted = updated = 0
+    for offset in range(0, len(records), IMPORT_CHUNK_SIZE):
+        chunk = records[offset:offset + IMPORT_CHUNK_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f"SELECT barcode FROM products WHERE barcode IN ({placeholders})",
+                       [row[barcode_at] for row in chunk])
+        existing = {row[0] for row in cursor.fetchall()}
+        
+        values = []
+        for row in chunk:
+            if row[barcode_at] not in existing:
+                # New products get the schema defaults rather than NULL
+                row = [IMPORT_INSERT_DEFAULTS.get(column) if value is None else value
+                       for column, value in zip(columns, row)]
+            values.extend(row)
+        row_placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(chunk))
+        cursor.execute(f"""
+            INSERT INTO products ({', '.join(columns)})
+            VALUES {row_placeholders}
+            ON DUPLICATE KEY UPDATE {updates}
+        """, values)
+        updated += len(existing)
+        inserted += len(chunk) - len(existing)
+    return inserted, updated
+
+def import_products(conn, frame, dry_run=False):
+    """Validate and upsert a price list in one transaction; returns the report."""
+    missing = [c for c in IMPORT_REQUIRED_COLUMNS if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+    
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id FROM suppliers")
+        supplier_ids = [row[0] for row in cursor.fetchall()]
+        valid, errors = validate_products(frame, supplier_ids)
+        
+        inserted = updated = 0
+        if len(valid) and not dry_run:
+            inserted, updated = upsert_products(cursor, valid)
+            conn.commit()
+        else:
+            conn.rollback()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    
+    if inserted or updated:
+        # One invalidation for the whole import; every worker rebuilds on its next scan
+        product_index.invalidate()
+    
+    return {
+        'success': True,
+        'dry_run': dry_run,
+        'total_rows': len(frame),
+        'valid_rows': len(valid),
+        'inserted': inserted,
+        'updated': updated,
+        'failed': len(errors),
+        'errors': errors
+    }
+
+@app.route('/api/products/import', methods=['POST'])
+@login_required
+@role_required('admin', 'manager')
+def import_products_upload():
+    if pd is None:
+        return jsonify({'error': 'Product import requires the pandas package'}), 400
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'error': 'No file uploaded'}), 400
+    dry_run = request.form.get('dry_run', 'false').lower() == 'true'
+    
+    try:
+        frame = read_product_file(upload.stream, upload.filename)
+    except Exception as e:
+        return jsonify({'error': f'Could not read file: {e}'}), 400
+    
+    with get_db_connection() as conn:
+        if conn:
+            try:
+                result = import_products(conn, frame, dry_run)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            except Error as e:
+                return jsonify({'error': str(e)}), 400
+        else:
+            return jsonify({'error': 'Database connection failed'}), 500
+    
+    if result['inserted'] or result['updated']:
+        product_index.rebuild()
+    return jsonify(result)
 
 # Sales APIs
 @app.route('/api/sales', methods=['POST'])
 @login_required
 def create_sale():
     data = request.get_json()
-    conn = get_db_connection()
-    if conn:
+    key = data.get('idempotency_key')
+    if key is not None and (not isinstance(key, str) or not key or len(key) > SALE_KEY_MAX_LENGTH):
+        return jsonify({'error': f'idempotency_key must be at most {SALE_KEY_MAX_LENGTH} characters'}), 400
+    # Checked before any row is locked: a zero or negative quantity would
+    # pass the stock check and then add stock back
+    error = validate_sale_items(data.get('items'))
+    if error:
+        return jsonify({'error': error}), 400
+    data['items'] = [dict(item, product_id=int(item['product_id']), quantity=int(item['quantity']))
+                     for item in data['items']]
+    with get_db_connection() as conn:
+        if conn:
+            try:
+                sale_id, stock = run_checkout(conn, data, current_user.id)
+                product_index.set_quantities(stock)
+                sales_generation.bump()
+                if INVOICE_PREWARM:
+                    invoice_prewarm_executor.submit(prewarm_invoice, sale_id)
+                return jsonify({'success': True, 'sale_id': sale_id})
+            except InsufficientStock as e:
+                return jsonify({'success': False, 'error': 'Insufficient stock', 'lines': e.lines}), 409
+            except Error as e:
+                return jsonify({'error': str(e)}), 400
+    return jsonify({'error': 'Database connection failed'}), 500
+
+# Offline till sync
+SALES_BATCH_MAX = int(os.getenv('SALES_BATCH_MAX', 200))
+SALE_KEY_MAX_LENGTH = 64
+
+def parse_sold_at(value):
+    """Client ISO timestamp -> naive local datetime, never later than now."""
+    # Date.toISOString() ends in Z, which fromisoformat only accepts from Python 3.11
+    if isinstance(value, str) and value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    sold_at = datetime.fromisoformat(value)
+    if sold_at.tzinfo is not None:
+        sold_at = sold_at.astimezone().replace(tzinfo=None)
+    return min(sold_at, datetime.now())
+
+def validate_queued_sale(sale):
+    """Return why a queued sale cannot be stored, or None when it is well formed."""
+    key = sale.get('idempotency_key')
+    if not isinstance(key, str) or not key or len(key) > SALE_KEY_MAX_LENGTH:
+        return f'idempotency_key is required (at most {SALE_KEY_MAX_LENGTH} characters)'
+    items = sale.get('items')
+    if not isinstance(items, list) or not items:
+        return 'items are required'
+    error = validate_sale_items(items)
+    if error:
+        return error
+    try:
+        float(sale['total_amount'])
+        if sale.get('sold_at'):
+            parse_sold_at(sale['sold_at'])
+    except (KeyError, TypeError, ValueError):
+        return 'sale needs a numeric total_amount and an ISO sold_at'
+    return None
+
+def ingest_sale_batch(conn, sales, employee_id):
+    """Store queued till sales in one transaction, skipping keys already stored.
+
+    The sales already happened at the till, so lines that take stock below
+    zero are stored and reported rather than refused; only sales naming
+    products that no longer exist are rejected. Returns ``(results, stock)``
+    with one result per submitted sale, in order.
+    """
+    checked = [{'idempotency_key': sale.get('idempotency_key')} for sale in sales]
+    first_seen = {}
+    for index, sale in enumerate(sales):
+        error = validate_queued_sale(sale)
+        if error:
+            checked[index].update(status='rejected', error=error)
+        elif sale['idempotency_key'] in first_seen:
+            checked[index].update(status='duplicate')
+        else:
+            first_seen[sale['idempotency_key']] = index
+            sale['items'] = [dict(item, product_id=int(item['product_id']), quantity=int(item['quantity']))
+                             for item in sale['items']]
+    
+    attempt = 0
+    while True:
         cursor = conn.cursor()
         try:
-            # Create sale record
-            cursor.execute("""
-                INSERT INTO sales (customer_name, customer_phone, total_amount, 
-                                 discount, payment_method, employee_id)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (data.get('customer_name', 'Walk-in'), data.get('customer_phone', ''),
-                  data['total_amount'], data.get('discount', 0), 
-                  data.get('payment_method', 'cash'), current_user.id))
+            results = [dict(result) for result in checked]
+            pending = dict(first_seen)
+            stock = {}
+            if pending:
+                placeholders = ', '.join(['%s'] * len(pending))
+                cursor.execute(f"SELECT client_ref, id FROM sales WHERE client_ref IN ({placeholders})",
+                               list(pending))
+                for key, sale_id in cursor.fetchall():
+                    results[pending.pop(key)].update(status='duplicate', sale_id=sale_id)
             
-            sale_id = cursor.lastrowid
+            if pending:
+                lines = lock_stock(cursor, [item for index in pending.values() for item in sales[index]['items']])
+                missing = {line['product_id'] for line in lines if line['status'] == 'not_found'}
+                short = {line['product_id'] for line in lines if line['status'] == 'insufficient_stock'}
+                for key, index in list(pending.items()):
+                    product_ids = {item['product_id'] for item in sales[index]['items']}
+                    if product_ids & missing:
+                        results[index].update(status='rejected', error='Product no longer exists',
+                                              product_ids=sorted(product_ids & missing))
+                        del pending[key]
+                    else:
+                        results[index].update(status='created', short_stock=sorted(product_ids & short))
             
-            # Add sale items and update inventory
-            for item in data['items']:
-                cursor.execute("""
-                    INSERT INTO sale_items (sale_id, product_id, quantity, price, subtotal)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (sale_id, item['product_id'], item['quantity'], 
-                      item['price'], item['subtotal']))
+            if pending:
+                accepted = [sales[index] for index in pending.values()]
+                values = ', '.join(['(%s, COALESCE(%s, NOW()), %s, %s, %s, %s, %s, %s)'] * len(accepted))
+                params = []
+                for sale in accepted:
+                    params.extend((sale['idempotency_key'],
+                                   parse_sold_at(sale['sold_at']) if sale.get('sold_at') else None,
+                                   sale.get('customer_name', 'Walk-in'), sale.get('customer_phone', ''),
+                                   sale['total_amount'], sale.get('discount', 0),
+                                   sale.get('payment_method', 'cash'), employee_id))
+                cursor.execute(f"""
+                    INSERT INTO sales (client_ref, created_at, customer_name, customer_phone,
+                                       total_amount, discount, payment_method, employee_id)
+                    VALUES {values}
+                """, params)
                 
-                # Update product quantity
-                cursor.execute("""
-                    UPDATE products SET quantity = quantity - %s WHERE id = %s
-                """, (item['quantity'], item['product_id']))
-            
+                # Keys are unique, so they map the multi-row insert back to sale ids
+                placeholders = ', '.join(['%s'] * len(pending))
+                cursor.execute(f"SELECT client_ref, id FROM sales WHERE client_ref IN ({placeholders})",
+                               list(pending))
+                sale_ids = dict(cursor.fetchall())
+                for key, index in pending.items():
+                    results[index]['sale_id'] = sale_ids[key]
+                
+                stock = write_batch_items(cursor, [(sale_ids[sale['idempotency_key']], sale['items'])
+                                                   for sale in accepted])
+                record_sale_rollup(cursor, {
+                    sale_ids[sale['idempotency_key']]: sum(item['quantity'] for item in sale['items'])
+                    for sale in accepted
+                })
             conn.commit()
-            cursor.close()
-            conn.close()
-            return jsonify({'success': True, 'sale_id': sale_id})
+            for result in results:
+                if result.get('status') == 'duplicate' and 'sale_id' not in result:
+                    result['sale_id'] = results[first_seen[result['idempotency_key']]].get('sale_id')
+            return results, stock
         except Error as e:
             conn.rollback()
+            retryable = e.errno in RETRYABLE_ERRORS or e.errno == DUPLICATE_KEY_ERROR
+            if not retryable or attempt >= CHECKOUT_MAX_RETRIES:
+                raise
+            attempt += 1
+            time.sleep(CHECKOUT_RETRY_BACKOFF * (2 ** (attempt - 1)) * (1 + random.random()))
+        finally:
             cursor.close()
-            conn.close()
-            return jsonify({'error': str(e)}), 400
+
+@app.route('/api/sales/batch', methods=['POST'])
+@login_required
+def create_sales_batch():
+    data = request.get_json(silent=True) or {}
+    sales = data.get('sales')
+    if not isinstance(sales, list) or not sales:
+        return jsonify({'error': 'sales list is required'}), 400
+    if len(sales) > SALES_BATCH_MAX:
+        return jsonify({'error': f'At most {SALES_BATCH_MAX} sales per batch'}), 400
+    if not all(isinstance(sale, dict) for sale in sales):
+        return jsonify({'error': 'Each sale must be an object'}), 400
+    
+    with get_db_connection() as conn:
+        if conn:
+            try:
+                results, stock = ingest_sale_batch(conn, sales, current_user.id)
+            except Error as e:
+                return jsonify({'error': str(e)}), 400
+            created = [result['sale_id'] for result in results if result['status'] == 'created']
+            if created:
+                product_index.set_quantities(stock)
+                sales_generation.bump()
+                today = datetime.now().date()
+                if any(result['status'] == 'created' and sale.get('sold_at')
+                       and parse_sold_at(sale['sold_at']).date() < today
+                       for sale, result in zip(sales, results)):
+                    past_sales_generation.bump()
+                if INVOICE_PREWARM:
+                    for sale_id in created:
+                        invoice_prewarm_executor.submit(prewarm_invoice, sale_id)
+            return jsonify({
+                'success': True,
+                'results': results,
+                'created': len(created),
+                'duplicates': sum(1 for result in results if result['status'] == 'duplicate'),
+                'rejected': sum(1 for result in results if result['status'] == 'rejected')
+            })
     return jsonify({'error': 'Database connection failed'}), 500
 
+# Sales listing
+ITEMS_PER_PAGE = int(os.getenv('ITEMS_PER_PAGE', 50))
+SALES_PAGE_MAX = int(os.getenv('SALES_PAGE_MAX', 500))
+
+def encode_sales_cursor(sale):
+    created_at = sale['created_at']
+    if isinstance(created_at, datetime):
+        created_at = created_at.strftime('%Y-%m-%d %H:%M:%S')
+    token = f"{created_at}|{sale['id']}"
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+
+def decode_sales_cursor(token):
+    """Return ``(created_at, id)`` from a cursor; raises ValueError when malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, sale_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S'), int(sale_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
 @app.route('/api/sales', methods=['GET'])
 @login_required
 def get_sales():
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    limit = request.args.get('limit', type=int)
+    recent = request.args.get('recent', type=int)
+    page_cursor = request.args.get('cursor')
+    # Without paging parameters the endpoint keeps returning the plain list
+    paginated = limit is not None or recent is not None or page_cursor is not None
     
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        query = """
-            SELECT s.*, e.username as employee_name,
-                   COUNT(si.id) as items_count
-            FROM sales s
-            LEFT JOIN employees e ON s.employee_id = e.id
-            LEFT JOIN sale_items si ON s.id = si.sale_id
-        """
-        params = []
-        
-        if start_date and end_date:
-            query += " WHERE DATE(s.created_at) BETWEEN %s AND %s"
-            params = [start_date, end_date]
+    conditions = []
+    params = []
+    if start_date and end_date:
+        conditions.append("s.created_at >= %s AND s.created_at < %s + INTERVAL 1 DAY")
+        params = [start_date, end_date]
+    
+    if paginated:
+        limit = max(1, min(recent or limit or ITEMS_PER_PAGE, SALES_PAGE_MAX))
+        if page_cursor and not recent:
+            try:
+                cursor_created_at, cursor_id = decode_sales_cursor(page_cursor)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            conditions.append("(s.created_at < %s OR (s.created_at = %s AND s.id < %s))")
+            params += [cursor_created_at, cursor_created_at, cursor_id]
+    
+    with get_db_connection(read_only=True) as conn:
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            if paginated:
+                # Walks idx_date backwards and stops after limit + 1 rows
+                query = """
+                    SELECT s.*, e.username as employee_name,
+                           (SELECT COUNT(*) FROM sale_items si WHERE si.sale_id = s.id) as items_count
+                    FROM sales s
+                    LEFT JOIN employees e ON s.employee_id = e.id
+                """
+                if conditions:
+                    query += " WHERE " + " AND ".join(conditions)
+                query += " ORDER BY s.created_at DESC, s.id DESC LIMIT %s"
+                cursor.execute(query, params + [limit + 1])
+                sales = cursor.fetchall()
+                cursor.close()
+                
+                next_cursor = None
+                if len(sales) > limit:
+                    sales = sales[:limit]
+                    next_cursor = encode_sales_cursor(sales[-1])
+                return jsonify({'sales': sales, 'next_cursor': next_cursor, 'limit': limit})
+            
+            query = """
+                SELECT s.*, e.username as employee_name,
+                       COUNT(si.id) as items_count
+                FROM sales s
+                LEFT JOIN employees e ON s.employee_id = e.id
+                LEFT JOIN sale_items si ON s.id = si.sale_id
+            """
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
         
-        query += " GROUP BY s.id ORDER BY s.created_at DESC"
+            query += " GROUP BY s.id ORDER BY s.created_at DESC"
         
-        cursor.execute(query, params)
-        sales = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(sales)
+            cursor.execute(query, params)
+            sales = cursor.fetchall()
+            cursor.close()
+            return jsonify(sales)
     return jsonify({'error': 'Database connection failed'}), 500
 
 @app.route('/api/sales/<int:sale_id>/items', methods=['GET'])
 @login_required
 def get_sale_items(sale_id):
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT si.*, p.name as product_name
-            FROM sale_items si
-            JOIN products p ON si.product_id = p.id
-            WHERE si.sale_id = %s
-        """, (sale_id,))
-        items = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(items)
+    with get_db_connection(read_only=True) as conn:
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT si.*, p.name as product_name
+                FROM sale_items si
+                JOIN products p ON si.product_id = p.id
+                WHERE si.sale_id = %s
+            """, (sale_id,))
+            items = cursor.fetchall()
+            cursor.close()
+            return jsonify(items)
     return jsonify({'error': 'Database connection failed'}), 500
 
 # Supplier APIs
 @app.route('/api/suppliers', methods=['GET'])
 @login_required
 def get_suppliers():
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM suppliers ORDER BY name")
-        suppliers = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(suppliers)
+    with get_db_connection(read_only=True) as conn:
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM suppliers ORDER BY name")
+            suppliers = cursor.fetchall()
+            cursor.close()
+            return jsonify(suppliers)
     return jsonify({'error': 'Database connection failed'}), 500
 
 @app.route('/api/suppliers', methods=['POST'])
@@ -367,25 +2583,23 @@ def get_suppliers():
 @role_required('admin', 'manager')
 def add_supplier():
     data = request.get_json()
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                INSERT INTO suppliers (name, contact_person, phone, email, address)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (data['name'], data.get('contact_person', ''), 
-                  data.get('phone', ''), data.get('email', ''), data.get('address', '')))
-            conn.commit()
-            supplier_id = cursor.lastrowid
-            cursor.close()
-            conn.close()
-            return jsonify({'success': True, 'id': supplier_id})
-        except Error as e:
-            conn.rollback()
-            cursor.close()
-            conn.close()
-            return jsonify({'error': str(e)}), 400
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    INSERT INTO suppliers (name, contact_person, phone, email, address)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, (data['name'], data.get('contact_person', ''), 
+                      data.get('phone', ''), data.get('email', ''), data.get('address', '')))
+                conn.commit()
+                supplier_id = cursor.lastrowid
+                cursor.close()
+                return jsonify({'success': True, 'id': supplier_id})
+            except Error as e:
+                conn.rollback()
+                cursor.close()
+                return jsonify({'error': str(e)}), 400
     return jsonify({'error': 'Database connection failed'}), 500
 
 @app.route('/api/suppliers/<int:supplier_id>', methods=['PUT'])
@@ -393,153 +2607,632 @@ def add_supplier():
 @role_required('admin', 'manager')
 def update_supplier(supplier_id):
     data = request.get_json()
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                UPDATE suppliers 
-                SET name=%s, contact_person=%s, phone=%s, email=%s, address=%s
-                WHERE id=%s
-            """, (data['name'], data.get('contact_person', ''), 
-                  data.get('phone', ''), data.get('email', ''), 
-                  data.get('address', ''), supplier_id))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return jsonify({'success': True})
-        except Error as e:
-            conn.rollback()
-            cursor.close()
-            conn.close()
-            return jsonify({'error': str(e)}), 400
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    UPDATE suppliers 
+                    SET name=%s, contact_person=%s, phone=%s, email=%s, address=%s
+                    WHERE id=%s
+                """, (data['name'], data.get('contact_person', ''), 
+                      data.get('phone', ''), data.get('email', ''), 
+                      data.get('address', ''), supplier_id))
+                # supplier_name is part of each product row, so delta sync must see them change
+                cursor.execute("UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE supplier_id=%s",
+                               (supplier_id,))
+                conn.commit()
+                cursor.close()
+                product_index.invalidate()
+                return jsonify({'success': True})
+            except Error as e:
+                conn.rollback()
+                cursor.close()
+                return jsonify({'error': str(e)}), 400
     return jsonify({'error': 'Database connection failed'}), 500
 
 @app.route('/api/suppliers/<int:supplier_id>', methods=['DELETE'])
 @login_required
 @role_required('admin')
 def delete_supplier(supplier_id):
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("DELETE FROM suppliers WHERE id=%s", (supplier_id,))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return jsonify({'success': True})
-        except Error as e:
-            conn.rollback()
-            cursor.close()
-            conn.close()
-            return jsonify({'error': str(e)}), 400
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor()
+            try:
+                # Done explicitly rather than by ON DELETE SET NULL so updated_at moves
+                cursor.execute("UPDATE products SET supplier_id = NULL WHERE supplier_id=%s", (supplier_id,))
+                cursor.execute("DELETE FROM suppliers WHERE id=%s", (supplier_id,))
+                conn.commit()
+                cursor.close()
+                product_index.invalidate()
+                return jsonify({'success': True})
+            except Error as e:
+                conn.rollback()
+                cursor.close()
+                return jsonify({'error': str(e)}), 400
     return jsonify({'error': 'Database connection failed'}), 500
 
 # Dashboard Stats API
+def fetch_dashboard_stats(cursor):
+    # Sales totals come from the rollups, stock counts from one pass over products
+    cursor.execute("""
+        SELECT
+            (SELECT COALESCE(SUM(total_sales), 0) FROM sales_daily_rollup
+             WHERE sale_date = CURDATE()) as today_sales,
+            (SELECT COALESCE(SUM(total_sales), 0) FROM sales_monthly_rollup
+             WHERE month_start = CURDATE() - INTERVAL (DAYOFMONTH(CURDATE()) - 1) DAY) as monthly_sales,
+            COUNT(*) as total_products,
+            COALESCE(SUM(quantity <= min_stock_level), 0) as low_stock_count
+        FROM products
+    """)
+    stats = cursor.fetchone()
+    return {
+        'today_sales': float(stats['today_sales']),
+        'low_stock_count': int(stats['low_stock_count']),
+        'total_products': stats['total_products'],
+        'monthly_sales': float(stats['monthly_sales'])
+    }
+
 @app.route('/api/dashboard/stats', methods=['GET'])
 @login_required
 def get_dashboard_stats():
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        
-        # Today's sales
-        cursor.execute("""
-            SELECT COALESCE(SUM(total_amount), 0) as today_sales
-            FROM sales
-            WHERE DATE(created_at) = CURDATE()
-        """)
-        today_sales = cursor.fetchone()['today_sales']
-        
-        # Low stock products
-        cursor.execute("""
-            SELECT COUNT(*) as low_stock_count
-            FROM products
-            WHERE quantity <= min_stock_level
-        """)
-        low_stock_count = cursor.fetchone()['low_stock_count']
-        
-        # Total products
-        cursor.execute("SELECT COUNT(*) as total_products FROM products")
-        total_products = cursor.fetchone()['total_products']
-        
-        # Monthly sales
-        cursor.execute("""
-            SELECT COALESCE(SUM(total_amount), 0) as monthly_sales
-            FROM sales
-            WHERE MONTH(created_at) = MONTH(CURDATE()) 
-            AND YEAR(created_at) = YEAR(CURDATE())
-        """)
-        monthly_sales = cursor.fetchone()['monthly_sales']
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'today_sales': float(today_sales),
-            'low_stock_count': low_stock_count,
-            'total_products': total_products,
-            'monthly_sales': float(monthly_sales)
-        })
+    with get_db_connection(read_only=True) as conn:
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            stats = fetch_dashboard_stats(cursor)
+            cursor.close()
+            return jsonify(stats)
     return jsonify({'error': 'Database connection failed'}), 500
 
 # Low stock alerts
+def fetch_low_stock(cursor):
+    cursor.execute("""
+        SELECT * FROM products 
+        WHERE quantity <= min_stock_level 
+        ORDER BY quantity ASC
+    """)
+    return cursor.fetchall()
+
 @app.route('/api/inventory/low-stock', methods=['GET'])
 @login_required
 def get_low_stock():
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT * FROM products 
-            WHERE quantity <= min_stock_level 
-            ORDER BY quantity ASC
-        """)
-        products = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(products)
+    with get_db_connection(read_only=True) as conn:
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            products = fetch_low_stock(cursor)
+            cursor.close()
+            return jsonify(products)
     return jsonify({'error': 'Database connection failed'}), 500
 
-# User Management APIs
-@app.route('/api/users', methods=['GET'])
-@login_required
-@role_required('admin')
-def get_users():
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, username, role, created_at FROM employees ORDER BY username")
-        users = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(users)
-    return jsonify({'error': 'Database connection failed'}), 500
+# Reports API
+REPORT_CACHE_SIZE = int(os.getenv('REPORT_CACHE_SIZE', 128))
+REPORT_CACHE_TTL = float(os.getenv('REPORT_CACHE_TTL', 300))
 
-@app.route('/api/users', methods=['POST'])
-@login_required
-@role_required('admin')
-def add_user():
-    data = request.get_json()
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
+report_cache = TTLCache(REPORT_CACHE_SIZE, REPORT_CACHE_TTL)
+# Bumped after every committed sale; reports whose range reaches today are
+# checked against it.
+sales_generation = SharedGeneration('sales')
+# Bumped when offline till sync stores sales dated before today; reports on
+# past ranges are checked against it, so ordinary checkouts leave them cached.
+past_sales_generation = SharedGeneration('past_sales')
+
+def parse_date_range(default_days=30):
+    """Read start_date/end_date (YYYY-MM-DD) from the query string.
+
+    Missing dates default to the last ``default_days`` days; raises ValueError
+    with a user-facing message when the range is malformed.
+    """
+    try:
+        end = (datetime.strptime(request.args['end_date'], '%Y-%m-%d').date()
+               if request.args.get('end_date') else datetime.now().date())
+        start = (datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+                 if request.args.get('start_date') else end - timedelta(days=default_days))
+    except ValueError:
+        raise ValueError('Dates must be YYYY-MM-DD')
+    if start > end:
+        raise ValueError('start_date must not be after end_date')
+    return start, end
+
+def build_report_summary(cursor, start, end, top):
+    """Report for ``start``..``end``; ``top`` limits the product list, None keeps every product."""
+    range_params = (start, end)
+    
+    cursor.execute("""
+        SELECT sale_date, payment_method, total_transactions, total_sales,
+               total_discounts, total_items_sold
+        FROM sales_daily_rollup
+        WHERE sale_date BETWEEN %s AND %s
+    """, range_params)
+    rollup_rows = cursor.fetchall()
+    
+    cursor.execute("""
+        SELECT p.category, SUM(si.quantity) as quantity, SUM(si.subtotal) as revenue
+        FROM sales s
+        JOIN sale_items si ON si.sale_id = s.id
+        JOIN products p ON p.id = si.product_id
+        WHERE s.created_at >= %s AND s.created_at < %s + INTERVAL 1 DAY
+        GROUP BY p.category
+        ORDER BY revenue DESC
+    """, range_params)
+    categories = cursor.fetchall()
+    
+    query = """
+        SELECT p.id as product_id, p.barcode, p.name, p.category,
+               SUM(si.quantity) as quantity, SUM(si.subtotal) as revenue
+        FROM sales s
+        JOIN sale_items si ON si.sale_id = s.id
+        JOIN products p ON p.id = si.product_id
+        WHERE s.created_at >= %s AND s.created_at < %s + INTERVAL 1 DAY
+        GROUP BY p.id, p.barcode, p.name, p.category
+        ORDER BY revenue DESC
+    """
+    if top is not None:
+        query += " LIMIT %s"
+    cursor.execute(query, range_params if top is None else range_params + (top,))
+    products = cursor.fetchall()
+    
+    cursor.execute("""
+        SELECT s.employee_id, e.username as employee_name,
+               COUNT(*) as transactions, SUM(s.total_amount) as revenue
+        FROM sales s
+        LEFT JOIN employees e ON e.id = s.employee_id
+        WHERE s.created_at >= %s AND s.created_at < %s + INTERVAL 1 DAY
+        GROUP BY s.employee_id, e.username
+        ORDER BY revenue DESC
+    """, range_params)
+    employees = cursor.fetchall()
+    
+    # Fold the per-day, per-payment-method rollup rows into the summary,
+    # a gap-filled daily series and the payment split
+    daily = {}
+    day = start
+    while day <= end:
+        daily[day] = {'date': day.isoformat(), 'total_sales': 0.0, 'total_transactions': 0}
+        day += timedelta(days=1)
+    payments = {}
+    summary = {'total_transactions': 0, 'total_revenue': 0.0, 'total_discounts': 0.0, 'total_items': 0}
+    for row in rollup_rows:
+        point = daily[row['sale_date']]
+        point['total_sales'] += float(row['total_sales'])
+        point['total_transactions'] += row['total_transactions']
+        payment = payments.setdefault(row['payment_method'], {
+            'payment_method': row['payment_method'], 'transactions': 0, 'revenue': 0.0})
+        payment['transactions'] += row['total_transactions']
+        payment['revenue'] += float(row['total_sales'])
+        summary['total_transactions'] += row['total_transactions']
+        summary['total_revenue'] += float(row['total_sales'])
+        summary['total_discounts'] += float(row['total_discounts'])
+        summary['total_items'] += row['total_items_sold']
+    summary['average_sale'] = (summary['total_revenue'] / summary['total_transactions']
+                               if summary['total_transactions'] else 0.0)
+    
+    return {
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'summary': summary,
+        'daily': list(daily.values()),
+        'payment_methods': sorted(payments.values(), key=lambda p: p['revenue'], reverse=True),
+        'categories': [{
+            'category': row['category'] or 'Uncategorized',
+            'quantity': int(row['quantity']),
+            'revenue': float(row['revenue'])
+        } for row in categories],
+        'products': [{
+            'product_id': row['product_id'],
+            'barcode': row['barcode'],
+            'name': row['name'],
+            'category': row['category'],
+            'quantity': int(row['quantity']),
+            'revenue': float(row['revenue'])
+        } for row in products],
+        'employees': [{
+            'employee_id': row['employee_id'],
+            'employee_name': row['employee_name'],
+            'transactions': row['transactions'],
+            'revenue': float(row['revenue'])
+        } for row in employees]
+    }
+
+@app.route('/api/reports/summary', methods=['GET'])
+@login_required
+def get_report_summary():
+    try:
+        start, end = parse_date_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    top = max(1, min(request.args.get('top', 10, type=int), 100))
+    
+    key = (start, end, top)
+    reaches_today = end >= datetime.now().date()
+    generation = (sales_generation if reaches_today else past_sales_generation).read()
+    cached = report_cache.get(key)
+    if cached is not None and cached[0] == generation:
+        return jsonify(cached[1])
+    
+    with get_db_connection(read_only=True) as conn:
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            report = build_report_summary(cursor, start, end, top)
+            cursor.close()
+            # A replica may not have today's newest sales yet; keep that
+            # answer only about as long as replication is expected to lag
+            ttl = READ_YOUR_WRITES_SECONDS if reaches_today and g.replica_read else None
+            report_cache.set(key, (generation, report), ttl)
+            return jsonify(report)
+    return jsonify({'error': 'Database connection failed'}), 500
+
+# Data Export
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+EXPORTS = {
+    'sales': (
+        ['Sale ID', 'Date', 'Customer', 'Phone', 'Total', 'Discount', 'Payment Method', 'Employee'],
+        """
+            SELECT s.id, s.created_at, s.customer_name, s.customer_phone, s.total_amount,
+                   s.discount, s.payment_method, e.username
+            FROM sales s
+            LEFT JOIN employees e ON s.employee_id = e.id
+            {where}
+            ORDER BY s.created_at, s.id
+        """
+    ),
+    'sale-items': (
+        ['Item ID', 'Sale ID', 'Date', 'Product ID', 'Barcode', 'Product', 'Category',
+         'Quantity', 'Unit Price', 'Subtotal'],
+        """
+            SELECT si.id, si.sale_id, s.created_at, si.product_id, p.barcode, p.name, p.category,
+                   si.quantity, si.price, si.subtotal
+            FROM sales s
+            JOIN sale_items si ON si.sale_id = s.id
+            JOIN products p ON si.product_id = p.id
+            {where}
+            ORDER BY s.created_at, si.sale_id, si.id
+        """
+    ),
+}
+
+def iter_export_rows(query, params):
+    """Yield batches of rows from an unbuffered (server-side) cursor.
+
+    The first value yielded is True once a connection is held and the query
+    is running, or False if no connection could be obtained, so callers can
+    still answer with an error before the response starts.
+    """
+    with get_db_connection(read_only=True) as conn:
+        if not conn:
+            yield False
+            return
+        cursor = conn.cursor(buffered=False)
         try:
-            hashed_password = generate_password_hash(data['password'])
-            cursor.execute("""
-                INSERT INTO employees (username, password, role)
-                VALUES (%s, %s, %s)
-            """, (data['username'], hashed_password, data['role']))
-            conn.commit()
-            user_id = cursor.lastrowid
+            cursor.execute(query, params)
+            yield True
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            # If the client went away mid-export the unread rows make this
+            # fail; the GeneratorExit then makes get_db_connection discard the
+            # connection rather than return it to the pool
+            try:
+                cursor.close()
+            except Error:
+                pass
+
+def stream_csv(header, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def stream_xlsx(header, batches, chunk_size=64 * 1024):
+    # Write-only worksheets spill rows to a temp file as they are appended;
+    # the workbook zip itself can only be assembled once every row is in.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Export')
+    sheet.append(header)
+    for rows in batches:
+        for row in rows:
+            sheet.append(row)
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def export_response(name):
+    output = request.args.get('format', 'csv')
+    if output not in ('csv', 'xlsx'):
+        return jsonify({'error': 'format must be csv or xlsx'}), 400
+    if output == 'xlsx' and Workbook is None:
+        return jsonify({'error': 'XLSX export requires the openpyxl package'}), 400
+    
+    where = ''
+    params = ()
+    if request.args.get('start_date') or request.args.get('end_date'):
+        try:
+            start, end = parse_date_range()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        where = "WHERE s.created_at >= %s AND s.created_at < %s + INTERVAL 1 DAY"
+        params = (start, end)
+    
+    header, query = EXPORTS[name]
+    batches = iter_export_rows(query.format(where=where), params)
+    if not next(batches):
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    filename = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{output}"
+    if output == 'xlsx':
+        body = stream_xlsx(header, batches)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body = stream_csv(header, batches)
+        mimetype = 'text/csv'
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={filename}'
+    })
+
+@app.route('/api/export/sales', methods=['GET'])
+@login_required
+@role_required('admin', 'manager')
+def export_sales():
+    return export_response('sales')
+
+@app.route('/api/export/sale-items', methods=['GET'])
+@login_required
+@role_required('admin', 'manager')
+def export_sale_items():
+    return export_response('sale-items')
+
+# Branch consolidation (head office)
+# Comma-separated name=host[:port][/database]; the database defaults to DB_NAME
+BRANCHES_SPEC = os.getenv('BRANCHES', '')
+BRANCH_USER = os.getenv('BRANCH_USER') or DB_CONFIG['user']
+BRANCH_PASSWORD = os.getenv('BRANCH_PASSWORD') or DB_CONFIG['password']
+# Every branch must answer within this many seconds of the fan-out starting;
+# slower branches are reported and left out of the totals
+BRANCH_TIMEOUT = float(os.getenv('BRANCH_TIMEOUT', 5))
+BRANCH_POOL_SIZE = int(os.getenv('BRANCH_POOL_SIZE', 4))
+
+class Branch:
+    """One branch shop's database, reached through its own small pool."""
+
+    def __init__(self, name, address):
+        location, _, database = address.partition('/')
+        host, _, port = location.partition(':')
+        self.name = name
+        # The pure-Python connector keeps connection_timeout as the socket
+        # timeout for every read, so a branch that stops answering mid-query
+        # fails its worker instead of holding it and its pooled connection
+        self.config = dict(DB_CONFIG, host=host, database=database or DB_CONFIG['database'],
+                           user=BRANCH_USER, password=BRANCH_PASSWORD,
+                           connection_timeout=max(1, round(BRANCH_TIMEOUT)), use_pure=True)
+        if port:
+            self.config['port'] = int(port)
+        self.pool = ConnectionPool(self.connect, size=BRANCH_POOL_SIZE, timeout=BRANCH_TIMEOUT,
+                                   ping_interval=DB_POOL_PING_INTERVAL)
+
+    def connect(self):
+        conn = mysql.connector.connect(**self.config)
+        # Have a MySQL branch server abandon a SELECT we have stopped waiting
+        # for. MariaDB has no MAX_EXECUTION_TIME; there the read timeout
+        # (BRANCH_TIMEOUT) is what ends a slow query for us.
+        if 'mariadb' not in conn.get_server_info().lower():
+            cursor = conn.cursor()
+            cursor.execute("SET SESSION MAX_EXECUTION_TIME = %s", (int(BRANCH_TIMEOUT * 1000),))
             cursor.close()
-            conn.close()
-            return jsonify({'success': True, 'id': user_id})
-        except Error as e:
-            conn.rollback()
+        return conn
+
+    def run(self, work):
+        """Return ``(work(cursor), seconds)`` for this branch."""
+        started = time.monotonic()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                result = work(cursor)
+            finally:
+                cursor.close()
+        return result, time.monotonic() - started
+
+def parse_branches(spec):
+    branches = []
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, address = entry.partition('=')
+        if not address:
+            name, address = entry, entry
+        branches.append(Branch(name.strip(), address.strip()))
+    return branches
+
+BRANCHES = parse_branches(BRANCHES_SPEC)
+# Enough threads for every branch of a few concurrent head-office requests
+branch_executor = ThreadPoolExecutor(max_workers=max(4, 4 * len(BRANCHES)), thread_name_prefix='branch-query')
+
+def fan_out(work):
+    """Run ``work(cursor)`` on every branch at once.
+
+    Returns ``(results, statuses)``: ``results`` maps branch name to what
+    ``work`` returned, for the branches that answered within BRANCH_TIMEOUT,
+    and ``statuses`` says for every branch whether it answered, timed out or
+    failed. The wait is bounded by the slowest branch or the timeout; a
+    branch still running then ends on its own through the connection's read
+    timeout (and MAX_EXECUTION_TIME on MySQL), and its connection is discarded.
+    """
+    futures = {branch_executor.submit(branch.run, work): branch for branch in BRANCHES}
+    done, _ = wait(futures, timeout=BRANCH_TIMEOUT)
+    results = {}
+    statuses = []
+    for future, branch in futures.items():
+        if future not in done:
+            # Only drops work still queued behind other requests
+            future.cancel()
+            statuses.append({'branch': branch.name, 'status': 'timeout',
+                             'error': f'No answer within {BRANCH_TIMEOUT}s'})
+            continue
+        try:
+            result, seconds = future.result()
+        except Exception as e:
+            # Any failure is that branch's alone; the others still report
+            print(f"Branch {branch.name} query error: {e!r}")
+            statuses.append({'branch': branch.name, 'status': 'error', 'error': str(e) or type(e).__name__})
+            continue
+        results[branch.name] = result
+        statuses.append({'branch': branch.name, 'status': 'ok', 'elapsed_ms': round(seconds * 1000, 1)})
+    return results, statuses
+
+def branch_response(results, statuses, body):
+    if not results:
+        return jsonify({'error': 'No branch database answered', 'branches': statuses}), 503
+    return jsonify(dict(body, branches=statuses, partial=len(results) < len(BRANCHES)))
+
+def merge_report_summaries(reports, start, end, top):
+    """Add up per-branch reports built with every product (``top=None``).
+
+    Products are matched across branches by barcode; employees belong to one
+    branch each and are listed per branch.
+    """
+    summary = {'total_transactions': 0, 'total_revenue': 0.0, 'total_discounts': 0.0, 'total_items': 0}
+    daily = {}
+    payments = {}
+    categories = {}
+    products = {}
+    employees = []
+    for name, report in reports.items():
+        for field in summary:
+            summary[field] += report['summary'][field]
+        for point in report['daily']:
+            total = daily.setdefault(point['date'], {'date': point['date'], 'total_sales': 0.0,
+                                                     'total_transactions': 0})
+            total['total_sales'] += point['total_sales']
+            total['total_transactions'] += point['total_transactions']
+        for payment in report['payment_methods']:
+            total = payments.setdefault(payment['payment_method'], {
+                'payment_method': payment['payment_method'], 'transactions': 0, 'revenue': 0.0})
+            total['transactions'] += payment['transactions']
+            total['revenue'] += payment['revenue']
+        for row in report['categories']:
+            total = categories.setdefault(row['category'], {'category': row['category'], 'quantity': 0,
+                                                            'revenue': 0.0})
+            total['quantity'] += row['quantity']
+            total['revenue'] += row['revenue']
+        for row in report['products']:
+            total = products.setdefault(row['barcode'], {'barcode': row['barcode'], 'name': row['name'],
+                                                         'category': row['category'], 'quantity': 0,
+                                                         'revenue': 0.0})
+            total['quantity'] += row['quantity']
+            total['revenue'] += row['revenue']
+        employees.extend(dict(row, branch=name) for row in report['employees'])
+    summary['average_sale'] = (summary['total_revenue'] / summary['total_transactions']
+                               if summary['total_transactions'] else 0.0)
+
+    return {
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'summary': summary,
+        'daily': sorted(daily.values(), key=lambda point: point['date']),
+        'payment_methods': sorted(payments.values(), key=lambda row: row['revenue'], reverse=True),
+        'categories': sorted(categories.values(), key=lambda row: row['revenue'], reverse=True),
+        'products': heapq.nlargest(top, products.values(), key=lambda row: row['revenue']),
+        'employees': sorted(employees, key=lambda row: row['revenue'], reverse=True),
+        'by_branch': {name: report['summary'] for name, report in reports.items()}
+    }
+
+def branches_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not BRANCHES:
+            return jsonify({'error': 'No branches configured'}), 404
+        return f(*args, **kwargs)
+    return decorated_function
+
+@app.route('/api/branches/dashboard/stats', methods=['GET'])
+@login_required
+@role_required('admin', 'manager')
+@branches_required
+def get_branch_dashboard_stats():
+    results, statuses = fan_out(fetch_dashboard_stats)
+    totals = {'today_sales': 0.0, 'low_stock_count': 0, 'total_products': 0, 'monthly_sales': 0.0}
+    for stats in results.values():
+        for field in totals:
+            totals[field] += stats[field]
+    return branch_response(results, statuses, dict(totals, by_branch=results))
+
+@app.route('/api/branches/inventory/low-stock', methods=['GET'])
+@login_required
+@role_required('admin', 'manager')
+@branches_required
+def get_branch_low_stock():
+    results, statuses = fan_out(fetch_low_stock)
+    products = [dict(product, branch=name) for name, rows in results.items() for product in rows]
+    products.sort(key=lambda product: product['quantity'])
+    return branch_response(results, statuses, {'products': products})
+
+@app.route('/api/branches/reports/summary', methods=['GET'])
+@login_required
+@role_required('admin', 'manager')
+@branches_required
+def get_branch_report_summary():
+    try:
+        start, end = parse_date_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    top = max(1, min(request.args.get('top', 10, type=int), 100))
+
+    # Each branch returns every product so the consolidated top list is exact
+    results, statuses = fan_out(lambda cursor: build_report_summary(cursor, start, end, None))
+    return branch_response(results, statuses, merge_report_summaries(results, start, end, top))
+
+# User Management APIs
+@app.route('/api/users', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_users():
+    with get_db_connection(read_only=True) as conn:
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT id, username, role, created_at FROM employees ORDER BY username")
+            users = cursor.fetchall()
             cursor.close()
-            conn.close()
-            return jsonify({'error': str(e)}), 400
+            return jsonify(users)
+    return jsonify({'error': 'Database connection failed'}), 500
+
+@app.route('/api/users', methods=['POST'])
+@login_required
+@role_required('admin')
+def add_user():
+    data = request.get_json()
+    # Hash before borrowing a connection so the pool isn't held while we wait
+    try:
+        hashed_password = password_hasher.hash(data['password'])
+    except HashPoolBusy:
+        return jsonify({'error': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
+    
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    INSERT INTO employees (username, password, role)
+                    VALUES (%s, %s, %s)
+                """, (data['username'], hashed_password, data['role']))
+                conn.commit()
+                user_id = cursor.lastrowid
+                cursor.close()
+                invalidate_user_cache(user_id)
+                return jsonify({'success': True, 'id': user_id})
+            except Error as e:
+                conn.rollback()
+                cursor.close()
+                return jsonify({'error': str(e)}), 400
     return jsonify({'error': 'Database connection failed'}), 500
 
 @app.route('/api/users/<int:user_id>', methods=['DELETE'])
@@ -549,207 +3242,757 @@ def delete_user(user_id):
     if user_id == current_user.id:
         return jsonify({'error': 'Cannot delete your own account'}), 400
     
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("DELETE FROM employees WHERE id=%s", (user_id,))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return jsonify({'success': True})
-        except Error as e:
-            conn.rollback()
-            cursor.close()
-            conn.close()
-            return jsonify({'error': str(e)}), 400
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("DELETE FROM employees WHERE id=%s", (user_id,))
+                conn.commit()
+                cursor.close()
+                invalidate_user_cache(user_id)
+                return jsonify({'success': True})
+            except Error as e:
+                conn.rollback()
+                cursor.close()
+                return jsonify({'error': str(e)}), 400
     return jsonify({'error': 'Database connection failed'}), 500
 
-# Invoice Generation
-@app.route('/api/sales/<int:sale_id>/invoice', methods=['GET'])
+# System APIs
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    if not METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    scraper = bool(METRICS_TOKEN) and hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f'Bearer {METRICS_TOKEN}'.encode())
+    if not scraper and not (current_user.is_authenticated and current_user.role == 'admin'):
+        return jsonify({'error': 'Unauthorized access'}), 403
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Health checks for the process manager / load balancer; no login required
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    database = False
+    with get_db_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+                database = True
+            except Error as e:
+                print(f"Readiness check failed: {e}")
+    if database:
+        product_index.sync()
+    ready = database and product_index.loaded
+    return jsonify({
+        'status': 'ready' if ready else 'unavailable',
+        'database': database,
+        'product_index': product_index.loaded,
+        'pid': os.getpid()
+    }), 200 if ready else 503
+
+@app.route('/api/system/password-hash', methods=['GET'])
 @login_required
-def generate_invoice(sale_id):
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get sale details
-        cursor.execute("""
+@role_required('admin')
+def get_password_hash_stats():
+    return jsonify({'hasher': password_hasher.stats(), 'throttle': login_throttle.stats()})
+
+@app.route('/api/system/db-pool', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_db_pool_stats():
+    stats = db_pool.stats()
+    if replica_set is not None:
+        stats['read_replicas'] = replica_set.stats()
+    if BRANCHES:
+        stats['branches'] = {branch.name: branch.pool.stats() for branch in BRANCHES}
+    return jsonify(stats)
+
+@app.route('/api/system/user-cache', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_user_cache_stats():
+    return jsonify(user_cache.stats())
+
+@app.route('/api/system/product-index', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_product_index_stats():
+    return jsonify(product_index.stats())
+
+@app.route('/api/system/invoice-cache', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_invoice_cache_stats():
+    return jsonify(invoice_cache.stats())
+
+@app.route('/api/system/product-index/rebuild', methods=['POST'])
+@login_required
+@role_required('admin', 'manager')
+def rebuild_product_index():
+    if product_index.rebuild():
+        return jsonify({'success': True, 'products': product_index.stats()['products']})
+    return jsonify({'error': 'Database connection failed'}), 500
+
+# Invoice Generation
+INVOICE_TEMPLATE_VERSION = 1
+INVOICE_CACHE_DIR = os.getenv('INVOICE_CACHE_DIR') or os.path.join(app.root_path, 'invoice_cache')
+INVOICE_CACHE_MAX_BYTES = int(os.getenv('INVOICE_CACHE_MAX_MB', 256)) * 1024 * 1024
+INVOICE_PREWARM = os.getenv('INVOICE_PREWARM', 'False').lower() == 'true'
+# Sale ids are only unique within one database, and the cache directory may
+# be shared between backends, branches or test databases
+INVOICE_CACHE_NAMESPACE = hashlib.sha1(
+    (f"sqlite:{os.path.abspath(SQLITE_PATH)}" if DB_BACKEND == 'sqlite' else
+     f"mysql:{DB_CONFIG['host']}:{DB_CONFIG.get('port', 3306)}/{DB_CONFIG['database']}").encode()
+).hexdigest()[:12]
+
+class InvoiceCache:
+    """Rendered invoice PDFs on disk, addressed by database, sale id and template version.
+
+    A sale never changes after checkout, so a rendered invoice stays valid
+    until INVOICE_TEMPLATE_VERSION is bumped. Files are touched on every hit
+    and the least recently used ones are evicted once the directory grows
+    past ``max_bytes``.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, sale_id):
+        return f"{INVOICE_CACHE_NAMESPACE}-{sale_id}-v{INVOICE_TEMPLATE_VERSION}"
+
+    def path(self, sale_id):
+        return os.path.join(self.directory, f"invoice-{self.key(sale_id)}.pdf")
+
+    def get(self, sale_id):
+        path = self.path(sale_id)
+        try:
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, sale_id, pdf):
+        path = self.path(sale_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(pdf)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Invoice cache write error: {e}")
+            return None
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, _, size in self._entries())
+            else:
+                self._size += len(pdf)
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith('.pdf'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.path, stat.st_size))
+        except OSError:
+            pass
+        return entries
+
+    def _evict(self):
+        # Rescan so files written by other workers are counted too
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evictions += 1
+            except OSError:
+                pass
+        self._size = total
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'directory': self.directory,
+            'template_version': INVOICE_TEMPLATE_VERSION,
+            'size_bytes': self._size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+invoice_cache = InvoiceCache(INVOICE_CACHE_DIR, INVOICE_CACHE_MAX_BYTES)
+invoice_prewarm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='invoice-prewarm')
+
+def fetch_invoice_data(cursor, sale_id):
+    """Return ``(sale, items)`` for an invoice; ``sale`` is None if it does not exist."""
+    # Get sale details
+    cursor.execute("""
+        SELECT s.*, e.username as employee_name
+        FROM sales s
+        LEFT JOIN employees e ON s.employee_id = e.id
+        WHERE s.id = %s
+    """, (sale_id,))
+    sale = cursor.fetchone()
+
+    # Get sale items
+    cursor.execute("""
+        SELECT si.*, p.name as product_name
+        FROM sale_items si
+        JOIN products p ON si.product_id = p.id
+        WHERE si.sale_id = %s
+    """, (sale_id,))
+    items = cursor.fetchall()
+    return sale, items
+
+# Invoice styles are built once; getSampleStyleSheet() hands out shared
+# objects, so mutating them per request leaked settings between renders.
+_sample_styles = getSampleStyleSheet()
+INVOICE_TITLE_STYLE = ParagraphStyle('InvoiceTitle', parent=_sample_styles['Heading1'],
+                                     alignment=TA_CENTER, textColor=colors.black,
+                                     fontSize=28, spaceAfter=5)
+INVOICE_FOOTER_STYLE = ParagraphStyle('InvoiceFooter', parent=_sample_styles['Normal'],
+                                      alignment=TA_CENTER, textColor=colors.black,
+                                      fontSize=9, spaceAfter=20)
+
+INVOICE_COMPANY_TABLE_STYLE = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'Helvetica', 9),
+    ('FONT', (2, 0), (2, 0), 'Helvetica-Bold', 11),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (1, -1), 'LEFT'),
+    ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+])
+
+INVOICE_CUSTOMER_TABLE_STYLE = TableStyle([
+    ('FONT', (0, 0), (0, 0), 'Helvetica-Bold', 10),
+    ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('TOPPADDING', (0, 0), (-1, -1), 5),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+])
+
+INVOICE_ITEMS_TABLE_STYLE = TableStyle([
+    # Header styling
+    ('BACKGROUND', (0, 0), (-1, 0), colors.black),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 10),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+
+    # Body styling
+    ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
+    ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+    ('ALIGN', (1, 1), (1, -1), 'LEFT'),
+    ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+
+    # Grid - ALL BLACK BORDERS
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('BOX', (0, 0), (-1, -1), 2, colors.black),
+
+    # Padding
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('LEFTPADDING', (0, 0), (-1, -1), 5),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+])
+
+INVOICE_TOTALS_TABLE_STYLE = TableStyle([
+    ('FONT', (2, 0), (2, 1), 'Helvetica', 10),
+    ('FONT', (2, 2), (2, 2), 'Helvetica-Bold', 12),
+    ('FONT', (3, 0), (3, 1), 'Helvetica', 10),
+    ('FONT', (3, 2), (3, 2), 'Helvetica-Bold', 12),
+    ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+    ('TEXTCOLOR', (2, 0), (-1, -1), colors.black),
+    ('BACKGROUND', (2, 2), (3, 2), colors.white),
+    ('GRID', (2, 0), (3, -1), 1, colors.black),
+    ('BOX', (2, 0), (3, -1), 2, colors.black),
+    ('TOPPADDING', (2, 0), (3, -1), 5),
+    ('BOTTOMPADDING', (2, 0), (3, -1), 5),
+    ('RIGHTPADDING', (2, 0), (3, -1), 10),
+])
+
+def format_sale_date(sale):
+    created_at = sale['created_at']
+    return created_at.strftime("%Y-%m-%d %H:%M") if isinstance(created_at, datetime) else created_at
+
+def render_invoice_pdf(sale, items):
+    sale_id = sale['id']
+    
+    # Generate Modern PDF
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, 
+                          rightMargin=0.5*inch, leftMargin=0.5*inch,
+                          topMargin=0.5*inch, bottomMargin=0.5*inch)
+    
+    elements = []
+    
+    # Header
+    elements.append(Paragraph("OIL SHOP INVOICE", INVOICE_TITLE_STYLE))
+    elements.append(Spacer(1, 0.2*inch))
+    
+    # Company Info Box
+    company_data = [
+        ['Oil Shop Management System', '', f'Invoice #: INV-{sale_id:05d}'],
+        ['123 Business Street', '', f'Date: {format_sale_date(sale)}'],
+        ['City, State 12345', '', f'Cashier: {sale["employee_name"]}'],
+        ['Phone: (123) 456-7890', '', f'Payment: {sale["payment_method"].upper()}']
+    ]
+    
+    company_table = Table(company_data, colWidths=[2.5*inch, 2*inch, 2.5*inch])
+    company_table.setStyle(INVOICE_COMPANY_TABLE_STYLE)
+    elements.append(company_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Customer Info Section
+    if sale.get('customer_phone'):
+        customer_data = [
+            ['BILL TO:', ''],
+            [f"Phone: {sale['customer_phone']}", '']
+        ]
+        customer_table = Table(customer_data, colWidths=[3.5*inch, 3.5*inch])
+        customer_table.setStyle(INVOICE_CUSTOMER_TABLE_STYLE)
+        elements.append(customer_table)
+        elements.append(Spacer(1, 0.2*inch))
+    
+    # Items Table Header
+    items_data = [['#', 'Product Name', 'Qty', 'Unit Price', 'Subtotal']]
+    
+    # Items rows
+    for idx, item in enumerate(items, 1):
+        items_data.append([
+            str(idx),
+            item['product_name'][:35],
+            str(item['quantity']),
+            f"${item['price']:.2f}",
+            f"${item['subtotal']:.2f}"
+        ])
+    
+    items_table = Table(items_data, colWidths=[0.5*inch, 3.5*inch, 1*inch, 1.2*inch, 1.3*inch])
+    items_table.setStyle(INVOICE_ITEMS_TABLE_STYLE)
+    elements.append(items_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Calculate totals
+    subtotal = sum(item['subtotal'] for item in items)
+    
+    # Totals Table
+    totals_data = [
+        ['', '', 'Subtotal:', f"${subtotal:.2f}"],
+        ['', '', 'Discount:', f"-${sale['discount']:.2f}"],
+        ['', '', 'TOTAL:', f"${sale['total_amount']:.2f}"]
+    ]
+    
+    totals_table = Table(totals_data, colWidths=[2*inch, 2.5*inch, 1.5*inch, 1.5*inch])
+    totals_table.setStyle(INVOICE_TOTALS_TABLE_STYLE)
+    elements.append(totals_table)
+    elements.append(Spacer(1, 0.5*inch))
+    
+    # Footer
+    elements.append(Paragraph("─" * 80, INVOICE_FOOTER_STYLE))
+    elements.append(Spacer(1, 0.1*inch))
+    elements.append(Paragraph("Thank you for your business!", INVOICE_FOOTER_STYLE))
+    elements.append(Paragraph("This is a computer-generated invoice.", INVOICE_FOOTER_STYLE))
+    elements.append(Spacer(1, 0.1*inch))
+    elements.append(Paragraph("For queries, contact: support@.com | www.temp.com", INVOICE_FOOTER_STYLE))
+    
+    # Build PDF
+    doc.build(elements)
+    return buffer.getvalue()
+
+# Thermal Receipts
+class ReceiptLayout:
+    """Page geometry for one thermal roll width, computed once at startup."""
+
+    FONT = 'Courier'
+
+    def __init__(self, paper_mm, printable_mm, columns):
+        self.paper_mm = paper_mm
+        self.columns = columns
+        self.page_width = paper_mm * mm
+        # Courier glyphs are 0.6em wide, so the font size that fills the
+        # printable width with exactly `columns` characters is fixed
+        self.font_size = printable_mm * mm / (columns * 0.6)
+        self.line_height = self.font_size * 1.2
+        self.margin = (paper_mm - printable_mm) * mm / 2
+
+RECEIPT_LAYOUTS = {
+    58: ReceiptLayout(58, 48, 32),
+    80: ReceiptLayout(80, 72, 48),
+}
+
+def build_receipt_lines(sale, items, columns):
+    def center(text):
+        return text[:columns].center(columns).rstrip()
+    
+    def row(left, right):
+        left = left[:columns - len(right) - 1]
+        return left + ' ' * (columns - len(left) - len(right)) + right
+    
+    rule = '-' * columns
+    lines = [
+        center('OIL SHOP'),
+        center('123 Business Street'),
+        center('Phone: (123) 456-7890'),
+        rule,
+        row('Receipt:', f'INV-{sale["id"]:05d}'),
+        row('Date:', str(format_sale_date(sale))),
+        row('Cashier:', str(sale['employee_name'] or '')),
+    ]
+    if sale.get('customer_phone'):
+        lines.append(row('Customer:', sale['customer_phone']))
+    lines.append(rule)
+    
+    for item in items:
+        lines.append(item['product_name'][:columns])
+        lines.append(row(f"  {item['quantity']} x {item['price']:.2f}", f"{item['subtotal']:.2f}"))
+    
+    subtotal = sum(item['subtotal'] for item in items)
+    lines += [
+        rule,
+        row('Subtotal', f"{subtotal:.2f}"),
+        row('Discount', f"-{sale['discount']:.2f}"),
+        row('TOTAL', f"{sale['total_amount']:.2f}"),
+        row('Payment', sale['payment_method'].upper()),
+        '=' * columns,
+        center('Thank you for your business!'),
+    ]
+    return lines
+
+def render_receipt_pdf(lines, layout):
+    height = 2 * layout.margin + len(lines) * layout.line_height + layout.font_size
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(layout.page_width, height), pageCompression=0)
+    text = pdf.beginText(layout.margin, height - layout.margin - layout.font_size)
+    text.setFont(layout.FONT, layout.font_size, layout.line_height)
+    for line in lines:
+        text.textLine(line)
+    pdf.drawText(text)
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+def render_receipt_escpos(lines):
+    # ESC @ resets the printer; GS V 66 0 feeds to the cutter and cuts
+    body = '\n'.join(lines).encode('cp437', errors='replace')
+    return b'\x1b@' + body + b'\n\n\n' + b'\x1dV\x42\x00'
+
+# Bulk Invoice Export
+INVOICE_EXPORT_WORKERS = int(os.getenv('INVOICE_EXPORT_WORKERS', 0)) or os.cpu_count() or 1
+# Sales read (with their lines) per query while exporting
+INVOICE_EXPORT_CHUNK = int(os.getenv('INVOICE_EXPORT_CHUNK', 500))
+# pypdf keeps every appended invoice in memory until the merged PDF is
+# written, so merged exports are capped; ZIP exports stream at any size
+INVOICE_MERGED_PDF_MAX = int(os.getenv('INVOICE_MERGED_PDF_MAX', 1000))
+_invoice_export_pool = None
+_invoice_export_pool_lock = threading.Lock()
+
+def get_invoice_export_pool():
+    # Spawned rather than forked: the parent holds sockets and worker threads
+    global _invoice_export_pool
+    with _invoice_export_pool_lock:
+        if _invoice_export_pool is None:
+            _invoice_export_pool = ProcessPoolExecutor(
+                max_workers=INVOICE_EXPORT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'))
+        return _invoice_export_pool
+
+INVOICE_RANGE = "s.created_at >= %s AND s.created_at < %s + INTERVAL 1 DAY"
+
+def count_invoice_range(cursor, start, end):
+    cursor.execute(f"SELECT COUNT(*) as count FROM sales s WHERE {INVOICE_RANGE}", (start, end))
+    return cursor.fetchone()['count']
+
+def iter_invoice_range(cursor, start, end, chunk_size=None):
+    """Yield ``(sale, items)`` for every sale in [start, end], oldest first.
+
+    Sales are read ``chunk_size`` at a time by keyset on (created_at, id),
+    with one query for the lines of each chunk, so only one chunk is held in
+    memory however long the range is.
+    """
+    chunk_size = chunk_size or INVOICE_EXPORT_CHUNK
+    after = None
+    while True:
+        where = INVOICE_RANGE
+        params = [start, end]
+        if after is not None:
+            where += " AND (s.created_at > %s OR (s.created_at = %s AND s.id > %s))"
+            params += [after['created_at'], after['created_at'], after['id']]
+        cursor.execute(f"""
             SELECT s.*, e.username as employee_name
             FROM sales s
             LEFT JOIN employees e ON s.employee_id = e.id
-            WHERE s.id = %s
-        """, (sale_id,))
-        sale = cursor.fetchone()
+            WHERE {where}
+            ORDER BY s.created_at, s.id
+            LIMIT %s
+        """, params + [chunk_size])
+        sales = cursor.fetchall()
+        if not sales:
+            return
         
-        # Get sale items
-        cursor.execute("""
+        placeholders = ', '.join(['%s'] * len(sales))
+        cursor.execute(f"""
             SELECT si.*, p.name as product_name
             FROM sale_items si
             JOIN products p ON si.product_id = p.id
-            WHERE si.sale_id = %s
-        """, (sale_id,))
-        items = cursor.fetchall()
+            WHERE si.sale_id IN ({placeholders})
+            ORDER BY si.sale_id, si.id
+        """, [sale['id'] for sale in sales])
+        items_by_sale = {}
+        for item in cursor.fetchall():
+            items_by_sale.setdefault(item['sale_id'], []).append(item)
         
-        cursor.close()
-        conn.close()
-        
-        # Generate Modern PDF
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                              rightMargin=0.5*inch, leftMargin=0.5*inch,
-                              topMargin=0.5*inch, bottomMargin=0.5*inch)
-        
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Custom styles - ALL BLACK
-        title_style = styles['Heading1']
-        title_style.alignment = TA_CENTER
-        title_style.textColor = colors.black
-        title_style.fontSize = 28
-        title_style.spaceAfter = 5
-        
-        subtitle_style = styles['Normal']
-        subtitle_style.alignment = TA_CENTER
-        subtitle_style.textColor = colors.black
-        subtitle_style.fontSize = 12
-        subtitle_style.spaceAfter = 20
-        
-        # Header
-        elements.append(Paragraph("OIL SHOP INVOICE", title_style))
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Company Info Box
-        company_data = [
-            ['Oil Shop Management System', '', f'Invoice #: INV-{sale_id:05d}'],
-            ['123 Business Street', '', f'Date: {sale["created_at"].strftime("%Y-%m-%d %H:%M") if isinstance(sale["created_at"], datetime) else sale["created_at"]}'],
-            ['City, State 12345', '', f'Cashier: {sale["employee_name"]}'],
-            ['Phone: (123) 456-7890', '', f'Payment: {sale["payment_method"].upper()}']
-        ]
-        
-        company_table = Table(company_data, colWidths=[2.5*inch, 2*inch, 2.5*inch])
-        company_table.setStyle(TableStyle([
-            ('FONT', (0, 0), (-1, -1), 'Helvetica', 9),
-            ('FONT', (2, 0), (2, 0), 'Helvetica-Bold', 11),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        elements.append(company_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Customer Info Section
-        if sale.get('customer_phone'):
-            customer_data = [
-                ['BILL TO:', ''],
-                [f"Phone: {sale['customer_phone']}", '']
-            ]
-            customer_table = Table(customer_data, colWidths=[3.5*inch, 3.5*inch])
-            customer_table.setStyle(TableStyle([
-                ('FONT', (0, 0), (0, 0), 'Helvetica-Bold', 10),
-                ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('TOPPADDING', (0, 0), (-1, -1), 5),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ]))
-            elements.append(customer_table)
-            elements.append(Spacer(1, 0.2*inch))
-        
-        # Items Table Header
-        items_data = [['#', 'Product Name', 'Qty', 'Unit Price', 'Subtotal']]
-        
-        # Items rows
-        for idx, item in enumerate(items, 1):
-            items_data.append([
-                str(idx),
-                item['product_name'][:35],
-                str(item['quantity']),
-                f"${item['price']:.2f}",
-                f"${item['subtotal']:.2f}"
-            ])
-        
-        items_table = Table(items_data, colWidths=[0.5*inch, 3.5*inch, 1*inch, 1.2*inch, 1.3*inch])
-        items_table.setStyle(TableStyle([
-            # Header styling
-            ('BACKGROUND', (0, 0), (-1, 0), colors.black),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 10),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            
-            # Body styling
-            ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-            ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            
-            # Grid - ALL BLACK BORDERS
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BOX', (0, 0), (-1, -1), 2, colors.black),
-            
-            # Padding
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('LEFTPADDING', (0, 0), (-1, -1), 5),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-        ]))
-        elements.append(items_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Calculate totals
-        subtotal = sum(item['subtotal'] for item in items)
-        
-        # Totals Table
-        totals_data = [
-            ['', '', 'Subtotal:', f"${subtotal:.2f}"],
-            ['', '', 'Discount:', f"-${sale['discount']:.2f}"],
-            ['', '', 'TOTAL:', f"${sale['total_amount']:.2f}"]
-        ]
-        
-        totals_table = Table(totals_data, colWidths=[2*inch, 2.5*inch, 1.5*inch, 1.5*inch])
-        totals_table.setStyle(TableStyle([
-            ('FONT', (2, 0), (2, 1), 'Helvetica', 10),
-            ('FONT', (2, 2), (2, 2), 'Helvetica-Bold', 12),
-            ('FONT', (3, 0), (3, 1), 'Helvetica', 10),
-            ('FONT', (3, 2), (3, 2), 'Helvetica-Bold', 12),
-            ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
-            ('TEXTCOLOR', (2, 0), (-1, -1), colors.black),
-            ('BACKGROUND', (2, 2), (3, 2), colors.white),
-            ('GRID', (2, 0), (3, -1), 1, colors.black),
-            ('BOX', (2, 0), (3, -1), 2, colors.black),
-            ('TOPPADDING', (2, 0), (3, -1), 5),
-            ('BOTTOMPADDING', (2, 0), (3, -1), 5),
-            ('RIGHTPADDING', (2, 0), (3, -1), 10),
-        ]))
-        elements.append(totals_table)
-        elements.append(Spacer(1, 0.5*inch))
-        
-        # Footer
-        footer_style = styles['Normal']
-        footer_style.alignment = TA_CENTER
-        footer_style.fontSize = 9
-        footer_style.textColor = colors.black
-        
-        elements.append(Paragraph("─" * 80, footer_style))
-        elements.append(Spacer(1, 0.1*inch))
-        elements.append(Paragraph("Thank you for your business!", footer_style))
-        elements.append(Paragraph("This is a computer-generated invoice.", footer_style))
-        elements.append(Spacer(1, 0.1*inch))
-        elements.append(Paragraph("For queries, contact: support@.com | www.temp.com", footer_style))
-        
-        # Build PDF
-        doc.build(elements)
-        
-        buffer.seek(0)
-        return send_file(buffer, as_attachment=True, 
-                        download_name=f'invoice_{sale_id}.pdf', 
-                        mimetype='application/pdf')
+        for sale in sales:
+            yield sale, items_by_sale.get(sale['id'], [])
+        if len(sales) < chunk_size:
+            return
+        after = sales[-1]
+
+def invoice_export_batch(start, end):
+    """Yield the number of sales in range, then ``(sale, items)`` for each.
+
+    Holds one pooled connection until exhausted or closed. The first value
+    is None if no connection could be obtained, so the route can still
+    answer with an error before the response starts.
+    """
+    with get_db_connection(read_only=True) as conn:
+        if not conn:
+            yield None
+            return
+        cursor = conn.cursor(dictionary=True)
+        try:
+            yield count_invoice_range(cursor, start, end)
+            yield from iter_invoice_range(cursor, start, end)
+        finally:
+            cursor.close()
+
+def render_invoices(batch, executor=None, window=None, use_cache=True, progress=None, total=None):
+    """Yield ``(sale_id, pdf)`` for each ``(sale, items)`` in ``batch``, in order.
+
+    Renders on ``executor`` (in-process when None) with at most ``window``
+    invoices in flight, so memory stays bounded however long the range is.
+    Invoices already in the invoice cache are read from disk instead.
+    ``total`` is passed to ``progress`` when ``batch`` has no length.
+    """
+    window = window or 2 * INVOICE_EXPORT_WORKERS
+    pending = deque()
+    total = len(batch) if total is None else total
+    done = 0
+    
+    def collect():
+        sale_id, job = pending.popleft()
+        if isinstance(job, str):
+            with open(job, 'rb') as f:
+                return sale_id, f.read()
+        return sale_id, job.result() if executor else job
+    
+    for sale, items in batch:
+        path = invoice_cache.get(sale['id']) if use_cache else None
+        if path:
+            pending.append((sale['id'], path))
+        elif executor:
+            pending.append((sale['id'], executor.submit(render_invoice_pdf, sale, items)))
+        else:
+            pending.append((sale['id'], render_invoice_pdf(sale, items)))
+        while len(pending) >= window:
+            done += 1
+            yield collect()
+            if progress:
+                progress(done, total)
+    while pending:
+        done += 1
+        yield collect()
+        if progress:
+            progress(done, total)
+
+class _ChunkWriter:
+    """Write-only file object that hands back whatever was written since the last take()."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_invoice_zip(rendered):
+    out = _ChunkWriter()
+    # PDFs are already compressed; storing them keeps the GIL free for requests
+    with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for sale_id, pdf in rendered:
+            archive.writestr(f'invoice_{sale_id:05d}.pdf', pdf)
+            yield out.take()
+    yield out.take()
+
+def stream_merged_pdf(rendered, chunk_size=64 * 1024):
+    # A PDF ends with a cross-reference table over every object, so the merged
+    # document is spooled (to disk once large) and streamed when complete.
+    # The writer holds every page until then: callers cap the invoice count
+    # at INVOICE_MERGED_PDF_MAX.
+    writer = PdfWriter()
+    for _, pdf in rendered:
+        writer.append(PdfReader(io.BytesIO(pdf)))
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+        writer.write(spool)
+        writer.close()
+        spool.seek(0)
+        while True:
+            chunk = spool.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+@app.route('/api/invoices/export', methods=['GET'])
+@login_required
+@role_required('admin', 'manager')
+def export_invoices():
+    try:
+        start, end = parse_date_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    output = request.args.get('format', 'zip')
+    if output not in ('zip', 'pdf'):
+        return jsonify({'error': 'format must be zip or pdf'}), 400
+    if output == 'pdf' and PdfWriter is None:
+        return jsonify({'error': 'Merged PDF export requires the pypdf package'}), 400
+    
+    batch = invoice_export_batch(start, end)
+    total = next(batch)
+    if total is None:
+        return jsonify({'error': 'Database connection failed'}), 500
+    if output == 'pdf' and total > INVOICE_MERGED_PDF_MAX:
+        batch.close()
+        return jsonify({'error': f'Merged PDF export is limited to {INVOICE_MERGED_PDF_MAX} invoices '
+                                 f'and this range has {total}; use format=zip or a shorter range'}), 400
+    
+    rendered = render_invoices(batch, get_invoice_export_pool(), total=total)
+    name = f'invoices_{start.isoformat()}_{end.isoformat()}'
+    if output == 'pdf':
+        body, mimetype, filename = stream_merged_pdf(rendered), 'application/pdf', f'{name}.pdf'
+    else:
+        body, mimetype, filename = stream_invoice_zip(rendered), 'application/zip', f'{name}.zip'
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={filename}',
+        'X-Invoice-Count': str(total)
+    })
+
+@app.route('/api/sales/<int:sale_id>/receipt', methods=['GET'])
+@login_required
+def generate_receipt(sale_id):
+    layout = RECEIPT_LAYOUTS.get(request.args.get('width', 80, type=int))
+    output = request.args.get('format', 'pdf')
+    if layout is None:
+        return jsonify({'error': 'width must be 58 or 80'}), 400
+    if output not in ('pdf', 'text', 'escpos'):
+        return jsonify({'error': 'format must be pdf, text or escpos'}), 400
+    
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            sale, items = fetch_invoice_data(cursor, sale_id)
+            cursor.close()
+        else:
+            return jsonify({'error': 'Database connection failed'}), 500
+    if not sale:
+        return jsonify({'error': 'Sale not found'}), 404
+    
+    lines = build_receipt_lines(sale, items, layout.columns)
+    if output == 'text':
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain')
+    if output == 'escpos':
+        return send_file(io.BytesIO(render_receipt_escpos(lines)), as_attachment=True,
+                         download_name=f'receipt_{sale_id}.bin',
+                         mimetype='application/octet-stream')
+    return send_file(io.BytesIO(render_receipt_pdf(lines, layout)),
+                     download_name=f'receipt_{sale_id}.pdf',
+                     mimetype='application/pdf')
+
+def prewarm_invoice(sale_id):
+    try:
+        with get_db_connection() as conn:
+            if not conn:
+                return
+            cursor = conn.cursor(dictionary=True)
+            sale, items = fetch_invoice_data(cursor, sale_id)
+            cursor.close()
+        if sale:
+            invoice_cache.put(sale_id, render_invoice_pdf(sale, items))
+    except Exception as e:
+        print(f"Invoice prewarm error for sale {sale_id}: {e}")
+
+@app.route('/api/sales/<int:sale_id>/invoice', methods=['GET'])
+@login_required
+def generate_invoice(sale_id):
+    path = invoice_cache.get(sale_id)
+    if path is not None:
+        try:
+            return send_file(path, as_attachment=True,
+                             download_name=f'invoice_{sale_id}.pdf',
+                             mimetype='application/pdf',
+                             etag=invoice_cache.key(sale_id), conditional=True, max_age=86400)
+        except FileNotFoundError:
+            # Evicted, here or by another worker, since get() found it
+            pass
+    
+    with get_db_connection() as conn:
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            sale, items = fetch_invoice_data(cursor, sale_id)
+            cursor.close()
+        else:
+            return jsonify({'error': 'Database connection failed'}), 500
+    
+    if not sale:
+        return jsonify({'error': 'Sale not found'}), 404
     
-    return jsonify({'error': 'Sale not found'}), 404
+    pdf = render_invoice_pdf(sale, items)
+    if invoice_cache.put(sale_id, pdf) is None:
+        return send_file(io.BytesIO(pdf), as_attachment=True,
+                         download_name=f'invoice_{sale_id}.pdf',
+                         mimetype='application/pdf')
+    # Served from memory: the cached copy can be evicted before it is opened
+    return send_file(io.BytesIO(pdf), as_attachment=True,
+                     download_name=f'invoice_{sale_id}.pdf',
+                     mimetype='application/pdf',
+                     etag=invoice_cache.key(sale_id), conditional=True, max_age=86400)
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Development server only; production traffic goes through serve.py
+    warm_caches()
+    app.run(debug=os.getenv('DEBUG', 'True').lower() == 'true',
+            host=os.getenv('HOST', '0.0.0.0'), port=int(os.getenv('PORT', 5000)))
\ No newline at end of file
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Concurrent checkout stress test
+
+Runs N tills in parallel threads, each with its own MySQL connection, all
+selling random mixed carts drawn from the same small set of products. Cart
+lines are shuffled so tills touch rows in different orders. At the end the
+script checks that:
+
+  * no product went negative,
+  * final stock == starting stock - units recorded in sale_items,
+  * every successful checkout is accounted for in sale_items.
+
+The products and sales it creates are removed afterwards and today's rollups
+rebuilt without them.
+
+Usage:
+    python benchmarks/checkout_stress.py --tills 8 --sales 50 --stock 100
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+
+from app import DB_CONFIG, InsufficientStock, run_checkout
+from rebuild_rollups import rebuild
+
+CUSTOMER_MARKER = 'Stress Test'
+
+
+def create_products(conn, count, stock):
+    cursor = conn.cursor()
+    tag = uuid.uuid4().hex[:8]
+    product_ids = []
+    for idx in range(count):
+        cursor.execute("""
+            INSERT INTO products (name, barcode, category, price, quantity)
+            VALUES (%s, %s, 'Stress Test', 10.00, %s)
+        """, (f'Stress Oil {idx}', f'STRESS-{tag}-{idx}', stock))
+        product_ids.append(cursor.lastrowid)
+    conn.commit()
+    cursor.close()
+    return product_ids
+
+
+def till(worker, product_ids, sales, results):
+    rng = random.Random(worker)
+    conn = mysql.connector.connect(**DB_CONFIG)
+    sold = {product_id: 0 for product_id in product_ids}
+    completed = rejected = 0
+    errors = []
+    for _ in range(sales):
+        lines = rng.sample(product_ids, rng.randint(1, len(product_ids)))
+        items = [{'product_id': product_id, 'quantity': rng.randint(1, 3),
+                  'price': 10, 'subtotal': 0} for product_id in lines]
+        for item in items:
+            item['subtotal'] = item['quantity'] * 10
+        data = {'customer_name': CUSTOMER_MARKER, 'items': items,
+                'total_amount': sum(item['subtotal'] for item in items)}
+        try:
+            run_checkout(conn, data, None)
+            completed += 1
+            for item in items:
+                sold[item['product_id']] += item['quantity']
+        except InsufficientStock:
+            rejected += 1
+        except mysql.connector.Error as e:
+            errors.append(str(e))
+    conn.close()
+    results[worker] = (sold, completed, rejected, errors)
+
+
+def verify(conn, product_ids, stock, sold):
+    cursor = conn.cursor()
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    cursor.execute(f"SELECT id, quantity FROM products WHERE id IN ({placeholders})", product_ids)
+    final = dict(cursor.fetchall())
+    cursor.execute(f"""
+        SELECT product_id, SUM(quantity) FROM sale_items
+        WHERE product_id IN ({placeholders}) GROUP BY product_id
+    """, product_ids)
+    recorded = {product_id: int(total) for product_id, total in cursor.fetchall()}
+    cursor.close()
+
+    ok = True
+    for product_id in product_ids:
+        expected = stock - sold[product_id]
+        line = (f"  product {product_id}: final={final[product_id]} expected={expected} "
+                f"sold={sold[product_id]} recorded={recorded.get(product_id, 0)}")
+        if final[product_id] != expected or final[product_id] < 0 or recorded.get(product_id, 0) != sold[product_id]:
+            ok = False
+            line += "  <-- MISMATCH"
+        print(line)
+    return ok
+
+
+def cleanup(conn, product_ids):
+    cursor = conn.cursor()
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    # sale_items rows go with their sales (ON DELETE CASCADE)
+    cursor.execute("DELETE FROM sales WHERE customer_name = %s", (CUSTOMER_MARKER,))
+    cursor.execute(f"DELETE FROM products WHERE id IN ({placeholders})", product_ids)
+    conn.commit()
+    cursor.close()
+    # The checkouts also added to today's rollups
+    rebuild(conn, date.today(), date.today())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress concurrent checkouts against one MySQL database")
+    parser.add_argument('--tills', type=int, default=8)
+    parser.add_argument('--sales', type=int, default=50, help='checkouts attempted per till')
+    parser.add_argument('--products', type=int, default=3)
+    parser.add_argument('--stock', type=int, default=100, help='starting stock per product')
+    parser.add_argument('--keep', action='store_true', help='keep the generated rows')
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    product_ids = create_products(conn, args.products, args.stock)
+    results = {}
+    threads = [threading.Thread(target=till, args=(worker, product_ids, args.sales, results))
+               for worker in range(args.tills)]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    sold = {product_id: 0 for product_id in product_ids}
+    completed = rejected = 0
+    errors = []
+    for worker_sold, worker_completed, worker_rejected, worker_errors in results.values():
+        for product_id, quantity in worker_sold.items():
+            sold[product_id] += quantity
+        completed += worker_completed
+        rejected += worker_rejected
+        errors.extend(worker_errors)
+
+    print(f"{args.tills} tills, {completed} sales completed, {rejected} rejected for stock, "
+          f"{len(errors)} errors in {elapsed:.2f}s ({completed / elapsed:.1f} sales/s)")
+    for error in errors[:5]:
+        print(f"  error: {error}")
+
+    ok = verify(conn, product_ids, args.stock, sold) and not errors
+    if not args.keep:
+        cleanup(conn, product_ids)
+    conn.close()
+
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
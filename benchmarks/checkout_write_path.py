@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Checkout write-path benchmark
+
+Compares the per-line INSERT/UPDATE loop that create_sale used to run with
+the set-based write_sale_items() for a range of cart sizes. Every sale is
+written inside a transaction that is rolled back, so the database is left
+untouched.
+
+Usage:
+    python benchmarks/checkout_write_path.py --sizes 1 5 10 20 50 --repeat 50
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+
+from app import DB_CONFIG, write_sale_items
+
+
+def write_sale_items_loop(cursor, sale_id, items):
+    """The original create_sale loop: two statements per cart line."""
+    for item in items:
+        cursor.execute("""
+            INSERT INTO sale_items (sale_id, product_id, quantity, price, subtotal)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (sale_id, item['product_id'], item['quantity'],
+              item['price'], item['subtotal']))
+        cursor.execute("""
+            UPDATE products SET quantity = quantity - %s WHERE id = %s
+        """, (item['quantity'], item['product_id']))
+
+
+def build_cart(products, size):
+    items = []
+    for idx in range(size):
+        product_id, price = products[idx % len(products)]
+        items.append({'product_id': product_id, 'quantity': 1,
+                      'price': price, 'subtotal': price})
+    return items
+
+
+def time_checkout(conn, writer, items, repeat):
+    cursor = conn.cursor()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.start_transaction()
+        cursor.execute("""
+            INSERT INTO sales (customer_name, total_amount, payment_method)
+            VALUES ('Benchmark', %s, 'cash')
+        """, (sum(item['subtotal'] for item in items),))
+        writer(cursor, cursor.lastrowid, items)
+        conn.rollback()
+        samples.append((time.perf_counter() - started) * 1000)
+    cursor.close()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the create_sale write path")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 10, 20, 50])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, price FROM products ORDER BY id LIMIT %s", (max(args.sizes),))
+    products = cursor.fetchall()
+    cursor.close()
+    if not products:
+        print("No products found - load database_init.sql first.")
+        sys.exit(1)
+
+    print(f"{'cart':>5} {'loop p50 ms':>12} {'loop mean':>10} {'set p50 ms':>11} {'set mean':>9} {'speedup':>8}")
+    for size in args.sizes:
+        items = build_cart(products, size)
+        loop = time_checkout(conn, write_sale_items_loop, items, args.repeat)
+        bulk = time_checkout(conn, write_sale_items, items, args.repeat)
+        print(f"{size:>5} {statistics.median(loop):>12.2f} {statistics.mean(loop):>10.2f} "
+              f"{statistics.median(bulk):>11.2f} {statistics.mean(bulk):>9.2f} "
+              f"{statistics.median(loop) / statistics.median(bulk):>7.1f}x")
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Bulk invoice export throughput benchmark
+
+Renders a synthetic batch of invoices through render_invoices() with
+increasing process-pool sizes and reports invoices per second for each, so
+the scaling with core count is visible. No database is needed; the invoice
+cache is bypassed.
+
+Usage:
+    python benchmarks/invoice_export.py --invoices 400 --workers 1 2 4 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import render_invoices, stream_invoice_zip
+from receipt_render import sample_sale
+
+
+def make_batch(count, items):
+    batch = []
+    for sale_id in range(1, count + 1):
+        sale, lines = sample_sale(items)
+        sale['id'] = sale_id
+        batch.append((sale, lines))
+    return batch
+
+
+def run(batch, workers):
+    started = time.perf_counter()
+    size = 0
+    if workers == 1:
+        for chunk in stream_invoice_zip(render_invoices(batch, use_cache=False)):
+            size += len(chunk)
+    else:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            # Start every worker before timing so process spawn is not counted
+            list(executor.map(abs, range(workers)))
+            started = time.perf_counter()
+            rendered = render_invoices(batch, executor, window=2 * workers, use_cache=False)
+            for chunk in stream_invoice_zip(rendered):
+                size += len(chunk)
+    return time.perf_counter() - started, size
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+    parser = argparse.ArgumentParser(description="Benchmark parallel bulk invoice rendering")
+    parser.add_argument('--invoices', type=int, default=200)
+    parser.add_argument('--items', type=int, default=5, help='cart lines per invoice')
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers)
+    args = parser.parse_args()
+
+    batch = make_batch(args.invoices, args.items)
+    print(f"{args.invoices} invoices, {args.items} lines each, {cpus} CPU(s)\n")
+    print(f"{'workers':>7} {'seconds':>8} {'invoices/s':>11} {'speedup':>8} {'zip MB':>7}")
+    baseline = None
+    for workers in args.workers:
+        elapsed, size = run(batch, workers)
+        rate = args.invoices / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>7} {elapsed:>8.2f} {rate:>11.1f} {rate / baseline:>7.1f}x {size / 1e6:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Product search benchmark
+
+Fills the trigram search index with a synthetic catalogue and reports the
+per-query latency of typical typeahead inputs. No database is needed.
+
+Usage:
+    python benchmarks/product_search.py --products 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import ProductSearchIndex
+
+BRANDS = ['Shell', 'Castrol', 'Mobil', 'Total', 'Valvoline', 'Motul', 'Liqui Moly', 'Gulf', 'Elf', 'Repsol']
+LINES = ['Helix Ultra', 'Edge', 'Super', 'Quartz', 'MaxLife', 'Synergy', 'Top Tec', 'Formula', 'Evolution', 'Elite']
+GRADES = ['0W-20', '5W-30', '5W-40', '10W-40', '15W-40', '20W-50']
+SIZES = ['1L', '4L', '5L', '20L']
+CATEGORIES = ['Engine Oil', 'Gear Oil', 'Filters', 'Brake Fluid', 'Coolant', 'Grease']
+
+
+def build_index(count):
+    random.seed(42)
+    index = ProductSearchIndex()
+    for product_id in range(1, count + 1):
+        index.add(product_id, {
+            'name': f'{random.choice(BRANDS)} {random.choice(LINES)} {random.choice(GRADES)} {random.choice(SIZES)}',
+            'barcode': f'{8900000000000 + product_id}',
+            'category': random.choice(CATEGORIES),
+        })
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark typeahead product search")
+    parser.add_argument('--products', type=int, default=20000, help='catalogue size')
+    parser.add_argument('--repeat', type=int, default=200, help='runs per query')
+    parser.add_argument('--limit', type=int, default=10, help='results per query')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = build_index(args.products)
+    print(f"Indexed {args.products} products in {time.perf_counter() - started:.2f}s "
+          f"({index.stats()['terms']} terms)")
+
+    queries = ['sh', 'shell', 'castrol edge', 'helix 5w', '8900000000123', 'motul 20l', 'coolant', 'xyz']
+    for query in queries:
+        query = ProductSearchIndex.normalize(query)
+        # The first search after indexing sorts the catalogue once
+        index.top(index.candidates(query), query, args.limit)
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            ids = index.candidates(query)
+            index.top(ids, query, args.limit)
+        elapsed = (time.perf_counter() - started) / args.repeat * 1000
+        print(f"  {query!r:18} {len(ids):6} matches  {elapsed:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Read endpoint scaling benchmark
+
+Times every read-only API endpoint through the Flask test client against the
+configured MySQL database, optionally after regenerating the history at each
+of several sizes with generate_history.py. For each endpoint it reports the
+first (cold) request, when in-process caches are empty, and the median and
+worst of the repeats that follow, so a query that degrades with the size of
+the sales table stands out next to one served from the rollups or the
+product index.
+
+--sizes DELETES ALL SALES before each generation; without it the current data
+is measured as it is. Results are saved as JSON under benchmarks/results/.
+
+Usage:
+    python benchmarks/read_endpoints.py
+    python benchmarks/read_endpoints.py --sizes 10000 1000000 10000000 --yes
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import mysql.connector
+
+from app import DB_CONFIG, app, encode_sales_cursor, product_index, report_cache, sales_generation
+from generate_history import generate, reset
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+def endpoints(sample):
+    """(label, path) for every GET endpoint, filled in with ids from the data."""
+    today = date.today()
+    week = f"start_date={today - timedelta(days=7)}&end_date={today}"
+    month = f"start_date={today - timedelta(days=30)}&end_date={today}"
+    year = f"start_date={today - timedelta(days=365)}&end_date={today}"
+    since = (datetime.now() - timedelta(days=1)).isoformat(timespec='seconds')
+    return [
+        ('products (full list)', '/api/products'),
+        ('products since yesterday', f'/api/products?since={since}'),
+        ('product by barcode', f"/api/products/{sample['barcode']}"),
+        ('product search', '/api/products/search?q=castrol+5w'),
+        ('suppliers', '/api/suppliers'),
+        ('low stock', '/api/inventory/low-stock'),
+        ('dashboard stats', '/api/dashboard/stats'),
+        ('recent sales', '/api/sales?recent=5'),
+        ('sales page', '/api/sales?limit=50'),
+        ('sales page (deep cursor)', f"/api/sales?limit=50&cursor={sample['cursor']}"),
+        ('sales, 7 day list', f'/api/sales?{week}'),
+        ('sale items', f"/api/sales/{sample['sale_id']}/items"),
+        ('receipt', f"/api/sales/{sample['sale_id']}/receipt"),
+        ('invoice', f"/api/sales/{sample['sale_id']}/invoice"),
+        ('report, 30 days', f'/api/reports/summary?{month}'),
+        ('report, 365 days', f'/api/reports/summary?{year}'),
+        ('export sales, 30 days', f'/api/export/sales?{month}'),
+        ('export sale items, 7 days', f'/api/export/sale-items?{week}'),
+        ('users', '/api/users'),
+    ]
+
+
+def sample_rows(conn):
+    """An admin to log in as plus a barcode, a sale and a cursor halfway through history."""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT id FROM employees WHERE role = 'admin' ORDER BY id LIMIT 1")
+    admin = cursor.fetchone()
+    cursor.execute("SELECT barcode FROM products ORDER BY id DESC LIMIT 1")
+    product = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) as count FROM sales")
+    count = cursor.fetchone()['count']
+    cursor.execute("SELECT id, created_at FROM sales ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET %s",
+                   (count // 2,))
+    middle = cursor.fetchone()
+    cursor.close()
+    if not admin or not product or not middle:
+        raise SystemExit("Need an admin user, at least one product and one sale")
+    return {'admin_id': admin['id'], 'barcode': product['barcode'], 'sales': count,
+            'sale_id': middle['id'], 'cursor': encode_sales_cursor(middle)}
+
+
+def clear_caches():
+    report_cache.clear()
+    sales_generation.bump()
+    product_index.rebuild()
+
+
+def measure(sample, repeat):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(sample['admin_id'])
+        session['_fresh'] = True
+    clear_caches()
+    results = {}
+    for label, path in endpoints(sample):
+        timings = []
+        size = 0
+        for _ in range(repeat + 1):
+            started = time.perf_counter()
+            response = client.get(path)
+            body = response.get_data()
+            timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                print(f"  {label}: HTTP {response.status_code} {body[:200]!r}")
+                break
+            size = len(body)
+        warm = timings[1:] or timings
+        results[label] = {'cold_ms': timings[0] * 1000, 'median_ms': statistics.median(warm) * 1000,
+                          'max_ms': max(warm) * 1000, 'bytes': size}
+        print(f"  {label:28} {results[label]['cold_ms']:9.1f} {results[label]['median_ms']:9.1f} "
+              f"{results[label]['max_ms']:9.1f} {size:>12,}")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the read endpoints against growing sales history")
+    parser.add_argument('--sizes', type=int, nargs='+', help='regenerate this many sales before each run')
+    parser.add_argument('--repeat', type=int, default=5, help='warm requests per endpoint')
+    parser.add_argument('--skus', type=int, default=20000)
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--yes', action='store_true', help='do not ask before deleting sales for --sizes')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/read_endpoints-<time>-<commit>.json)')
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    if args.sizes and not args.yes:
+        answer = input(f"--sizes deletes every sale in {DB_CONFIG['database']}. Continue? [y/N]: ")
+        if answer.strip().lower() != 'y':
+            print("Aborted.")
+            sys.exit(1)
+
+    runs = []
+    for size in args.sizes or [None]:
+        if size is not None:
+            print(f"Generating {size:,} sales...")
+            started = time.perf_counter()
+            reset(conn)
+            generate(conn, size, args.skus, args.years, seed=args.seed)
+            print(f"  generated in {time.perf_counter() - started:.0f}s")
+        sample = sample_rows(conn)
+        print(f"{sample['sales']:,} sales")
+        print(f"  {'endpoint':28} {'cold ms':>9} {'median ms':>9} {'max ms':>9} {'bytes':>12}")
+        runs.append({'sales': sample['sales'], 'endpoints': measure(sample, args.repeat)})
+    conn.close()
+
+    if len(runs) > 1:
+        print("\nMedian ms by number of sales")
+        print(f"  {'endpoint':28} " + ' '.join(f"{run['sales']:>11,}" for run in runs))
+        for label in runs[0]['endpoints']:
+            print(f"  {label:28} " + ' '.join(f"{run['endpoints'][label]['median_ms']:11.1f}" for run in runs))
+
+    commit = git_commit()
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"read_endpoints-{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'commit': commit, 'repeat': args.repeat, 'runs': runs}, f, indent=2)
+    print(f"✓ Results saved to {os.path.relpath(output, ROOT)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Receipt rendering benchmark
+
+Renders the same synthetic sale with the Letter-size platypus invoice and
+with the thermal receipt renderers, and reports documents per second. No
+database is needed.
+
+Usage:
+    python benchmarks/receipt_render.py --items 5 --seconds 3
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (RECEIPT_LAYOUTS, build_receipt_lines, render_invoice_pdf,
+                 render_receipt_escpos, render_receipt_pdf)
+
+
+def sample_sale(item_count):
+    items = [{
+        'product_name': f'Shell Helix Ultra 5W-40 #{idx}',
+        'quantity': 2,
+        'price': Decimal('45.99'),
+        'subtotal': Decimal('91.98'),
+    } for idx in range(item_count)]
+    sale = {
+        'id': 12345,
+        'created_at': datetime.now(),
+        'employee_name': 'cashier1',
+        'payment_method': 'cash',
+        'customer_phone': '555-1234',
+        'discount': Decimal('5.00'),
+        'total_amount': sum(item['subtotal'] for item in items) - Decimal('5.00'),
+    }
+    return sale, items
+
+
+def measure(render, seconds):
+    # Warm up once so first-use font loading is not counted
+    render()
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        render()
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark invoice vs receipt rendering")
+    parser.add_argument('--items', type=int, default=5, help='cart lines per sale')
+    parser.add_argument('--seconds', type=float, default=3, help='time spent on each renderer')
+    args = parser.parse_args()
+
+    sale, items = sample_sale(args.items)
+    renderers = [
+        ('invoice (platypus, Letter)', lambda: render_invoice_pdf(sale, items)),
+    ]
+    for width, layout in sorted(RECEIPT_LAYOUTS.items()):
+        renderers.append((f'receipt pdf ({width}mm canvas)',
+                          lambda layout=layout: render_receipt_pdf(
+                              build_receipt_lines(sale, items, layout.columns), layout)))
+        renderers.append((f'receipt escpos ({width}mm)',
+                          lambda layout=layout: render_receipt_escpos(
+                              build_receipt_lines(sale, items, layout.columns))))
+
+    baseline = None
+    print(f"{args.items} cart lines, {args.seconds:.0f}s per renderer\n")
+    print(f"{'renderer':<30} {'docs/sec':>10} {'ms/doc':>8} {'vs invoice':>11}")
+    for name, render in renderers:
+        rate = measure(render, args.seconds)
+        baseline = baseline or rate
+        print(f"{name:<30} {rate:>10.1f} {1000 / rate:>8.2f} {rate / baseline:>10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
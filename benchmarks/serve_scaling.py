@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Production server scaling benchmark
+
+Starts serve.py with an increasing number of worker processes and drives it
+with keep-alive HTTP clients running in separate processes, reporting
+requests per second for each worker count. /healthz needs no database;
+pass --path and --user/--password to load an authenticated endpoint such as
+/api/products/search?q=oil instead.
+
+Usage:
+    python benchmarks/serve_scaling.py --workers 1 2 4 --clients 16 --seconds 10
+    python benchmarks/serve_scaling.py --path "/api/products/search?q=oil" --user admin --password admin123
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def login(port, user, password):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('POST', '/login', json.dumps({'username': user, 'password': password}),
+                 {'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie')
+    if response.status != 200 or not cookie:
+        raise SystemExit(f"Login failed ({response.status})")
+    return cookie.split(';', 1)[0]
+
+
+def client(port, path, cookie, seconds, results):
+    headers = {'Cookie': cookie} if cookie else {}
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    count = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                count += 1
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port)
+    results.put((count, errors))
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/healthz')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def run(workers, args):
+    server = subprocess.Popen([sys.executable, 'serve.py', '--workers', str(workers),
+                               '--threads', str(args.threads), '--bind', f'127.0.0.1:{args.port}'],
+                              cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_up(args.port):
+            raise SystemExit("Server did not start")
+        cookie = login(args.port, args.user, args.password) if args.user else None
+
+        results = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=client, args=(args.port, args.path, cookie, args.seconds, results))
+                   for _ in range(args.clients)]
+        for process in clients:
+            process.start()
+        totals = [results.get() for _ in clients]
+        for process in clients:
+            process.join()
+        count = sum(total[0] for total in totals)
+        errors = sum(total[1] for total in totals)
+        return count / args.seconds, errors
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure requests/sec against worker count")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='worker counts to try')
+    parser.add_argument('--threads', type=int, default=4, help='threads per worker')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client processes')
+    parser.add_argument('--seconds', type=float, default=10, help='load duration per worker count')
+    parser.add_argument('--path', default='/healthz', help='endpoint to request')
+    parser.add_argument('--user', help='log in as this user first')
+    parser.add_argument('--password', help='password for --user')
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    print(f"{multiprocessing.cpu_count()} CPU(s), {args.clients} clients, GET {args.path}")
+    baseline = None
+    for workers in args.workers:
+        rate, errors = run(workers, args)
+        baseline = baseline or rate
+        print(f"  {workers:3} worker(s): {rate:9.1f} req/s  ({rate / baseline:.2f}x, {errors} errors)")
+
+
+if __name__ == '__main__':
+    main()
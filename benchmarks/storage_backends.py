@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Storage backend comparison
+
+Compares the MySQL and SQLite backends (DB_BACKEND) on:
+
+  * startup: seconds from launching a Python process to the app being
+    imported with its caches warm. For SQLite the first start is on a new
+    file, so it includes creating the database; later starts reuse it.
+  * latency: the same scripted till session run through the Flask test client
+    on each backend (barcode scans, search, checkouts, recent sales, the
+    dashboard and an uncached report), with p50/p95 per operation.
+
+Each backend runs in its own process. The session creates its own products
+and removes them and their sales afterwards. Every response is compared
+between backends, so the run also shows whether both backends answer the
+session the same way:
+
+  * the status code;
+  * the body's shape: the JSON type and format of every field, so a DECIMAL
+    that comes back as 12.5 instead of "12.50", or a date in another format,
+    is caught even where the rows differ (MySQL also holds the shop's
+    history, SQLite only the sample data);
+  * the session's own data: the scanned products, its sales in the recent
+    list with their totals and line counts, and its category in the report.
+
+The SQLite database is a temporary file; MySQL uses DB_* from .env.
+
+Usage:
+    python benchmarks/storage_backends.py --user admin --password admin123
+    python benchmarks/storage_backends.py --backends sqlite --requests 500
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CUSTOMER_MARKER = 'Backend Benchmark'
+BARCODE_PREFIX = 'BACKEND-BENCH-'
+# Fields that legitimately differ between backends (row ids, clock times)
+VOLATILE = {'id', 'sale_id', 'employee_id', 'employee_name', 'created_at', 'updated_at', 'client_ref'}
+HTTP_DATE = re.compile(r'^\w{3}, \d{2} \w{3} \d{4} \d{2}:\d{2}:\d{2} GMT$')
+ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+DECIMAL = re.compile(r'^-?\d+\.\d{2}$')
+STARTUP = ("import time; started = time.perf_counter(); import app; ready = app.warm_caches(); "
+           "print(time.perf_counter() - started, ready)")
+
+
+def shape(value):
+    """The JSON types and string formats of a response body.
+
+    Nulls carry no type and are left out; the rows of a list are merged
+    into one, since which fields are filled depends on the data.
+    """
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        merged = {}
+        for item in value:
+            for key, item_shape in (shape(item).items() if isinstance(item, dict) else [('', shape(item))]):
+                merged.setdefault(key, item_shape)
+        return [merged]
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, (int, float)):
+        return type(value).__name__
+    for name, pattern in (('http-date', HTTP_DATE), ('date', ISO_DATE), ('decimal', DECIMAL)):
+        if pattern.match(value):
+            return name
+    return 'str'
+
+
+def shape_differences(expected, actual, path=''):
+    """Fields present in both shapes whose type or format differs."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in expected.keys() & actual.keys():
+            yield from shape_differences(expected[key], actual[key], f'{path}.{key}')
+    elif isinstance(expected, list) and isinstance(actual, list):
+        yield from shape_differences(expected[0], actual[0], f'{path}[]')
+    elif expected != actual:
+        yield path or '.', expected, actual
+
+
+def without_volatile(row):
+    return {key: value for key, value in row.items() if key not in VOLATILE}
+
+
+def own_data(label, body):
+    """The part of a response that depends only on the session, so must be equal."""
+    if label == 'scan barcode':
+        return without_volatile(body)
+    if label == 'recent sales':
+        return [without_volatile(sale) for sale in body['sales'] if sale['customer_name'] == CUSTOMER_MARKER]
+    if label == 'report, 30 days':
+        return [row for row in body['categories'] if row['category'] == 'Benchmark']
+    if label in ('add product', 'checkout'):
+        return body.get('success')
+    # Search ranks the session's products among the shop's own, and the
+    # dashboard totals the whole history: only their shape is comparable
+    return None
+
+
+def run_session(args):
+    """Runs inside the child process, with DB_BACKEND already set."""
+    import app
+    from rebuild_rollups import rebuild
+
+    rng = random.Random(args.seed)
+    client = app.app.test_client()
+    response = client.post('/login', json={'username': args.user, 'password': args.password})
+    if response.status_code != 200:
+        raise SystemExit(f"Login failed ({response.status_code})")
+
+    timings = {}
+    answers = []
+
+    def call(label, method, path, **kwargs):
+        started = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        response.get_data()
+        timings.setdefault(label, []).append(time.perf_counter() - started)
+        body = response.get_json(silent=True)
+        answers.append({'label': label, 'status': response.status_code, 'shape': shape(body),
+                        'data': own_data(label, body) if response.status_code < 400 else body})
+        return response
+
+    products = []
+    for idx in range(args.products):
+        barcode = f'{BARCODE_PREFIX}{idx:04}'
+        price = round(rng.uniform(5, 90), 2)
+        response = call('add product', 'POST', '/api/products', json={
+            'name': f'Benchmark Oil {idx}', 'barcode': barcode, 'category': 'Benchmark',
+            'price': price, 'cost_price': 0, 'quantity': args.requests * 10, 'min_stock_level': 0,
+            'supplier_id': None, 'description': ''})
+        products.append((response.get_json()['id'], barcode, price))
+
+    try:
+        for _ in range(args.requests):
+            items = []
+            for product_id, barcode, price in rng.sample(products, rng.randint(1, 3)):
+                call('scan barcode', 'GET', f'/api/products/{barcode}')
+                quantity = rng.randint(1, 3)
+                items.append({'product_id': product_id, 'quantity': quantity,
+                              'price': price, 'subtotal': round(price * quantity, 2)})
+            call('search', 'GET', f'/api/products/search?q=oil+{rng.randrange(args.products)}')
+            call('checkout', 'POST', '/api/sales', json={
+                'customer_name': CUSTOMER_MARKER, 'items': items,
+                'total_amount': round(sum(item['subtotal'] for item in items), 2)})
+            call('recent sales', 'GET', '/api/sales?recent=5')
+            call('dashboard', 'GET', '/api/dashboard/stats')
+            app.report_cache.clear()
+            call('report, 30 days', 'GET', '/api/reports/summary')
+    finally:
+        with app.db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM sales WHERE customer_name = %s", (CUSTOMER_MARKER,))
+            cursor.execute("DELETE FROM products WHERE barcode LIKE %s", (BARCODE_PREFIX + '%',))
+            conn.commit()
+            cursor.close()
+            rebuild(conn, date.today(), date.today())
+
+    print(json.dumps({'timings': timings, 'answers': answers}))
+
+
+def child_env(backend, sqlite_path, args):
+    return dict(os.environ, DB_BACKEND=backend, SQLITE_PATH=sqlite_path,
+                SQLITE_ADMIN_PASSWORD=args.password, METRICS_DIR='')
+
+
+def measure_startup(backend, sqlite_path, args):
+    times = []
+    for _ in range(args.starts):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', STARTUP], cwd=ROOT, env=child_env(backend, sqlite_path, args),
+                                capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        lines = result.stdout.strip().splitlines()
+        if result.returncode != 0 or not lines or not lines[-1].endswith('True'):
+            raise SystemExit(f"{backend}: app did not start\n{result.stdout}{result.stderr}")
+        times.append((elapsed, float(lines[-1].split()[0])))
+    return times
+
+
+def measure_session(backend, sqlite_path, args):
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--session', '--user', args.user,
+                             '--password', args.password, '--requests', str(args.requests),
+                             '--products', str(args.products), '--seed', str(args.seed)],
+                            cwd=ROOT, env=child_env(backend, sqlite_path, args), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"{backend}: session failed\n{result.stdout}{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare startup and request latency of the storage backends")
+    parser.add_argument('--backends', nargs='+', choices=['mysql', 'sqlite'], default=['mysql', 'sqlite'])
+    parser.add_argument('--requests', type=int, default=200, help='customers served per backend')
+    parser.add_argument('--products', type=int, default=50, help='products created for the session')
+    parser.add_argument('--starts', type=int, default=3, help='process starts timed per backend')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--user', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--session', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.session:
+        run_session(args)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_path = os.path.join(tmp, 'benchmark.db')
+        for backend in args.backends:
+            print(f"{backend}:")
+            startup = measure_startup(backend, sqlite_path, args)
+            for run, (total, in_app) in enumerate(startup):
+                note = '  (creates the database)' if backend == 'sqlite' and run == 0 else ''
+                print(f"  start {run + 1}: {total:6.2f}s to ready ({in_app:.2f}s importing and warming){note}")
+            results[backend] = measure_session(backend, sqlite_path, args)
+
+    labels = list(next(iter(results.values()))['timings'])
+    print(f"\n  {'operation':18} " + ' '.join(f"{backend + ' p50':>12} {backend + ' p95':>12}" for backend in results))
+    for label in labels:
+        cells = []
+        for backend in results:
+            values = results[backend]['timings'].get(label, [0])
+            cells.append(f"{statistics.median(values) * 1000:10.2f}ms {percentile(values, 0.95) * 1000:10.2f}ms")
+        print(f"  {label:18} " + ' '.join(cells))
+
+    if len(results) > 1:
+        backends = list(results)
+        baseline = results[backends[0]]['answers']
+        for backend in backends[1:]:
+            answers = results[backend]['answers']
+            differences = []
+            for index, (expected, actual) in enumerate(zip(baseline, answers)):
+                if expected['status'] != actual['status']:
+                    differences.append(f"#{index} {expected['label']}: status {expected['status']} vs {actual['status']}")
+                for path, expected_shape, actual_shape in shape_differences(expected['shape'], actual['shape']):
+                    differences.append(f"#{index} {expected['label']}: {path} is {expected_shape} vs {actual_shape}")
+                if expected['data'] != actual['data']:
+                    differences.append(f"#{index} {expected['label']}: {expected['data']} vs {actual['data']}")
+            if differences or len(baseline) != len(answers):
+                print(f"❌ {backend} answered {len(differences)} time(s) differently from {backends[0]}:")
+                for difference in differences[:5]:
+                    print(f"  {difference}")
+                sys.exit(1)
+        print(f"✓ All {len(baseline)} responses had the same status, shape and session data on every backend")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Till load test
+
+Drives the real HTTP routes with the traffic of a busy shop: every till logs
+in, scans barcodes through /api/products/<barcode> with a think time between
+scans, checks out through POST /api/sales and polls the dashboard; back-office
+sessions poll the dashboard and run report queries. Tills are threads spread
+over several client processes so the load generator is not limited by one
+interpreter.
+
+The script starts serve.py itself (or targets a running server with --url),
+creates its own products with plenty of stock, and removes them, their sales
+and the matching rollup rows afterwards. Popular products are scanned more
+often than the rest, and every till draws from its own seeded generator, so a
+run with the same flags replays the same traffic.
+
+Per-endpoint p50/p95/p99 latency and throughput are printed and saved as JSON
+under benchmarks/results/ together with the commit, so runs can be compared:
+
+Usage:
+    python benchmarks/till_load.py --tills 20 --seconds 60 --user admin --password admin123
+    python benchmarks/till_load.py --tills 50 --think 0.5 --workers 4 --compare benchmarks/results/<earlier>.json
+    python benchmarks/till_load.py --url 127.0.0.1:5000 --tills 10 --user admin --password admin123
+"""
+
+import argparse
+import http.client
+import json
+import math
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import mysql.connector
+
+from app import DB_CONFIG
+from rebuild_rollups import rebuild
+
+CUSTOMER_MARKER = 'Load Test'
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+PAYMENT_METHODS = ['cash', 'cash', 'cash', 'card', 'card', 'online']
+DASHBOARD_PATHS = ['/api/dashboard/stats', '/api/sales?recent=5', '/api/inventory/low-stock']
+
+
+class Session:
+    """One logged-in browser: a keep-alive connection plus its session cookie."""
+
+    def __init__(self, host, port, samples):
+        self.host = host
+        self.port = port
+        self.samples = samples
+        self.cookie = None
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+
+    def call(self, label, method, path, body=None):
+        headers = {'Cookie': self.cookie} if self.cookie else {}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, path, body, headers)
+            response = self.conn.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self.samples.error(label)
+            return None, None
+        self.samples.add(label, time.perf_counter() - started, response.status)
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        try:
+            return response.status, json.loads(payload) if payload else None
+        except ValueError:
+            return response.status, None
+
+    def login(self, user, password):
+        status, _ = self.call('POST /login', 'POST', '/login', {'username': user, 'password': password})
+        return status == 200
+
+
+class Samples:
+    """Latencies and failure counts per endpoint label, shared by one process's tills."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.rejected = {}
+
+    def add(self, label, seconds, status):
+        with self._lock:
+            if status == 409:
+                # Out of stock is a valid answer from the till's point of view
+                self.rejected[label] = self.rejected.get(label, 0) + 1
+            elif status >= 400:
+                self.errors[label] = self.errors.get(label, 0) + 1
+                return
+            self.latencies.setdefault(label, []).append(seconds)
+
+    def error(self, label):
+        with self._lock:
+            self.errors[label] = self.errors.get(label, 0) + 1
+
+
+def pause(rng, mean, deadline):
+    """Sleep for an exponentially distributed think time, never past the deadline."""
+    if mean <= 0:
+        return
+    time.sleep(max(0.0, min(rng.expovariate(1 / mean), mean * 5, deadline - time.time())))
+
+
+def poll_dashboard(session):
+    for path in DASHBOARD_PATHS:
+        session.call(f"GET {path.split('?')[0]}", 'GET', path)
+
+
+def till(number, args, host, port, barcodes, weights, start_at, samples):
+    rng = random.Random(args.seed * 100003 + number)
+    time.sleep(max(0.0, start_at + args.ramp * number / max(args.tills, 1) - time.time()))
+    deadline = start_at + args.ramp + args.seconds
+    session = Session(host, port, samples)
+    if not session.login(args.user, args.password):
+        return
+    next_poll = time.time() + rng.uniform(0, args.dashboard_interval)
+    while time.time() < deadline:
+        items = []
+        for barcode in rng.choices(barcodes, cum_weights=weights, k=rng.randint(1, args.max_lines)):
+            status, product = session.call('GET /api/products/<barcode>', 'GET', f'/api/products/{barcode}')
+            pause(rng, args.think, deadline)
+            if status != 200:
+                continue
+            quantity = rng.randint(1, 3)
+            price = float(product['price'])
+            items.append({'product_id': product['id'], 'quantity': quantity,
+                          'price': price, 'subtotal': round(price * quantity, 2)})
+        if items and time.time() < deadline:
+            session.call('POST /api/sales', 'POST', '/api/sales', {
+                'customer_name': CUSTOMER_MARKER, 'items': items,
+                'total_amount': round(sum(item['subtotal'] for item in items), 2),
+                'payment_method': rng.choice(PAYMENT_METHODS)})
+        if time.time() >= next_poll:
+            poll_dashboard(session)
+            next_poll += args.dashboard_interval
+        pause(rng, args.checkout_think, deadline)
+
+
+def back_office(number, args, host, port, start_at, samples):
+    rng = random.Random(args.seed * 100003 - number - 1)
+    time.sleep(max(0.0, start_at + rng.uniform(0, args.ramp) - time.time()))
+    deadline = start_at + args.ramp + args.seconds
+    session = Session(host, port, samples)
+    if not session.login(args.user, args.password):
+        return
+    while time.time() < deadline:
+        poll_dashboard(session)
+        end = date.today() - timedelta(days=rng.choice([0, 0, 0, 7, 30]))
+        start = end - timedelta(days=rng.choice([1, 7, 30, 90, 365]))
+        session.call('GET /api/reports/summary', 'GET',
+                     f'/api/reports/summary?start_date={start}&end_date={end}')
+        pause(rng, args.report_interval, deadline)
+
+
+def client_process(roles, args, host, port, barcodes, start_at, results):
+    samples = Samples()
+    weights = []
+    total = 0.0
+    # Zipf-like popularity: a few products account for most scans
+    for rank in range(len(barcodes)):
+        total += 1 / (rank + 1)
+        weights.append(total)
+    threads = []
+    for role, number in roles:
+        if role == 'till':
+            target, extra = till, (barcodes, weights, start_at, samples)
+        else:
+            target, extra = back_office, (start_at, samples)
+        threads.append(threading.Thread(target=target, args=(number, args, host, port) + extra))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put((samples.latencies, samples.errors, samples.rejected))
+
+
+def create_products(conn, count, stock, seed):
+    rng = random.Random(seed)
+    tag = uuid.uuid4().hex[:8]
+    rows = [(f'Load Test Oil {idx}', f'LOAD-{tag}-{idx:05}', round(rng.uniform(2, 60), 2), stock)
+            for idx in range(count)]
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT INTO products (name, barcode, category, price, quantity)
+        VALUES (%s, %s, 'Load Test', %s, %s)
+    """, rows)
+    conn.commit()
+    cursor.close()
+    return [row[1] for row in rows]
+
+
+def cleanup(conn, barcodes, first_day):
+    cursor = conn.cursor()
+    # sale_items rows go with their sales (ON DELETE CASCADE)
+    cursor.execute("DELETE FROM sales WHERE customer_name = %s AND created_at >= %s",
+                   (CUSTOMER_MARKER, first_day))
+    placeholders = ', '.join(['%s'] * len(barcodes))
+    cursor.execute(f"DELETE FROM products WHERE barcode IN ({placeholders})", barcodes)
+    conn.commit()
+    cursor.close()
+    rebuild(conn, first_day, date.today())
+
+
+def wait_until_up(host, port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request('GET', '/readyz')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(latencies, errors, rejected, elapsed):
+    endpoints = {}
+    for label in sorted(set(latencies) | set(errors) | set(rejected)):
+        ordered = sorted(latencies.get(label, []))
+        row = {'count': len(ordered), 'errors': errors.get(label, 0),
+               'rejected': rejected.get(label, 0), 'rps': len(ordered) / elapsed}
+        if ordered:
+            row.update({f'p{point}_ms': percentile(ordered, point / 100) * 1000 for point in (50, 95, 99)})
+            row['max_ms'] = ordered[-1] * 1000
+        endpoints[label] = row
+    return endpoints
+
+
+def print_table(endpoints, previous=None):
+    print(f"  {'endpoint':34} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    for label, row in endpoints.items():
+        line = (f"  {label:34} {row['count']:7} {row['rps']:8.1f} {row.get('p50_ms', 0):8.1f} "
+                f"{row.get('p95_ms', 0):8.1f} {row.get('p99_ms', 0):8.1f} {row.get('max_ms', 0):8.1f} "
+                f"{row['errors']:7}")
+        if row['rejected']:
+            line += f"  ({row['rejected']} out of stock)"
+        before = (previous or {}).get(label)
+        if before and before.get('p95_ms') and row.get('p95_ms'):
+            line += (f"  p95 {row['p95_ms'] / before['p95_ms'] - 1:+.0%}, "
+                     f"req/s {row['rps'] / before['rps'] - 1:+.0%}")
+        print(line)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many tills against the HTTP routes")
+    parser.add_argument('--tills', type=int, default=10, help='concurrent cashier sessions')
+    parser.add_argument('--back-office', type=int, default=1, help='dashboard/report sessions')
+    parser.add_argument('--seconds', type=float, default=60, help='measured load duration')
+    parser.add_argument('--ramp', type=float, default=5, help='seconds over which sessions log in')
+    parser.add_argument('--think', type=float, default=1.0, help='mean seconds between scans')
+    parser.add_argument('--checkout-think', type=float, default=3.0, help='mean seconds between customers')
+    parser.add_argument('--max-lines', type=int, default=6, help='most products per basket')
+    parser.add_argument('--dashboard-interval', type=float, default=30, help='seconds between dashboard polls')
+    parser.add_argument('--report-interval', type=float, default=10, help='mean seconds between report queries')
+    parser.add_argument('--products', type=int, default=500, help='products created for the run')
+    parser.add_argument('--stock', type=int, default=1000000, help='starting stock per product')
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count(), help='client processes')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--user', required=True, help='account every session logs in as')
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--url', help='host:port of a running server (default: start serve.py)')
+    parser.add_argument('--workers', type=int, default=2, help='serve.py worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='serve.py threads per worker')
+    parser.add_argument('--port', type=int, default=5099, help='port for the started server')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/till_load-<time>-<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--keep', action='store_true', help='keep the generated products and sales')
+    args = parser.parse_args()
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    first_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    barcodes = create_products(conn, args.products, args.stock, args.seed)
+
+    server = None
+    if args.url:
+        host, port = args.url.rsplit(':', 1)
+        port = int(port)
+    else:
+        host, port = '127.0.0.1', args.port
+        server = subprocess.Popen([sys.executable, 'serve.py', '--workers', str(args.workers),
+                                   '--threads', str(args.threads), '--bind', f'{host}:{port}'],
+                                  cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_up(host, port):
+            raise SystemExit("Server did not become ready")
+
+        roles = [('till', number) for number in range(args.tills)]
+        roles += [('back_office', number) for number in range(args.back_office)]
+        processes = max(1, min(args.processes, len(roles)))
+        results = multiprocessing.Queue()
+        start_at = time.time() + 1
+        clients = [multiprocessing.Process(target=client_process,
+                                           args=(roles[index::processes], args, host, port, barcodes,
+                                                 start_at, results))
+                   for index in range(processes)]
+        print(f"{args.tills} tills + {args.back_office} back office over {processes} client process(es), "
+              f"{args.seconds:g}s after a {args.ramp:g}s ramp")
+        for process in clients:
+            process.start()
+        latencies, errors, rejected = {}, {}, {}
+        for _ in clients:
+            process_latencies, process_errors, process_rejected = results.get()
+            for label, values in process_latencies.items():
+                latencies.setdefault(label, []).extend(values)
+            for target, counts in ((errors, process_errors), (rejected, process_rejected)):
+                for label, count in counts.items():
+                    target[label] = target.get(label, 0) + count
+        for process in clients:
+            process.join()
+        elapsed = time.time() - start_at
+    finally:
+        if server:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+        if not args.keep:
+            cleanup(conn, barcodes, first_day)
+        conn.close()
+
+    endpoints = summarize(latencies, errors, rejected, elapsed)
+    print_table(endpoints, previous and previous['endpoints'])
+    if args.url and not args.keep:
+        print("  note: restart the server or POST /api/system/product-index/rebuild to drop the test products")
+
+    commit = git_commit()
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"till_load-{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'commit': commit, 'started': datetime.fromtimestamp(start_at).isoformat(timespec='seconds'),
+                   'elapsed': elapsed, 'cpus': multiprocessing.cpu_count(),
+                   'settings': {key: value for key, value in vars(args).items() if key != 'password'},
+                   'endpoints': endpoints}, f, indent=2)
+    print(f"✓ Results saved to {os.path.relpath(output, ROOT)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,12 @@ CREATE DATABASE IF NOT EXISTS oil_shop_db;
 USE oil_shop_db;
 
 -- Drop tables if they exist (for fresh installation)
+-- To upgrade an existing database in place instead, keeping its data, run:
+--   python migrate_database.py
+DROP TABLE IF EXISTS sales_monthly_rollup;
+DROP TABLE IF EXISTS sales_daily_rollup;
 DROP TABLE IF EXISTS sale_items;
+DROP TABLE IF EXISTS product_deletions;
 DROP TABLE IF EXISTS sales;
 DROP TABLE IF EXISTS products;
 DROP TABLE IF EXISTS suppliers;
@@ -38,7 +43,18 @@ CREATE TABLE products (
     FOREIGN KEY (supplier_id) REFERENCES suppliers(id) ON DELETE SET NULL,
     INDEX idx_barcode (barcode),
     INDEX idx_category (category),
-    INDEX idx_quantity (quantity)
+    INDEX idx_quantity (quantity),
+    INDEX idx_updated_at (updated_at),
+    FULLTEXT INDEX ft_product_search (name, barcode, category)
+);
+
+-- Create Product Deletions Table
+-- Tombstones for /api/products?since= delta sync; pruned after PRODUCT_TOMBSTONE_DAYS
+CREATE TABLE product_deletions (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    product_id INT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_deleted_at (deleted_at)
 );
 
 -- Create Employees Table
@@ -60,8 +76,10 @@ CREATE TABLE sales (
     discount DECIMAL(10, 2) DEFAULT 0,
     payment_method ENUM('cash', 'card', 'online') DEFAULT 'cash',
     employee_id INT,
+    client_ref VARCHAR(64),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE SET NULL,
+    UNIQUE KEY uq_client_ref (client_ref),
     INDEX idx_date (created_at),
     INDEX idx_employee (employee_id)
 );
@@ -81,6 +99,29 @@ CREATE TABLE sale_items (
     INDEX idx_product (product_id)
 );
 
+-- Create Sales Rollup Tables
+-- Maintained by create_sale in the same transaction as the sale; rebuild
+-- from history with: python rebuild_rollups.py
+CREATE TABLE sales_daily_rollup (
+    sale_date DATE NOT NULL,
+    payment_method ENUM('cash', 'card', 'online') NOT NULL,
+    total_transactions INT NOT NULL DEFAULT 0,
+    total_sales DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    total_discounts DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    total_items_sold INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, payment_method)
+);
+
+CREATE TABLE sales_monthly_rollup (
+    month_start DATE NOT NULL,
+    payment_method ENUM('cash', 'card', 'online') NOT NULL,
+    total_transactions INT NOT NULL DEFAULT 0,
+    total_sales DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    total_discounts DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    total_items_sold INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (month_start, payment_method)
+);
+
 -- Insert Default Admin User will be created by fix_admin_password.py script
 -- This ensures the password hash is compatible with your Werkzeug version
 
@@ -118,18 +159,31 @@ INSERT INTO sale_items (sale_id, product_id, quantity, price, subtotal) VALUES
 (2, 4, 1, 89.99, 89.99),
 (2, 1, 1, 45.99, 45.99);
 
+-- Backfill Rollups for the Sample Sales
+INSERT INTO sales_daily_rollup (sale_date, payment_method, total_transactions, total_sales, total_discounts, total_items_sold)
+SELECT DATE(s.created_at), s.payment_method, COUNT(*), SUM(s.total_amount), SUM(s.discount), COALESCE(SUM(i.items), 0)
+FROM sales s
+LEFT JOIN (SELECT sale_id, SUM(quantity) as items FROM sale_items GROUP BY sale_id) i ON i.sale_id = s.id
+GROUP BY DATE(s.created_at), s.payment_method;
+
+INSERT INTO sales_monthly_rollup (month_start, payment_method, total_transactions, total_sales, total_discounts, total_items_sold)
+SELECT DATE_SUB(sale_date, INTERVAL DAYOFMONTH(sale_date) - 1 DAY), payment_method,
+       SUM(total_transactions), SUM(total_sales), SUM(total_discounts), SUM(total_items_sold)
+FROM sales_daily_rollup
+GROUP BY DATE_SUB(sale_date, INTERVAL DAYOFMONTH(sale_date) - 1 DAY), payment_method;
+
 -- Create Views for Reporting
 
 -- Sales Summary View
 CREATE OR REPLACE VIEW sales_summary AS
 SELECT 
-    DATE(s.created_at) as sale_date,
-    COUNT(s.id) as total_transactions,
-    SUM(s.total_amount) as total_sales,
-    SUM(s.discount) as total_discounts,
-    AVG(s.total_amount) as average_sale
-FROM sales s
-GROUP BY DATE(s.created_at)
+    r.sale_date,
+    SUM(r.total_transactions) as total_transactions,
+    SUM(r.total_sales) as total_sales,
+    SUM(r.total_discounts) as total_discounts,
+    SUM(r.total_sales) / SUM(r.total_transactions) as average_sale
+FROM sales_daily_rollup r
+GROUP BY r.sale_date
 ORDER BY sale_date DESC;
 
 -- Product Sales Summary View
@@ -164,13 +218,14 @@ ORDER BY stock_deficit DESC;
 -- Monthly Sales Report View
 CREATE OR REPLACE VIEW monthly_sales_report AS
 SELECT 
-    YEAR(s.created_at) as year,
-    MONTH(s.created_at) as month,
-    COUNT(s.id) as total_transactions,
-    SUM(s.total_amount) as total_sales,
-    SUM(si.quantity) as total_items_sold,
-    COUNT(DISTINCT s.employee_id) as active_employees
-FROM sales s
-LEFT JOIN sale_items si ON s.id = si.sale_id
-GROUP BY YEAR(s.created_at), MONTH(s.created_at)
+    YEAR(r.month_start) as year,
+    MONTH(r.month_start) as month,
+    SUM(r.total_transactions) as total_transactions,
+    SUM(r.total_sales) as total_sales,
+    SUM(r.total_items_sold) as total_items_sold,
+    (SELECT COUNT(DISTINCT s.employee_id) FROM sales s
+     WHERE s.created_at >= r.month_start
+       AND s.created_at < r.month_start + INTERVAL 1 MONTH) as active_employees
+FROM sales_monthly_rollup r
+GROUP BY r.month_start
 ORDER BY year DESC, month DESC;
\ No newline at end of file
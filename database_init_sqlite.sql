@@ -0,0 +1,256 @@
+-- SQLite schema (DB_BACKEND=sqlite)
+-- Mirrors database_init.sql. The app creates a new database file from this
+-- script on first start, so it is not normally run by hand.
+--
+-- Dialect notes:
+--   * ENUM columns are TEXT with a CHECK constraint.
+--   * ON UPDATE CURRENT_TIMESTAMP is done by AFTER UPDATE triggers.
+--   * Timestamps are stored as local time text (YYYY-MM-DD HH:MM:SS) like
+--     MySQL's TIMESTAMP in the server time zone, and DECIMAL / DATE /
+--     TIMESTAMP column types are kept so the app converts them on read.
+--   * There is no FULLTEXT index; product search uses the in-memory index.
+
+DROP VIEW IF EXISTS monthly_sales_report;
+DROP VIEW IF EXISTS low_stock_alerts;
+DROP VIEW IF EXISTS product_sales_summary;
+DROP VIEW IF EXISTS sales_summary;
+DROP TABLE IF EXISTS sales_monthly_rollup;
+DROP TABLE IF EXISTS sales_daily_rollup;
+DROP TABLE IF EXISTS sale_items;
+DROP TABLE IF EXISTS product_deletions;
+DROP TABLE IF EXISTS sales;
+DROP TABLE IF EXISTS products;
+DROP TABLE IF EXISTS suppliers;
+DROP TABLE IF EXISTS employees;
+
+-- Create Suppliers Table
+CREATE TABLE suppliers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL,
+    contact_person VARCHAR(255),
+    phone VARCHAR(20),
+    email VARCHAR(255),
+    address TEXT,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TRIGGER suppliers_updated_at AFTER UPDATE ON suppliers
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE suppliers SET updated_at = datetime('now', 'localtime') WHERE id = NEW.id;
+END;
+
+-- Create Products Table
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL,
+    barcode VARCHAR(100) UNIQUE NOT NULL,
+    category VARCHAR(100),
+    price DECIMAL(10, 2) NOT NULL,
+    cost_price DECIMAL(10, 2) DEFAULT 0,
+    quantity INT DEFAULT 0,
+    min_stock_level INT DEFAULT 10,
+    supplier_id INT REFERENCES suppliers(id) ON DELETE SET NULL,
+    description TEXT,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX idx_category ON products (category);
+CREATE INDEX idx_quantity ON products (quantity);
+CREATE INDEX idx_updated_at ON products (updated_at);
+CREATE INDEX idx_supplier ON products (supplier_id);
+
+CREATE TRIGGER products_updated_at AFTER UPDATE ON products
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE products SET updated_at = datetime('now', 'localtime') WHERE id = NEW.id;
+END;
+
+-- Create Product Deletions Table
+-- Tombstones for /api/products?since= delta sync; pruned after PRODUCT_TOMBSTONE_DAYS
+CREATE TABLE product_deletions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id INT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX idx_deleted_at ON product_deletions (deleted_at);
+
+-- Create Employees Table
+CREATE TABLE employees (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(100) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    role TEXT DEFAULT 'staff' CHECK (role IN ('admin', 'manager', 'staff')),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TRIGGER employees_updated_at AFTER UPDATE ON employees
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE employees SET updated_at = datetime('now', 'localtime') WHERE id = NEW.id;
+END;
+
+-- Create Sales Table
+CREATE TABLE sales (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_name VARCHAR(255) DEFAULT 'Walk-in',
+    customer_phone VARCHAR(20),
+    total_amount DECIMAL(10, 2) NOT NULL,
+    discount DECIMAL(10, 2) DEFAULT 0,
+    payment_method TEXT DEFAULT 'cash' CHECK (payment_method IN ('cash', 'card', 'online')),
+    employee_id INT REFERENCES employees(id) ON DELETE SET NULL,
+    client_ref VARCHAR(64) UNIQUE,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX idx_date ON sales (created_at);
+CREATE INDEX idx_employee ON sales (employee_id);
+
+-- Create Sale Items Table
+CREATE TABLE sale_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sale_id INT NOT NULL REFERENCES sales(id) ON DELETE CASCADE,
+    product_id INT NOT NULL REFERENCES products(id) ON DELETE RESTRICT,
+    quantity INT NOT NULL,
+    price DECIMAL(10, 2) NOT NULL,
+    subtotal DECIMAL(10, 2) NOT NULL,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX idx_sale ON sale_items (sale_id);
+CREATE INDEX idx_product ON sale_items (product_id);
+
+-- Create Sales Rollup Tables
+-- Maintained by create_sale in the same transaction as the sale; rebuild
+-- from history with: python rebuild_rollups.py
+CREATE TABLE sales_daily_rollup (
+    sale_date DATE NOT NULL,
+    payment_method TEXT NOT NULL CHECK (payment_method IN ('cash', 'card', 'online')),
+    total_transactions INT NOT NULL DEFAULT 0,
+    total_sales DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    total_discounts DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    total_items_sold INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, payment_method)
+);
+
+CREATE TABLE sales_monthly_rollup (
+    month_start DATE NOT NULL,
+    payment_method TEXT NOT NULL CHECK (payment_method IN ('cash', 'card', 'online')),
+    total_transactions INT NOT NULL DEFAULT 0,
+    total_sales DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    total_discounts DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    total_items_sold INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (month_start, payment_method)
+);
+
+-- The default admin user is created by the app together with this schema
+-- (SQLITE_ADMIN_PASSWORD), so the sample sales below belong to it.
+
+-- Insert Sample Suppliers
+INSERT INTO suppliers (name, contact_person, phone, email, address) VALUES
+('Shell Oil Distributors', 'John Smith', '555-0101', 'john@shell.com', '123 Main St, City'),
+('Mobil Oil Supply', 'Jane Doe', '555-0102', 'jane@mobil.com', '456 Oak Ave, City'),
+('Castrol Industries', 'Bob Johnson', '555-0103', 'bob@castrol.com', '789 Pine Rd, City');
+
+-- Insert Sample Products
+INSERT INTO products (name, barcode, category, price, cost_price, quantity, min_stock_level, supplier_id, description) VALUES
+('Shell Helix Ultra 5W-40', '1234567890123', 'Engine Oil', 45.99, 32.00, 50, 10, 1, 'Premium synthetic engine oil'),
+('Mobil 1 ESP 5W-30', '1234567890124', 'Engine Oil', 42.50, 29.50, 45, 10, 2, 'Advanced full synthetic engine oil'),
+('Castrol GTX 10W-40', '1234567890125', 'Engine Oil', 35.99, 24.00, 60, 15, 3, 'Premium conventional motor oil'),
+('Shell Rimula R6 LM', '1234567890126', 'Diesel Oil', 89.99, 65.00, 30, 8, 1, 'Heavy-duty diesel engine oil'),
+('Mobil Delvac MX 15W-40', '1234567890127', 'Diesel Oil', 82.50, 58.00, 35, 8, 2, 'Diesel engine protection'),
+('Castrol Power 1 Racing 4T', '1234567890128', 'Motorcycle Oil', 38.99, 26.00, 40, 10, 3, '4-stroke motorcycle oil'),
+('Shell Advance Ultra 4', '1234567890129', 'Motorcycle Oil', 41.50, 28.50, 38, 10, 1, 'Premium motorcycle engine oil'),
+('Mobil Super 3000 X1', '1234567890130', 'Engine Oil', 39.99, 27.00, 55, 12, 2, 'Synthetic engine oil'),
+('Castrol Magnatec 5W-30', '1234567890131', 'Engine Oil', 44.99, 31.00, 42, 10, 3, 'Intelligent molecules protection'),
+('Shell Helix HX7 10W-40', '1234567890132', 'Engine Oil', 34.99, 23.50, 65, 15, 1, 'Semi-synthetic motor oil'),
+('Hydraulic Oil ISO 68', '1234567890133', 'Hydraulic Oil', 55.99, 38.00, 25, 8, 2, 'Industrial hydraulic oil'),
+('Gear Oil 80W-90', '1234567890134', 'Gear Oil', 28.99, 19.00, 48, 12, 3, 'Automotive gear oil'),
+('2-Stroke Oil', '1234567890135', 'Engine Oil', 22.99, 15.00, 70, 20, 1, 'High-performance 2-stroke oil'),
+('ATF Dexron III', '1234567890136', 'Transmission Oil', 32.99, 22.00, 52, 12, 2, 'Automatic transmission fluid'),
+('Brake Fluid DOT 4', '1234567890137', 'Brake Fluid', 18.99, 12.00, 80, 20, 3, 'High-performance brake fluid');
+
+-- Insert Sample Sales (for demonstration)
+INSERT INTO sales (customer_name, customer_phone, total_amount, discount, payment_method, employee_id) VALUES
+('John Customer', '555-1234', 91.98, 0, 'cash', 1),
+('Jane Smith', '555-5678', 135.97, 5.00, 'card', 1);
+
+INSERT INTO sale_items (sale_id, product_id, quantity, price, subtotal) VALUES
+(1, 1, 2, 45.99, 91.98),
+(2, 4, 1, 89.99, 89.99),
+(2, 1, 1, 45.99, 45.99);
+
+-- Backfill Rollups for the Sample Sales
+INSERT INTO sales_daily_rollup (sale_date, payment_method, total_transactions, total_sales, total_discounts, total_items_sold)
+SELECT DATE(s.created_at), s.payment_method, COUNT(*), SUM(s.total_amount), SUM(s.discount), COALESCE(SUM(i.items), 0)
+FROM sales s
+LEFT JOIN (SELECT sale_id, SUM(quantity) as items FROM sale_items GROUP BY sale_id) i ON i.sale_id = s.id
+GROUP BY DATE(s.created_at), s.payment_method;
+
+INSERT INTO sales_monthly_rollup (month_start, payment_method, total_transactions, total_sales, total_discounts, total_items_sold)
+SELECT date(sale_date, 'start of month'), payment_method,
+       SUM(total_transactions), SUM(total_sales), SUM(total_discounts), SUM(total_items_sold)
+FROM sales_daily_rollup
+GROUP BY date(sale_date, 'start of month'), payment_method;
+
+-- Create Views for Reporting
+
+-- Sales Summary View
+CREATE VIEW sales_summary AS
+SELECT
+    r.sale_date,
+    SUM(r.total_transactions) as total_transactions,
+    SUM(r.total_sales) as total_sales,
+    SUM(r.total_discounts) as total_discounts,
+    SUM(r.total_sales) / SUM(r.total_transactions) as average_sale
+FROM sales_daily_rollup r
+GROUP BY r.sale_date
+ORDER BY sale_date DESC;
+
+-- Product Sales Summary View
+CREATE VIEW product_sales_summary AS
+SELECT
+    p.id,
+    p.name,
+    p.category,
+    p.barcode,
+    SUM(si.quantity) as total_sold,
+    SUM(si.subtotal) as total_revenue,
+    p.quantity as current_stock
+FROM products p
+LEFT JOIN sale_items si ON p.id = si.product_id
+GROUP BY p.id, p.name, p.category, p.barcode, p.quantity
+ORDER BY total_sold DESC;
+
+-- Low Stock Alert View
+CREATE VIEW low_stock_alerts AS
+SELECT
+    id,
+    name,
+    barcode,
+    category,
+    quantity,
+    min_stock_level,
+    (min_stock_level - quantity) as stock_deficit
+FROM products
+WHERE quantity <= min_stock_level
+ORDER BY stock_deficit DESC;
+
+-- Monthly Sales Report View
+CREATE VIEW monthly_sales_report AS
+SELECT
+    CAST(strftime('%Y', r.month_start) AS INTEGER) as year,
+    CAST(strftime('%m', r.month_start) AS INTEGER) as month,
+    SUM(r.total_transactions) as total_transactions,
+    SUM(r.total_sales) as total_sales,
+    SUM(r.total_items_sold) as total_items_sold,
+    (SELECT COUNT(DISTINCT s.employee_id) FROM sales s
+     WHERE s.created_at >= r.month_start
+       AND s.created_at < date(r.month_start, '+1 month')) as active_employees
+FROM sales_monthly_rollup r
+GROUP BY r.month_start
+ORDER BY year DESC, month DESC;
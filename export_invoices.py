@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Bulk Invoice Export
+
+Renders every invoice in a date range across a process pool and writes them
+to a ZIP archive (one PDF per sale) or a single merged PDF. A merged PDF is
+built in memory, so it is limited to INVOICE_MERGED_PDF_MAX invoices.
+
+Usage:
+    python export_invoices.py --from 2024-01-01 --to 2024-01-31
+    python export_invoices.py --from 2024-01-01 --to 2024-01-31 --format pdf --workers 4
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from mysql.connector import Error
+
+from app import (INVOICE_EXPORT_WORKERS, INVOICE_MERGED_PDF_MAX, PdfWriter, connect_database,
+                 count_invoice_range, iter_invoice_range, render_invoices, stream_invoice_zip,
+                 stream_merged_pdf)
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export all invoices in a date range")
+    parser.add_argument('--from', dest='start', type=parse_date, required=True, help='first day (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end', type=parse_date, required=True, help='last day (YYYY-MM-DD)')
+    parser.add_argument('--format', choices=['zip', 'pdf'], default='zip')
+    parser.add_argument('--workers', type=int, default=INVOICE_EXPORT_WORKERS)
+    parser.add_argument('--output', help='output file (default: invoices_<from>_<to>.<format>)')
+    args = parser.parse_args()
+
+    if args.format == 'pdf' and PdfWriter is None:
+        print("❌ Merged PDF export requires pypdf: pip install pypdf")
+        sys.exit(1)
+    output = args.output or f'invoices_{args.start}_{args.end}.{args.format}'
+
+    try:
+        conn = connect_database()
+        cursor = conn.cursor(dictionary=True)
+        total = count_invoice_range(cursor, args.start, args.end)
+    except Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+
+    if not total:
+        print("No sales found in that range.")
+        conn.close()
+        return
+    if args.format == 'pdf' and total > INVOICE_MERGED_PDF_MAX:
+        print(f"❌ A merged PDF is limited to {INVOICE_MERGED_PDF_MAX} invoices (INVOICE_MERGED_PDF_MAX) "
+              f"and this range has {total}; use --format zip or a shorter range")
+        conn.close()
+        sys.exit(1)
+    print(f"Exporting {total} invoices with {args.workers} worker(s) to {output}")
+
+    started = time.perf_counter()
+
+    def progress(done, total):
+        if done % 25 == 0 or done == total:
+            rate = done / (time.perf_counter() - started)
+            print(f"  {done}/{total} invoices ({rate:.1f}/s)", flush=True)
+
+    try:
+        # Sales are read a chunk at a time as rendering proceeds
+        batch = iter_invoice_range(cursor, args.start, args.end)
+        with ProcessPoolExecutor(max_workers=args.workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            rendered = render_invoices(batch, executor, window=2 * args.workers, progress=progress,
+                                       total=total)
+            stream = stream_merged_pdf(rendered) if args.format == 'pdf' else stream_invoice_zip(rendered)
+            with open(output, 'wb') as f:
+                for chunk in stream:
+                    f.write(chunk)
+    except Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+    finally:
+        cursor.close()
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✓ {total} invoices in {elapsed:.1f}s ({total / elapsed:.1f}/s)")
+
+
+if __name__ == '__main__':
+    main()
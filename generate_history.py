@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Synthetic Sales History Generator
+
+Fills the schema with years of made-up but plausible trading so that query
+plans can be judged on realistic volumes: tens of thousands of products in
+seasonal categories, a set of suppliers and employees, and millions of sales
+with their sale_items. Daily volume follows a yearly season, the day of the
+week and steady growth; opening hours have a lunchtime and an evening peak;
+a few products in every category sell far more than the rest. The same
+--seed always produces the same history.
+
+Rows are written with multi-row INSERTs in batches, with unique and foreign
+key checks relaxed for the session, and the rollup tables are rebuilt at the
+end. Generated products, suppliers and employees are marked (GEN- barcodes,
+"Generated Supplier" names, gen_ usernames) so --reset can remove them again.
+
+Usage:
+    python generate_history.py --sales 1000000
+    python generate_history.py --sales 10000000 --skus 50000 --years 5 --reset
+"""
+
+import argparse
+import glob
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import mysql.connector
+from mysql.connector import Error
+from werkzeug.security import generate_password_hash
+
+from app import DB_CONFIG, INVOICE_CACHE_DIR, INVOICE_CACHE_NAMESPACE, PASSWORD_HASH_METHOD
+from rebuild_rollups import rebuild
+
+GENERATED_BARCODE = 'GEN-'
+GENERATED_SUPPLIER = 'Generated Supplier'
+GENERATED_USERNAME = 'gen_'
+
+# name, price range, relative volume, month (1-12) of peak demand, seasonal swing
+CATEGORIES = [
+    ('Engine Oil', (18, 95), 10, 6, 0.20),
+    ('Gear Oil', (12, 60), 3, 6, 0.15),
+    ('Hydraulic Oil', (25, 140), 2, 5, 0.10),
+    ('Brake Fluid', (6, 25), 3, 11, 0.10),
+    ('Coolant', (8, 35), 4, 7, 0.35),
+    ('Antifreeze', (9, 40), 3, 1, 0.70),
+    ('Grease', (5, 30), 2, 4, 0.10),
+    ('Two-Stroke Oil', (7, 28), 2, 5, 0.45),
+    ('Transmission Fluid', (14, 55), 2, 6, 0.15),
+    ('Filters', (6, 45), 5, 6, 0.10),
+    ('Additives', (4, 22), 3, 12, 0.25),
+]
+BRANDS = ['Shell', 'Mobil', 'Castrol', 'Valvoline', 'Total', 'Liqui Moly', 'Motul', 'Fuchs',
+          'Petronas', 'Repsol', 'Gulf', 'Elf', 'Ravenol', 'Addinol', 'Eni']
+GRADES = ['0W-20', '0W-30', '5W-30', '5W-40', '10W-40', '15W-40', '20W-50', 'SAE 30', 'SAE 90',
+          '75W-90', 'DOT 4', 'G12', 'G13', 'EP2', 'ATF III', 'Premium', 'Pro', 'Heavy Duty']
+SIZES = ['250ml', '500ml', '1L', '4L', '5L', '20L', '60L', '208L']
+# Monday..Sunday
+WEEKDAY_WEIGHTS = [0.90, 0.95, 1.00, 1.00, 1.15, 1.35, 0.70]
+# Opening hours 8:00-19:59
+HOUR_WEIGHTS = [3, 6, 8, 9, 11, 10, 7, 7, 8, 10, 9, 5]
+PAYMENT_METHODS = ['cash', 'card', 'online']
+CUSTOMERS = ['Walk-in'] * 8 + ['Fleet Services', 'City Taxis', 'Green Farm', 'Harbour Marine',
+                              'Auto Repair Co', 'Northside Garage']
+
+
+def zipf_weights(count, exponent=1.1):
+    """Cumulative weights where item n is chosen about 1/n**exponent as often as item 1."""
+    weights = []
+    total = 0.0
+    for rank in range(count):
+        total += 1 / (rank + 1) ** exponent
+        weights.append(total)
+    return weights
+
+
+def seasonal(month, peak, swing):
+    return 1 + swing * math.cos(2 * math.pi * (month - peak) / 12)
+
+
+def reset(conn):
+    """Remove all sales and the rows a previous run generated."""
+    cursor = conn.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in ('sale_items', 'sales', 'sales_daily_rollup', 'sales_monthly_rollup'):
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    cursor.execute("DELETE FROM products WHERE barcode LIKE %s", (GENERATED_BARCODE + '%',))
+    cursor.execute("DELETE FROM suppliers WHERE name LIKE %s", (GENERATED_SUPPLIER + '%',))
+    cursor.execute("DELETE FROM employees WHERE username LIKE %s", (GENERATED_USERNAME.replace('_', r'\_') + '%',))
+    conn.commit()
+    cursor.close()
+    # Sale ids start again from 1, so cached invoices would belong to other sales
+    for path in glob.glob(os.path.join(INVOICE_CACHE_DIR, f'invoice-{INVOICE_CACHE_NAMESPACE}-*.pdf')):
+        os.remove(path)
+
+
+def create_suppliers(cursor, count, rng):
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM suppliers")
+    first = cursor.fetchone()[0] + 1
+    rows = [(first + idx, f'{GENERATED_SUPPLIER} {idx + 1}', f'{rng.choice(BRANDS)} Sales',
+             f'555-{rng.randint(1000, 9999)}', f'orders{idx + 1}@supplier.example')
+            for idx in range(count)]
+    cursor.executemany("INSERT INTO suppliers (id, name, contact_person, phone, email) "
+                       "VALUES (%s, %s, %s, %s, %s)", rows)
+    return [row[0] for row in rows]
+
+
+def create_employees(cursor, count, password):
+    password_hash = generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM employees")
+    first = cursor.fetchone()[0] + 1
+    rows = []
+    for idx in range(count):
+        role = 'manager' if idx < max(1, count // 6) else 'staff'
+        rows.append((first + idx, f'{GENERATED_USERNAME}{role}{idx + 1}', password_hash, role))
+    cursor.executemany("INSERT INTO employees (id, username, password, role) VALUES (%s, %s, %s, %s)", rows)
+    return [row[0] for row in rows]
+
+
+def create_products(cursor, count, supplier_ids, rng, batch):
+    """Insert ``count`` products; returns {category: [(id, price), ...]} most popular first."""
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM products")
+    next_id = cursor.fetchone()[0] + 1
+    volume = sum(category[2] for category in CATEGORIES)
+    catalogue = {}
+    rows = []
+    for name, (low, high), weight, _, _ in CATEGORIES:
+        products = catalogue[name] = []
+        for _ in range(max(1, round(count * weight / volume))):
+            price = round(rng.uniform(low, high), 2)
+            rows.append((next_id, f'{rng.choice(BRANDS)} {name} {rng.choice(GRADES)} {rng.choice(SIZES)}',
+                         f'{GENERATED_BARCODE}{next_id:09}', name, price, round(price * rng.uniform(0.55, 0.8), 2),
+                         rng.randint(0, 400), rng.choice([5, 10, 10, 20]), rng.choice(supplier_ids)))
+            products.append((next_id, price))
+            next_id += 1
+        rng.shuffle(products)
+    for start in range(0, len(rows), batch):
+        cursor.executemany("""
+            INSERT INTO products (id, name, barcode, category, price, cost_price, quantity,
+                                  min_stock_level, supplier_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, rows[start:start + batch])
+    return catalogue
+
+
+def daily_volumes(first_day, days, total, rng):
+    """Split ``total`` sales over the days with season, weekday, growth and noise."""
+    weights = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        weight = (WEEKDAY_WEIGHTS[day.weekday()] * seasonal(day.month, 6, 0.15)
+                  * (1 + 0.5 * offset / days) * rng.lognormvariate(0, 0.15))
+        if day.month == 12 and day.day >= 20:
+            weight *= 1.3
+        weights.append(weight)
+    scale = total / sum(weights)
+    volumes = []
+    carry = 0.0
+    for weight in weights:
+        carry += weight * scale
+        volumes.append(int(carry))
+        carry -= int(carry)
+    volumes[-1] += total - sum(volumes)
+    return volumes
+
+
+def flush(cursor, conn, sales, items):
+    cursor.executemany("""
+        INSERT INTO sales (id, customer_name, total_amount, discount, payment_method, employee_id, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, sales)
+    cursor.executemany("""
+        INSERT INTO sale_items (sale_id, product_id, quantity, price, subtotal, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, items)
+    conn.commit()
+    sales.clear()
+    items.clear()
+
+
+def generate(conn, sales, skus=20000, years=3, employees=12, suppliers=40, seed=1,
+             batch=5000, password='cashier123', progress=True):
+    """Generate the catalogue and ``sales`` sales ending yesterday; returns (first_day, last_day)."""
+    rng = random.Random(seed)
+    cursor = conn.cursor()
+    cursor.execute("SET unique_checks = 0, foreign_key_checks = 0")
+
+    supplier_ids = create_suppliers(cursor, suppliers, rng)
+    employee_ids = create_employees(cursor, employees, password)
+    catalogue = create_products(cursor, skus, supplier_ids, rng, batch)
+    conn.commit()
+
+    categories = list(catalogue)
+    popularity = {name: zipf_weights(len(products)) for name, products in catalogue.items()}
+    category_weights = {}
+    for month in range(1, 13):
+        total = 0.0
+        category_weights[month] = cumulative = []
+        for name, _, weight, peak, swing in CATEGORIES:
+            total += weight * seasonal(month, peak, swing)
+            cumulative.append(total)
+    hour_weights = list(zip(range(8, 20), HOUR_WEIGHTS))
+    staff_weights = zipf_weights(len(employee_ids), 0.5)
+
+    last_day = date.today() - timedelta(days=1)
+    first_day = last_day - timedelta(days=round(365.25 * years) - 1)
+    days = (last_day - first_day).days + 1
+
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM sales")
+    sale_id = cursor.fetchone()[0]
+    sale_rows = []
+    item_rows = []
+    written = 0
+    started = time.perf_counter()
+    for offset, volume in enumerate(daily_volumes(first_day, days, sales, rng)):
+        day = first_day + timedelta(days=offset)
+        opening = datetime(day.year, day.month, day.day)
+        month_weights = category_weights[day.month]
+        hours = rng.choices([hour for hour, _ in hour_weights], weights=[w for _, w in hour_weights], k=volume)
+        # Sales are written in time order, as the tills would have
+        for seconds in sorted(hour * 3600 + rng.randrange(3600) for hour in hours):
+            sale_id += 1
+            created_at = opening + timedelta(seconds=seconds)
+            total = 0.0
+            lines = min(1 + int(rng.expovariate(0.8)), 8)
+            for name in rng.choices(categories, cum_weights=month_weights, k=lines):
+                product_id, price = rng.choices(catalogue[name], cum_weights=popularity[name])[0]
+                quantity = 1 if rng.random() < 0.7 else rng.randint(2, 6)
+                subtotal = round(price * quantity, 2)
+                total += subtotal
+                item_rows.append((sale_id, product_id, quantity, price, subtotal, created_at))
+            discount = round(total * rng.choice([0.05, 0.1]), 2) if rng.random() < 0.06 else 0
+            sale_rows.append((sale_id, rng.choice(CUSTOMERS), round(total - discount, 2), discount,
+                              rng.choices(PAYMENT_METHODS, weights=[55, 35, 10])[0],
+                              employee_ids[rng.choices(range(len(employee_ids)), cum_weights=staff_weights)[0]],
+                              created_at))
+            if len(sale_rows) >= batch:
+                written += len(sale_rows)
+                flush(cursor, conn, sale_rows, item_rows)
+                if progress and written % (batch * 20) == 0:
+                    rate = written / (time.perf_counter() - started)
+                    print(f"  {written:,} of {sales:,} sales ({rate:,.0f}/s)", flush=True)
+    if sale_rows:
+        flush(cursor, conn, sale_rows, item_rows)
+
+    cursor.execute("SET unique_checks = 1, foreign_key_checks = 1")
+    cursor.close()
+    rebuild(conn, first_day, last_day)
+    return first_day, last_day
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the database with synthetic sales history")
+    parser.add_argument('--sales', type=int, default=1000000, help='number of sales to generate')
+    parser.add_argument('--skus', type=int, default=20000, help='number of products')
+    parser.add_argument('--years', type=float, default=3, help='length of the history, ending yesterday')
+    parser.add_argument('--employees', type=int, default=12)
+    parser.add_argument('--suppliers', type=int, default=40)
+    parser.add_argument('--batch', type=int, default=5000, help='sales per multi-row INSERT')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--password', default='cashier123', help='password for the generated employees')
+    parser.add_argument('--reset', action='store_true',
+                        help='first delete ALL sales and the rows of earlier generator runs')
+    args = parser.parse_args()
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        if args.reset:
+            answer = input(f"Delete every sale in {DB_CONFIG['database']} before generating? [y/N]: ")
+            if answer.strip().lower() != 'y':
+                print("Aborted.")
+                sys.exit(1)
+            reset(conn)
+            print("✓ Sales and earlier generated rows removed")
+        started = time.perf_counter()
+        first_day, last_day = generate(conn, args.sales, args.skus, args.years, args.employees,
+                                       args.suppliers, args.seed, args.batch, args.password)
+        conn.close()
+    except Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+
+    print(f"✓ {args.sales:,} sales across {args.skus:,} products from {first_day} to {last_day} "
+          f"in {time.perf_counter() - started:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
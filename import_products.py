@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Bulk Product Import
+
+Loads a supplier price list (CSV or XLSX) into the products table. Rows are
+validated up front, then upserted by barcode in chunked statements inside a
+single transaction; rows that fail validation are reported and skipped.
+
+Usage:
+    python import_products.py pricelist.csv
+    python import_products.py pricelist.xlsx --dry-run
+"""
+
+import argparse
+import sys
+import time
+
+from mysql.connector import Error
+
+from app import connect_database, import_products, pd, read_product_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a product catalogue")
+    parser.add_argument('file', help='CSV or XLSX file with name, barcode and price columns')
+    parser.add_argument('--dry-run', action='store_true', help='validate only, write nothing')
+    parser.add_argument('--max-errors', type=int, default=20, help='row errors to print')
+    args = parser.parse_args()
+
+    if pd is None:
+        print("❌ Product import requires pandas: pip install pandas")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    try:
+        with open(args.file, 'rb') as f:
+            frame = read_product_file(f, args.file)
+    except Exception as e:
+        print(f"❌ Could not read {args.file}: {e}")
+        sys.exit(1)
+
+    try:
+        conn = connect_database()
+        result = import_products(conn, frame, args.dry_run)
+        conn.close()
+    except (Error, ValueError) as e:
+        print(f"❌ Import failed: {e}")
+        sys.exit(1)
+
+    for error in result['errors'][:args.max_errors]:
+        print(f"  row {error['row']} ({error['barcode'] or 'no barcode'}): {'; '.join(error['errors'])}")
+    if result['failed'] > args.max_errors:
+        print(f"  ... and {result['failed'] - args.max_errors} more")
+
+    elapsed = time.perf_counter() - started
+    if args.dry_run:
+        print(f"✓ Dry run: {result['valid_rows']} of {result['total_rows']} rows valid ({elapsed:.1f}s)")
+    else:
+        print(f"✓ {result['inserted']} inserted, {result['updated']} updated, "
+              f"{result['failed']} skipped ({elapsed:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
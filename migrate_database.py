@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Database Migration
+
+Brings a MySQL database created with an older database_init.sql up to the
+current schema without touching its data: the sales rollup tables, product
+delete tombstones for delta sync, the client_ref idempotency key used by
+offline till sync, and the product indexes. Each step checks
+information_schema first, so it is safe to run again. Run it once after
+upgrading, before starting the new version.
+
+SQLite databases are always created with the current schema.
+
+Usage:
+    python migrate_database.py --dry-run     # list what is missing
+    python migrate_database.py
+"""
+
+import argparse
+import os
+import re
+import sys
+
+from mysql.connector import Error
+
+from app import DB_BACKEND, DB_CONFIG, connect_database
+from rebuild_rollups import CREATE_TABLE, ROLLUP_TABLES, rebuild
+
+INIT_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_init.sql')
+
+
+def table_exists(cursor, table):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (table,))
+    return cursor.fetchone() is not None
+
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+# (description, check that is true once applied, DDL), in order
+STEPS = [
+    ('sales_daily_rollup table', lambda cursor: table_exists(cursor, 'sales_daily_rollup'),
+     CREATE_TABLE.format(table='sales_daily_rollup', key=ROLLUP_TABLES['sales_daily_rollup'])),
+    ('sales_monthly_rollup table', lambda cursor: table_exists(cursor, 'sales_monthly_rollup'),
+     CREATE_TABLE.format(table='sales_monthly_rollup', key=ROLLUP_TABLES['sales_monthly_rollup'])),
+    ('product_deletions table', lambda cursor: table_exists(cursor, 'product_deletions'), """
+        CREATE TABLE IF NOT EXISTS product_deletions (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            product_id INT NOT NULL,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_deleted_at (deleted_at)
+        )
+    """),
+    ('products.idx_updated_at index', lambda cursor: index_exists(cursor, 'products', 'idx_updated_at'),
+     "ALTER TABLE products ADD INDEX idx_updated_at (updated_at)"),
+    ('products.ft_product_search index', lambda cursor: index_exists(cursor, 'products', 'ft_product_search'),
+     "ALTER TABLE products ADD FULLTEXT INDEX ft_product_search (name, barcode, category)"),
+    ('sales.client_ref column', lambda cursor: column_exists(cursor, 'sales', 'client_ref'),
+     "ALTER TABLE sales ADD COLUMN client_ref VARCHAR(64) AFTER employee_id"),
+    ('sales.uq_client_ref index', lambda cursor: index_exists(cursor, 'sales', 'uq_client_ref'),
+     "ALTER TABLE sales ADD UNIQUE KEY uq_client_ref (client_ref)"),
+]
+
+
+def view_statements():
+    """The reporting views from database_init.sql, which now read the rollups."""
+    with open(INIT_SQL) as f:
+        return [statement.rstrip(';') for statement in
+                re.findall(r'CREATE OR REPLACE VIEW\s+\w+\s+AS.*?;', f.read(), re.DOTALL)]
+
+
+def migrate(conn, dry_run=False):
+    """Apply every missing step; returns the descriptions of those applied (or due)."""
+    cursor = conn.cursor()
+    missing = []
+    for description, done, ddl in STEPS:
+        if done(cursor):
+            print(f"  ✓ {description}")
+            continue
+        missing.append(description)
+        if dry_run:
+            print(f"  - {description}: missing")
+            continue
+        print(f"  + {description}...", flush=True)
+        cursor.execute(ddl)
+
+    if not dry_run:
+        statements = view_statements()
+        for statement in statements:
+            cursor.execute(statement)
+        print(f"  ✓ {len(statements)} reporting views recreated")
+    cursor.close()
+
+    # New rollup tables start empty; fill them from the sales history
+    if not dry_run and any(description.endswith('rollup table') for description in missing):
+        rebuild(conn)
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upgrade an existing database to the current schema")
+    parser.add_argument('--dry-run', action='store_true', help='only report what is missing')
+    args = parser.parse_args()
+
+    if DB_BACKEND != 'mysql':
+        print("SQLite databases are created with the current schema; nothing to migrate.")
+        return
+
+    try:
+        conn = connect_database()
+        print(f"Migrating {DB_CONFIG['database']} on {DB_CONFIG['host']}...")
+        applied = migrate(conn, args.dry_run)
+        conn.close()
+    except Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+
+    if args.dry_run:
+        print(f"{len(applied)} step(s) to apply" if applied else "✓ Schema is up to date")
+    else:
+        print(f"✓ Applied {len(applied)} step(s)" if applied else "✓ Schema was already up to date")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Sales Rollup Rebuild
+
+Reconstructs sales_daily_rollup and sales_monthly_rollup from the sales and
+sale_items history. migrate_database.py runs it when it creates the tables
+on an existing database; run it directly at any time to repair the rollups.
+
+Usage:
+    python rebuild_rollups.py                              # everything
+    python rebuild_rollups.py --from 2024-01-01 --to 2024-03-31
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from mysql.connector import Error
+
+from app import DB_BACKEND, connect_database
+
+ROLLUP_TABLES = {
+    'sales_daily_rollup': 'sale_date',
+    'sales_monthly_rollup': 'month_start',
+}
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        {key} DATE NOT NULL,
+        payment_method ENUM('cash', 'card', 'online') NOT NULL,
+        total_transactions INT NOT NULL DEFAULT 0,
+        total_sales DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        total_discounts DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        total_items_sold INT NOT NULL DEFAULT 0,
+        PRIMARY KEY ({key}, payment_method)
+    )
+"""
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def month_bounds(start, end):
+    """Widen [start, end] to whole months so monthly rows can be rebuilt exactly."""
+    first = start.replace(day=1)
+    next_month = (end.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return first, next_month
+
+
+def rebuild(conn, start=None, end=None):
+    cursor = conn.cursor()
+    if DB_BACKEND == 'mysql':
+        # The SQLite schema always has the rollup tables
+        for table, key in ROLLUP_TABLES.items():
+            cursor.execute(CREATE_TABLE.format(table=table, key=key))
+
+    if start is None or end is None:
+        cursor.execute("SELECT MIN(created_at), MAX(created_at) FROM sales")
+        first, last = cursor.fetchone()
+        if first is None:
+            print("No sales found - rollups cleared.")
+            for table in ROLLUP_TABLES:
+                cursor.execute(f"DELETE FROM {table}")
+            conn.commit()
+            cursor.close()
+            return
+        start = start or first.date()
+        end = end or last.date()
+    range_start, range_end = month_bounds(start, end)
+    print(f"Rebuilding rollups for {range_start} to {range_end - timedelta(days=1)}...")
+
+    cursor.execute("DELETE FROM sales_daily_rollup WHERE sale_date >= %s AND sale_date < %s",
+                   (range_start, range_end))
+    cursor.execute("""
+        INSERT INTO sales_daily_rollup (sale_date, payment_method, total_transactions,
+                                        total_sales, total_discounts, total_items_sold)
+        SELECT DATE(s.created_at), s.payment_method, COUNT(*),
+               SUM(s.total_amount), SUM(s.discount), COALESCE(SUM(i.items), 0)
+        FROM sales s
+        LEFT JOIN (
+            SELECT si.sale_id, SUM(si.quantity) as items
+            FROM sale_items si
+            JOIN sales s2 ON s2.id = si.sale_id
+            WHERE s2.created_at >= %s AND s2.created_at < %s
+            GROUP BY si.sale_id
+        ) i ON i.sale_id = s.id
+        WHERE s.created_at >= %s AND s.created_at < %s
+        GROUP BY DATE(s.created_at), s.payment_method
+    """, (range_start, range_end, range_start, range_end))
+    daily_rows = cursor.rowcount
+
+    cursor.execute("DELETE FROM sales_monthly_rollup WHERE month_start >= %s AND month_start < %s",
+                   (range_start, range_end))
+    cursor.execute("""
+        INSERT INTO sales_monthly_rollup (month_start, payment_method, total_transactions,
+                                          total_sales, total_discounts, total_items_sold)
+        SELECT sale_date - INTERVAL (DAYOFMONTH(sale_date) - 1) DAY, payment_method,
+               SUM(total_transactions), SUM(total_sales), SUM(total_discounts), SUM(total_items_sold)
+        FROM sales_daily_rollup
+        WHERE sale_date >= %s AND sale_date < %s
+        GROUP BY sale_date - INTERVAL (DAYOFMONTH(sale_date) - 1) DAY, payment_method
+    """, (range_start, range_end))
+    monthly_rows = cursor.rowcount
+
+    conn.commit()
+    cursor.close()
+    print(f"✓ {daily_rows} daily and {monthly_rows} monthly rollup rows written")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the sales rollup tables from history")
+    parser.add_argument('--from', dest='start', type=parse_date, help='first day to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end', type=parse_date, help='last day to rebuild (YYYY-MM-DD)')
+    args = parser.parse_args()
+
+    if args.start and args.end and args.start > args.end:
+        print("❌ --from must not be after --to")
+        sys.exit(1)
+
+    try:
+        conn = connect_database()
+        rebuild(conn, args.start, args.end)
+        conn.close()
+    except Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
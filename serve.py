@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Production Server
+
+Serves the app through gunicorn with a pool of pre-forked worker processes,
+each running WEB_THREADS request threads. The app is imported and its caches
+warmed once in the master, so workers start with the product index already
+loaded (shared copy-on-write) and keep it current through the usual cache
+generations. On Windows, where gunicorn does not run, waitress serves the
+app from a single process with WEB_THREADS threads.
+
+Settings come from .env (see .env.example). Command-line flags override them.
+
+Usage:
+    python serve.py
+    python serve.py --workers 4 --threads 8 --bind 0.0.0.0:8000
+
+Graceful restart (in-flight requests finish, then workers are replaced):
+    kill -HUP $(cat "$WEB_PIDFILE")
+
+Deploying new code (workers fork from the master, so HUP keeps old code):
+    kill -USR2 $(cat "$WEB_PIDFILE")        # start a new master beside the old one
+    kill -QUIT $(cat "$WEB_PIDFILE.oldbin") # once the new workers pass /readyz
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+
+from app import BRANCHES, METRICS_DIR, app, db_pool, replica_set, warm_caches
+
+
+def settings(args):
+    workers = args.workers or int(os.getenv('WEB_WORKERS', 0)) or multiprocessing.cpu_count()
+    max_requests = int(os.getenv('WEB_MAX_REQUESTS', 0))
+    return {
+        'bind': args.bind or f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5000)}",
+        'workers': workers,
+        'threads': args.threads or int(os.getenv('WEB_THREADS', 4)),
+        'worker_class': 'gthread',
+        'timeout': int(os.getenv('WEB_TIMEOUT', 120)),
+        'graceful_timeout': int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30)),
+        'keepalive': int(os.getenv('WEB_KEEPALIVE', 5)),
+        'max_requests': max_requests,
+        'max_requests_jitter': max_requests // 10,
+        'pidfile': os.getenv('WEB_PIDFILE') or None,
+        'accesslog': os.getenv('WEB_ACCESS_LOG') or None,
+        'errorlog': '-',
+        'preload_app': True,
+        'when_ready': when_ready,
+        'post_fork': post_fork,
+    }
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before any fork
+    if warm_caches():
+        server.log.info("Caches warmed in master")
+    else:
+        server.log.warning("Could not warm caches; workers will load them on first use")
+    # Sockets must not be shared across processes; each worker opens its own
+    db_pool.close_all()
+    if replica_set is not None:
+        replica_set.close_all()
+    # Snapshots left by a previous run's workers would be summed into /metrics
+    if METRICS_DIR:
+        for path in glob.glob(os.path.join(METRICS_DIR, 'metrics-*.json')):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    db_pool.close_all()
+    if replica_set is not None:
+        replica_set.close_all()
+    for branch in BRANCHES:
+        branch.pool.close_all()
+    server.log.info(f"Worker {worker.pid} ready")
+
+
+def serve_gunicorn(options):
+    from gunicorn.app.base import BaseApplication
+
+    class ShopApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    ShopApplication().run()
+
+
+def serve_waitress(options):
+    from waitress import serve
+
+    host, port = options['bind'].rsplit(':', 1)
+    warm_caches()
+    print(f"Serving on {host}:{port} with {options['threads']} threads (waitress)")
+    serve(app, host=host, port=int(port), threads=options['threads'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the production server")
+    parser.add_argument('--bind', help='host:port (default: HOST:PORT from .env)')
+    parser.add_argument('--workers', type=int, help='worker processes (default: WEB_WORKERS or CPU count)')
+    parser.add_argument('--threads', type=int, help='threads per worker (default: WEB_THREADS or 4)')
+    args = parser.parse_args()
+
+    options = settings(args)
+    if sys.platform == 'win32':
+        serve_waitress(options)
+    else:
+        serve_gunicorn(options)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,19 @@
 import os
+import sys
 import webbrowser
 import time
 import subprocess
 
-project_path = r"C:\Users\USER\Desktop\project\oil-shop-management"
+# Run from the folder this launcher lives in (next to the .exe when frozen)
+if getattr(sys, 'frozen', False):
+    project_path = os.path.dirname(sys.executable)
+else:
+    project_path = os.path.dirname(os.path.abspath(__file__))
 
 os.chdir(project_path)
 
-subprocess.Popen(["python", "app.py"])
+subprocess.Popen(["python", "serve.py"])
 
 time.sleep(2)
 
-webbrowser.open("http://127.0.0.1:5000")
+webbrowser.open(f"http://127.0.0.1:{os.getenv('PORT', 5000)}")
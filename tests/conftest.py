@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app reads its settings on import; keep its files out of the working tree.
+# Each test then points it at the backend it runs on (see test_backends.py).
+SCRATCH = tempfile.mkdtemp(prefix='oil-shop-tests-')
+os.environ.update(DB_BACKEND='sqlite', SQLITE_PATH=os.path.join(SCRATCH, 'oil_shop.db'), METRICS_DIR='',
+                  CACHE_STAMP_DIR=SCRATCH, INVOICE_CACHE_DIR=os.path.join(SCRATCH, 'invoice_cache'))
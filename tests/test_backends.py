@@ -0,0 +1,179 @@
+"""
+Checkout, offline till sync, reporting and sales paging on both storage backends.
+
+Each test runs once per DB_BACKEND. SQLite uses a new database file per
+test; MySQL uses DB_* from .env and is skipped when no server answers. The
+tests create their own products and sales and remove them afterwards.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+import app
+from rebuild_rollups import rebuild
+
+CUSTOMER_MARKER = 'Backend Test'
+BARCODE_PREFIX = 'BACKEND-TEST-'
+
+
+@pytest.fixture(params=['sqlite', 'mysql'])
+def backend(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'DB_BACKEND', request.param)
+    monkeypatch.setattr(app, 'SQLITE_PATH', str(tmp_path / 'oil_shop.db'))
+    monkeypatch.setattr(app, '_sqlite_ready', False)
+    pool = app.ConnectionPool(app.connect_database, size=4, timeout=5)
+    try:
+        pool.release(pool.acquire())
+    except app.Error as e:
+        pytest.skip(f"{request.param} database not reachable: {e}")
+    monkeypatch.setattr(app, 'db_pool', pool)
+    monkeypatch.setattr(app, 'product_index', app.ProductIndex())
+    app.report_cache.clear()
+    app.user_cache.clear()
+
+    yield request.param
+
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM sales WHERE customer_name = %s", (CUSTOMER_MARKER,))
+        cursor.execute("DELETE FROM products WHERE barcode LIKE %s", (BARCODE_PREFIX + '%',))
+        conn.commit()
+        cursor.close()
+        rebuild(conn, date.today(), date.today())
+    pool.close_all()
+    app.report_cache.clear()
+
+
+@pytest.fixture
+def client(backend):
+    with app.db_pool.connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT id FROM employees WHERE role = 'admin' ORDER BY id LIMIT 1")
+        admin = cursor.fetchone()
+        cursor.close()
+    if not admin:
+        pytest.skip(f"{backend} database has no admin user")
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin['id'])
+        session['_fresh'] = True
+    return client
+
+
+def add_product(client, suffix, price='12.50', quantity=10):
+    response = client.post('/api/products', json={
+        'name': f'Backend Test Oil {suffix}', 'barcode': f'{BARCODE_PREFIX}{suffix}', 'category': 'Backend Test',
+        'price': price, 'cost_price': '0', 'quantity': quantity, 'min_stock_level': 0,
+        'supplier_id': None, 'description': ''})
+    assert response.status_code == 200
+    return response.get_json()['id']
+
+
+def checkout(client, *lines):
+    """``lines`` are (product_id, quantity, price) with price as a string."""
+    items = [{'product_id': product_id, 'quantity': quantity, 'price': price,
+              'subtotal': f'{float(price) * quantity:.2f}'} for product_id, quantity, price in lines]
+    return client.post('/api/sales', json={
+        'customer_name': CUSTOMER_MARKER, 'items': items,
+        'total_amount': f"{sum(float(item['subtotal']) for item in items):.2f}"})
+
+
+def test_checkout_takes_stock_and_records_lines(client):
+    product_id = add_product(client, 'CHECKOUT', price='12.50', quantity=10)
+
+    response = checkout(client, (product_id, 3, '12.50'))
+    assert response.status_code == 200
+    sale_id = response.get_json()['sale_id']
+
+    product = client.get(f'/api/products/{BARCODE_PREFIX}CHECKOUT').get_json()
+    assert product['quantity'] == 7
+    assert product['price'] == '12.50'
+
+    items = client.get(f'/api/sales/{sale_id}/items').get_json()
+    assert [(item['product_id'], item['quantity'], item['price'], item['subtotal'], item['product_name'])
+            for item in items] == [(product_id, 3, '12.50', '37.50', 'Backend Test Oil CHECKOUT')]
+
+    response = checkout(client, (product_id, 8, '12.50'))
+    assert response.status_code == 409
+    assert client.get(f'/api/products/{BARCODE_PREFIX}CHECKOUT').get_json()['quantity'] == 7
+
+
+def test_checkout_refuses_malformed_lines(client):
+    product_id = add_product(client, 'MALFORMED', quantity=10)
+
+    assert checkout(client, (product_id, -2, '12.50')).status_code == 400
+    assert checkout(client, (product_id, 0, '12.50')).status_code == 400
+    response = client.post('/api/sales', json={'customer_name': CUSTOMER_MARKER, 'total_amount': '25.00', 'items': [
+        {'product_id': product_id, 'quantity': 'two', 'price': '12.50', 'subtotal': '25.00'}]})
+    assert response.status_code == 400
+    assert client.get(f'/api/products/{BARCODE_PREFIX}MALFORMED').get_json()['quantity'] == 10
+
+
+def test_queued_sale_with_utc_timestamp_is_stored(client):
+    product_id = add_product(client, 'QUEUED')
+    # What the till sends: Date.toISOString(), which ends in Z
+    sold_at = (datetime.now(timezone.utc) - timedelta(minutes=5)).replace(microsecond=0)
+    sale = {'idempotency_key': 'backend-test-queued', 'sold_at': sold_at.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'customer_name': CUSTOMER_MARKER, 'total_amount': '12.50',
+            'items': [{'product_id': product_id, 'quantity': 1, 'price': '12.50', 'subtotal': '12.50'}]}
+
+    response = client.post('/api/sales/batch', json={'sales': [sale]})
+    assert response.status_code == 200
+    [result] = response.get_json()['results']
+    assert result['status'] == 'created'
+
+    with app.db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT created_at FROM sales WHERE id = %s", (result['sale_id'],))
+        [(created_at,)] = cursor.fetchall()
+        cursor.close()
+    assert created_at == sold_at.astimezone().replace(tzinfo=None)
+
+
+def test_report_totals_include_new_sales(client):
+    today = date.today().isoformat()
+    path = f'/api/reports/summary?start_date={today}&end_date={today}&top=100'
+    before = client.get(path).get_json()['summary']
+    first = add_product(client, 'REPORT-A', price='4.25')
+    second = add_product(client, 'REPORT-B', price='19.99')
+
+    assert checkout(client, (first, 2, '4.25'), (second, 1, '19.99')).status_code == 200
+    assert checkout(client, (second, 3, '19.99')).status_code == 200
+
+    report = client.get(path).get_json()
+    summary = report['summary']
+    assert summary['total_transactions'] == before['total_transactions'] + 2
+    assert summary['total_items'] == before['total_items'] + 6
+    assert summary['total_revenue'] == pytest.approx(before['total_revenue'] + 8.50 + 19.99 * 4)
+    assert [category for category in report['categories'] if category['category'] == 'Backend Test'] == [
+        {'category': 'Backend Test', 'quantity': 6, 'revenue': pytest.approx(8.50 + 19.99 * 4)}]
+    products = {row['barcode']: (row['quantity'], row['revenue']) for row in report['products']}
+    assert products[f'{BARCODE_PREFIX}REPORT-A'] == (2, pytest.approx(8.50))
+    assert products[f'{BARCODE_PREFIX}REPORT-B'] == (4, pytest.approx(79.96))
+    assert report['daily'] == [{'date': today, 'total_sales': pytest.approx(summary['total_revenue']),
+                                'total_transactions': summary['total_transactions']}]
+
+
+def test_sales_pages_cover_every_sale_once(client):
+    product_id = add_product(client, 'PAGES', quantity=100)
+    created = [checkout(client, (product_id, 1, '12.50')).get_json()['sale_id'] for _ in range(5)]
+
+    today = date.today().isoformat()
+    seen = []
+    page = client.get(f'/api/sales?limit=2&start_date={today}&end_date={today}').get_json()
+    while True:
+        assert len(page['sales']) <= 2
+        seen += [sale['id'] for sale in page['sales']]
+        if not page['next_cursor']:
+            break
+        page = client.get(f"/api/sales?limit=2&start_date={today}&end_date={today}"
+                          f"&cursor={page['next_cursor']}").get_json()
+
+    assert len(seen) == len(set(seen))
+    ours = [sale_id for sale_id in seen if sale_id in created]
+    assert ours == sorted(created, reverse=True)
+
+    recent = client.get('/api/sales?recent=5').get_json()['sales']
+    assert [sale['id'] for sale in recent] == ours
+    assert all(sale['total_amount'] == '12.50' and sale['items_count'] == 1 for sale in recent)